@@ -5,23 +5,125 @@ Flask web application for booking meeting rooms
 """
 
 import os
+import csv
+import heapq
+import hashlib
+import hmac
+import io
+import json
+import logging
+import re
 import sqlite3
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+import sys
+import threading
+import time
+import weakref
+from flask import Flask, render_template, request, redirect, url_for, flash, session, g, has_app_context, has_request_context
+from flask import Response, abort, jsonify, send_from_directory, stream_with_context
+import click
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta, date, time
+from datetime import datetime, timedelta, date
 import calendar
+import cProfile
+import pstats
+import random
 from functools import wraps
+from contextlib import contextmanager
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left, insort
+from logging.handlers import RotatingFileHandler
 
 # Create Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'meetmate_secret_key_v2_2025'
 
+# Database settings (DATABASE=None means instance/meetmate.db)
+app.config['DATABASE'] = None
+app.config['DATABASE_POOL_SIZE'] = 8
+# Bookings start and end on multiples of this many minutes (15 or 30)
+app.config['BOOKING_SLOT_MINUTES'] = 30
+# Bookable hours of the day (the booking forms use the same hours)
+app.config['BOOKING_DAY_START'] = '08:00'
+app.config['BOOKING_DAY_END'] = '23:00'
+
+# Dates kept in the in-memory availability index (0 disables it)
+app.config['AVAILABILITY_INDEX_MAX_DAYS'] = 366
+
+# Logged-in users are re-read from the database at least this often (seconds)
+app.config['USER_CACHE_TTL'] = 30
+app.config['USER_CACHE_SIZE'] = 1024
+
+# Longest recurring series an admin can create at once
+app.config['RECURRENCE_MAX_OCCURRENCES'] = 520
+
+# Rows per page in the admin console (?per_page= is capped at the maximum)
+app.config['ADMIN_PAGE_SIZE'] = 50
+app.config['ADMIN_MAX_PAGE_SIZE'] = 200
+
+# Rows read per query when streaming a booking export
+app.config['EXPORT_BATCH_SIZE'] = 1000
+
+# Longest date range one /api/availability call may ask for
+app.config['API_MAX_DAYS'] = 31
+
+# When no room is free the booking wizard suggests this many alternatives,
+# from the requested day and the days after it
+app.config['SUGGESTION_LIMIT'] = 6
+app.config['SUGGESTION_DAYS'] = 7
+
+# Longest date range of the utilisation report (/admin/stats, /api/stats)
+app.config['STATS_MAX_DAYS'] = 366
+
+# Days before / after today included in the .ics calendar feeds
+app.config['ICAL_PAST_DAYS'] = 30
+app.config['ICAL_FUTURE_DAYS'] = 365
+
+# Bulk import: records per transaction, password hashing threads, errors reported
+app.config['IMPORT_CHUNK_SIZE'] = 5000
+app.config['IMPORT_HASH_WORKERS'] = os.cpu_count() or 4
+app.config['IMPORT_MAX_ERRORS'] = 1000
+
+# /metrics is open to admins, and to a scraper sending "Authorization: Bearer <token>"
+app.config['METRICS_TOKEN'] = None
+# X-SQL-Statements / X-SQL-Time / X-Response-Time headers (None = in debug mode only)
+app.config['METRICS_RESPONSE_HEADERS'] = None
+
+# Statements slower than SLOW_QUERY_MS (None turns the log off) are written,
+# with their query plan, to a rotating JSON lines file (None = instance/slow_queries.log).
+# A full table scan of a watched table is logged however fast it was.
+app.config['SLOW_QUERY_MS'] = 100
+app.config['SLOW_QUERY_WATCH_TABLES'] = ['bookings']
+app.config['SLOW_QUERY_LOG'] = None
+app.config['SLOW_QUERY_LOG_BYTES'] = 1024 * 1024
+app.config['SLOW_QUERY_LOG_BACKUPS'] = 3
+
+# Share of requests run under cProfile (0 = only on demand). Admins can also
+# profile one request with ?_profile=1 or an "X-Profile: 1" header.
+# Profiles go to PROFILE_DIRECTORY (None = instance/profiles); the newest
+# PROFILE_KEEP are kept.
+app.config['PROFILE_SAMPLE_RATE'] = 0.0
+app.config['PROFILE_DIRECTORY'] = None
+app.config['PROFILE_KEEP'] = 200
+
+app.config['DATABASE_PRAGMAS'] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,   # 256 MB
+    'cache_size': -16000,     # negative value = size in KB
+    'busy_timeout': 5000,     # milliseconds
+}
+
 # ============================================================================
 # DATABASE FUNCTIONS
 # ============================================================================
 
 def get_database_path():
     """Get database file path"""
+    # Path is worked out once and then remembered in the app config
+    if app.config.get('DATABASE'):
+        return app.config['DATABASE']
+    
     # Get the directory where our app.py file is located
     app_directory = app.root_path
     
@@ -31,16 +133,221 @@ def get_database_path():
     
     # Full path to our database file
     database_path = os.path.join(instance_directory, 'meetmate.db')
+    app.config['DATABASE'] = database_path
     
     return database_path
 
+def apply_database_pragmas(connection):
+    """Apply the configured PRAGMA settings to a new connection"""
+    for name, value in app.config['DATABASE_PRAGMAS'].items():
+        connection.execute(f"PRAGMA {name} = {value}")
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that adds the time spent in execute() to its connection's total"""
+    
+    # Rows fetched later (e.g. a streamed export) are not included; for most
+    # queries SQLite does the bulk of the work before the first row
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            seconds = time.perf_counter() - started
+            self.connection.sql_seconds += seconds
+        slow_query_log.check(self.connection, sql, parameters, seconds)
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            seconds = time.perf_counter() - started
+            self.connection.sql_seconds += seconds
+        # The plan is worked out with the first row's parameters (if we can see it)
+        if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters:
+            slow_query_log.check(self.connection, sql, seq_of_parameters[0], seconds,
+                                 rows=len(seq_of_parameters))
+        return self
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that is handed back to the pool instead of being closed"""
+    
+    # Per-request SQL counters (see REQUEST METRICS)
+    statements = 0
+    sql_seconds = 0.0
+    
+    def close(self):
+        # Helpers call close() when they are done; a pooled connection stays
+        # open until the end of the request, when the pool takes it back
+        if getattr(self, 'pool', None) is None:
+            super().close()
+    
+    def cursor(self, factory=None):
+        # Remember cursors so unfinished statements can be reset on release
+        cursor = super().cursor(factory or TimedCursor)
+        self.open_cursors.add(cursor)
+        return cursor
+    
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+    
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+    
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            self.sql_seconds += time.perf_counter() - started
+    
+    def count_statement(self, statement):
+        """Trace callback: SQLite calls it for every statement it runs"""
+        # That includes each row of an executemany() and each trigger step
+        self.statements += 1
+    
+    def reset_cursors(self):
+        """Close every cursor still open on this connection"""
+        # A SELECT that was not read to the end keeps its read snapshot
+        # (in WAL mode) until the cursor is closed
+        for cursor in list(self.open_cursors):
+            cursor.close()
+        self.open_cursors = weakref.WeakSet()
+    
+    def close_for_real(self):
+        """Close the underlying SQLite connection"""
+        super().close()
+
+class ConnectionPool:
+    """Pool of open SQLite connections, one leased per request"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = []
+        self.path = None
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+        self.in_use = 0
+    
+    def open_connection(self, path):
+        """Open and configure a new pooled connection"""
+        connection = sqlite3.connect(path, factory=PooledConnection, check_same_thread=False)
+        connection.open_cursors = weakref.WeakSet()
+        connection.row_factory = sqlite3.Row
+        apply_database_pragmas(connection)
+        connection.set_trace_callback(connection.count_statement)
+        connection.pool = self
+        connection.path = path
+        return connection
+    
+    def acquire(self):
+        """Get an idle connection, or open a new one"""
+        path = get_database_path()
+        with self.lock:
+            if path != self.path:
+                # Database file changed (e.g. different config), drop old connections
+                self.discard_idle()
+                self.path = path
+            self.in_use += 1
+            if self.idle:
+                self.reused += 1
+                return self.idle.pop()
+            self.opened += 1
+        
+        try:
+            return self.open_connection(path)
+        except Exception:
+            with self.lock:
+                self.in_use -= 1
+                self.opened -= 1
+            raise
+    
+    def release(self, connection):
+        """Take a connection back at the end of a request"""
+        # Throw away anything the request left uncommitted
+        try:
+            connection.reset_cursors()
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            connection.pool = None
+        
+        with self.lock:
+            self.in_use -= 1
+            keep = (connection.pool is self
+                    and connection.path == self.path
+                    and len(self.idle) < app.config['DATABASE_POOL_SIZE'])
+            if keep:
+                self.idle.append(connection)
+                return
+            self.closed += 1
+        connection.close_for_real()
+    
+    def discard_idle(self):
+        """Close every idle connection (caller holds the lock)"""
+        for connection in self.idle:
+            connection.close_for_real()
+            self.closed += 1
+        self.idle = []
+    
+    def close_all(self):
+        """Close every idle connection"""
+        with self.lock:
+            self.discard_idle()
+    
+    def stats(self):
+        """Pool counters"""
+        with self.lock:
+            return {
+                'opened': self.opened,
+                'reused': self.reused,
+                'closed': self.closed,
+                'idle': len(self.idle),
+                'in_use': self.in_use,
+            }
+
+connection_pool = ConnectionPool()
+
 def get_database_connection():
     """Connect to SQLite database"""
+    # Inside a request every helper shares one pooled connection
+    if has_app_context():
+        if 'db' not in g:
+            g.db = connection_pool.acquire()
+            # Count this request's SQL from zero
+            g.db.statements = 0
+            g.db.sql_seconds = 0.0
+        return g.db
+    
+    # Outside a request (startup, scripts) use a plain one-off connection
     db_path = get_database_path()
     connection = sqlite3.connect(db_path)
     connection.row_factory = sqlite3.Row
+    apply_database_pragmas(connection)
     return connection
 
+@app.teardown_appcontext
+def release_database_connection(exception):
+    """Return the request's connection to the pool"""
+    connection = g.pop('db', None)
+    if connection is not None:
+        connection_pool.release(connection)
+
+@contextmanager
+def write_transaction(connection):
+    """Run a block of writes inside BEGIN IMMEDIATE ... COMMIT"""
+    # IMMEDIATE takes the write lock up front, so checks made inside the
+    # block cannot be invalidated by another writer before we commit
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection.cursor()
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+
 def initialize_database():
     """Create database tables"""
     connection = get_database_connection()
@@ -73,13 +380,6 @@ def initialize_database():
             )
         ''')
         
-        # Add room_type column if it doesn't exist (for existing databases)
-        try:
-            cursor.execute('ALTER TABLE rooms ADD COLUMN room_type TEXT DEFAULT "conference"')
-        except sqlite3.OperationalError:
-            # Column already exists, ignore
-            pass
-        
         # Bookings table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS bookings (
@@ -98,17 +398,22 @@ def initialize_database():
         ''')
         
         connection.commit()
+        
+        # Bring older databases up to date (columns, indexes, ...)
+        run_migrations(connection)
+        
         create_default_data_if_needed(cursor, connection)
         print("Database initialized successfully!")
         
-    except Exception as error:
-        print(f"Error initializing database: {error}")
+    except Exception:
+        app.logger.exception("Error initializing database")
         connection.rollback()
     finally:
         connection.close()
 
 def create_default_data_if_needed(cursor, connection):
     """Create default admin user and sample rooms if database is empty"""
+    # For production-sized data run `flask generate-data` (SAMPLE DATA GENERATOR)
     # Check if users exist
     cursor.execute("SELECT COUNT(*) as count FROM users")
     user_count = cursor.fetchone()['count']
@@ -173,6 +478,402 @@ def create_default_data_if_needed(cursor, connection):
         print("Sample rooms created (18 total: 6 of each type)")    
     connection.commit()
 
+# ============================================================================
+# SCHEMA MIGRATIONS
+# ============================================================================
+
+def migration_add_room_type(cursor):
+    """Add room_type column to rooms (databases created before room types)"""
+    cursor.execute("PRAGMA table_info(rooms)")
+    columns = [row['name'] for row in cursor.fetchall()]
+    if 'room_type' not in columns:
+        cursor.execute('ALTER TABLE rooms ADD COLUMN room_type TEXT DEFAULT "conference"')
+
+def migration_booking_indexes(cursor):
+    """Indexes for availability, dashboard and history queries"""
+    # Availability checks: one room on one date
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bookings_room_date_time
+        ON bookings (room_id, date, time_start, time_end)
+    ''')
+    # Dashboard / history: one user's bookings in date order
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bookings_user_date_time
+        ON bookings (user_id, date, time_start)
+    ''')
+    # Admin views: all bookings of a day or date range
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bookings_date_time
+        ON bookings (date, time_start)
+    ''')
+    # Room lists per type, sorted by name
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_rooms_type_name
+        ON rooms (room_type, name)
+    ''')
+
+def migration_unique_email_nocase(cursor):
+    """Make user emails unique regardless of letter case"""
+    # Accounts whose emails differ only in case would make the index fail -
+    # list them so an admin can merge or rename them, then start again
+    cursor.execute('''
+        SELECT lower(email), group_concat(id || ' <' || email || '>', ', ')
+        FROM users
+        GROUP BY email COLLATE NOCASE
+        HAVING COUNT(*) > 1
+    ''')
+    duplicates = cursor.fetchall()
+    if duplicates:
+        listing = '\n'.join(f"  {row[0]}: users {row[1]}" for row in duplicates)
+        raise RuntimeError("Cannot make emails case-insensitively unique, these accounts share an "
+                           f"email (change or remove all but one of each):\n{listing}")
+    
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email_nocase
+        ON users (email COLLATE NOCASE)
+    ''')
+
+def migration_booking_overlap_triggers(cursor):
+    """Reject overlapping bookings of the same room at database level"""
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_no_overlap_insert
+        BEFORE INSERT ON bookings
+        WHEN EXISTS (
+            SELECT 1 FROM bookings b
+            WHERE b.room_id = NEW.room_id
+            AND b.date = NEW.date
+            AND (
+                (b.time_start <= NEW.time_start AND b.time_end > NEW.time_start) OR
+                (b.time_start < NEW.time_end AND b.time_end >= NEW.time_end) OR
+                (b.time_start >= NEW.time_start AND b.time_end <= NEW.time_end)
+            )
+        )
+        BEGIN
+            SELECT RAISE(ABORT, 'booking overlaps an existing booking');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_no_overlap_update
+        BEFORE UPDATE OF room_id, date, time_start, time_end ON bookings
+        WHEN EXISTS (
+            SELECT 1 FROM bookings b
+            WHERE b.room_id = NEW.room_id
+            AND b.date = NEW.date
+            AND b.id != NEW.id
+            AND (
+                (b.time_start <= NEW.time_start AND b.time_end > NEW.time_start) OR
+                (b.time_start < NEW.time_end AND b.time_end >= NEW.time_end) OR
+                (b.time_start >= NEW.time_start AND b.time_end <= NEW.time_end)
+            )
+        )
+        BEGIN
+            SELECT RAISE(ABORT, 'booking overlaps an existing booking');
+        END
+    ''')
+
+# SQL for converting an 'HH:MM' column to minutes after midnight
+def minutes_sql(column):
+    """SQL expression: minutes after midnight for an 'HH:MM' text column"""
+    return f"(CAST(substr({column}, 1, 2) AS INTEGER) * 60 + CAST(substr({column}, 4, 2) AS INTEGER))"
+
+def migration_booking_minutes(cursor):
+    """Integer start/end minutes for bookings, with overlap checks on them"""
+    # Virtual generated columns - computed by SQLite, so no write path changes
+    cursor.execute(f'''
+        ALTER TABLE bookings ADD COLUMN start_minute INTEGER
+        GENERATED ALWAYS AS {minutes_sql('time_start')} VIRTUAL
+    ''')
+    cursor.execute(f'''
+        ALTER TABLE bookings ADD COLUMN end_minute INTEGER
+        GENERATED ALWAYS AS {minutes_sql('time_end')} VIRTUAL
+    ''')
+    
+    # Overlap checks now compare integers; this replaces the text time index
+    cursor.execute("DROP INDEX IF EXISTS idx_bookings_room_date_time")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bookings_room_date_minutes
+        ON bookings (room_id, date, start_minute, end_minute)
+    ''')
+    
+    # Recreate the overlap triggers with the integer predicate
+    new_start = minutes_sql('NEW.time_start')
+    new_end = minutes_sql('NEW.time_end')
+    cursor.execute("DROP TRIGGER IF EXISTS trg_bookings_no_overlap_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS trg_bookings_no_overlap_update")
+    cursor.execute(f'''
+        CREATE TRIGGER trg_bookings_no_overlap_insert
+        BEFORE INSERT ON bookings
+        WHEN EXISTS (
+            SELECT 1 FROM bookings b
+            WHERE b.room_id = NEW.room_id
+            AND b.date = NEW.date
+            AND b.start_minute < {new_end}
+            AND b.end_minute > {new_start}
+        )
+        BEGIN
+            SELECT RAISE(ABORT, 'booking overlaps an existing booking');
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER trg_bookings_no_overlap_update
+        BEFORE UPDATE OF room_id, date, time_start, time_end ON bookings
+        WHEN EXISTS (
+            SELECT 1 FROM bookings b
+            WHERE b.room_id = NEW.room_id
+            AND b.date = NEW.date
+            AND b.id != NEW.id
+            AND b.start_minute < {new_end}
+            AND b.end_minute > {new_start}
+        )
+        BEGIN
+            SELECT RAISE(ABORT, 'booking overlaps an existing booking');
+        END
+    ''')
+
+def migration_change_counters(cursor):
+    """Counters bumped on every change, so caches can tell they are stale"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counters (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO change_counters (name, version) VALUES ('bookings', 0)")
+    for event in ['INSERT', 'UPDATE', 'DELETE']:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_bookings_counter_{event.lower()}
+            AFTER {event} ON bookings
+            BEGIN
+                UPDATE change_counters SET version = version + 1 WHERE name = 'bookings';
+            END
+        ''')
+
+def migration_rooms_counter(cursor):
+    """Change counter for the room catalog"""
+    cursor.execute("INSERT OR IGNORE INTO change_counters (name, version) VALUES ('rooms', 0)")
+    for event in ['INSERT', 'UPDATE', 'DELETE']:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_rooms_counter_{event.lower()}
+            AFTER {event} ON rooms
+            BEGIN
+                UPDATE change_counters SET version = version + 1 WHERE name = 'rooms';
+            END
+        ''')
+
+def migration_booking_series(cursor):
+    """Recurring bookings: a series table and bookings.series_id"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS booking_series (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            rule TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            room_id INTEGER NOT NULL,
+            time_start TEXT NOT NULL,
+            time_end TEXT NOT NULL,
+            booking_admin_id INTEGER,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (room_id) REFERENCES rooms (id),
+            FOREIGN KEY (booking_admin_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute("PRAGMA table_info(bookings)")
+    columns = [row['name'] for row in cursor.fetchall()]
+    if 'series_id' not in columns:
+        cursor.execute('ALTER TABLE bookings ADD COLUMN series_id INTEGER REFERENCES booking_series (id)')
+    # All occurrences of one series, in date order
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bookings_series_date
+        ON bookings (series_id, date)
+    ''')
+
+def migration_room_user_counters(cursor):
+    """Change counters per room and per user ('room:<id>', 'user:<id>')"""
+    # An UPDATE bumps both the old and the new room / user
+    rows_for_event = {'INSERT': ['NEW'], 'UPDATE': ['OLD', 'NEW'], 'DELETE': ['OLD']}
+    for event, rows in rows_for_event.items():
+        statements = ''
+        for row in rows:
+            for kind, column in [('room', 'room_id'), ('user', 'user_id')]:
+                statements += f'''
+                INSERT INTO change_counters (name, version) VALUES ('{kind}:' || {row}.{column}, 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;'''
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_bookings_owner_counters_{event.lower()}
+            AFTER {event} ON bookings
+            BEGIN{statements}
+            END
+        ''')
+
+def migration_booking_stats(cursor):
+    """Summary tables of booked minutes, bookings and users per room and day"""
+    # Keyed by date first, as reports always ask for a date range
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS room_day_stats (
+            date TEXT NOT NULL,
+            room_id INTEGER NOT NULL,
+            booked_minutes INTEGER NOT NULL,
+            booking_count INTEGER NOT NULL,
+            user_count INTEGER NOT NULL,
+            PRIMARY KEY (date, room_id)
+        ) WITHOUT ROWID
+    ''')
+    # Bookings per user in a room on a day - keeps user_count exact on cancel
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS room_day_users (
+            date TEXT NOT NULL,
+            room_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            booking_count INTEGER NOT NULL,
+            PRIMARY KEY (date, room_id, user_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    def add_statements(row):
+        key = f"date = {row}.date AND room_id = {row}.room_id"
+        minutes = f"{minutes_sql(row + '.time_end')} - {minutes_sql(row + '.time_start')}"
+        return f'''
+                INSERT INTO room_day_users (date, room_id, user_id, booking_count)
+                VALUES ({row}.date, {row}.room_id, {row}.user_id, 1)
+                ON CONFLICT (date, room_id, user_id) DO UPDATE SET booking_count = booking_count + 1;
+                INSERT INTO room_day_stats (date, room_id, booked_minutes, booking_count, user_count)
+                VALUES ({row}.date, {row}.room_id, {minutes}, 1, 1)
+                ON CONFLICT (date, room_id) DO UPDATE SET
+                    booked_minutes = booked_minutes + excluded.booked_minutes,
+                    booking_count = booking_count + 1,
+                    user_count = user_count + (SELECT booking_count = 1 FROM room_day_users
+                                               WHERE {key} AND user_id = {row}.user_id);'''
+    
+    def remove_statements(row):
+        key = f"date = {row}.date AND room_id = {row}.room_id"
+        minutes = f"{minutes_sql(row + '.time_end')} - {minutes_sql(row + '.time_start')}"
+        return f'''
+                UPDATE room_day_users SET booking_count = booking_count - 1
+                WHERE {key} AND user_id = {row}.user_id;
+                UPDATE room_day_stats SET
+                    booked_minutes = booked_minutes - ({minutes}),
+                    booking_count = booking_count - 1,
+                    user_count = user_count - COALESCE((SELECT booking_count <= 0 FROM room_day_users
+                                                        WHERE {key} AND user_id = {row}.user_id), 0)
+                WHERE {key};
+                DELETE FROM room_day_users WHERE {key} AND user_id = {row}.user_id AND booking_count <= 0;
+                DELETE FROM room_day_stats WHERE {key} AND booking_count <= 0;'''
+    
+    triggers = {
+        'insert': ('INSERT', add_statements('NEW')),
+        'delete': ('DELETE', remove_statements('OLD')),
+        # Moving or re-assigning a booking takes it out of the old day and adds it to the new one
+        'update': ('UPDATE OF user_id, room_id, date, time_start, time_end',
+                   remove_statements('OLD') + add_statements('NEW')),
+    }
+    for name, (event, statements) in triggers.items():
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_bookings_stats_{name}
+            AFTER {event} ON bookings
+            BEGIN{statements}
+            END
+        ''')
+    
+    rebuild_booking_stats(cursor)
+
+def rebuild_booking_stats(cursor):
+    """Recompute the summary tables from the bookings table"""
+    cursor.execute("DELETE FROM room_day_users")
+    cursor.execute("DELETE FROM room_day_stats")
+    cursor.execute('''
+        INSERT INTO room_day_users (date, room_id, user_id, booking_count)
+        SELECT date, room_id, user_id, COUNT(*)
+        FROM bookings
+        GROUP BY date, room_id, user_id
+    ''')
+    cursor.execute('''
+        INSERT INTO room_day_stats (date, room_id, booked_minutes, booking_count, user_count)
+        SELECT date, room_id, SUM(end_minute - start_minute), COUNT(*), COUNT(DISTINCT user_id)
+        FROM bookings
+        GROUP BY date, room_id
+    ''')
+    cursor.execute("SELECT COUNT(*) as rows FROM room_day_stats")
+    return cursor.fetchone()['rows']
+
+# Ordered list of (version, description, function). Never renumber or
+# remove a step that has shipped - add a new one at the end instead.
+SCHEMA_MIGRATIONS = [
+    (1, 'Add room_type column to rooms', migration_add_room_type),
+    (2, 'Add booking and room indexes', migration_booking_indexes),
+    (3, 'Case-insensitive unique index on users.email', migration_unique_email_nocase),
+    (4, 'Triggers rejecting overlapping bookings', migration_booking_overlap_triggers),
+    (5, 'Integer start/end minutes for bookings', migration_booking_minutes),
+    (6, 'Change counters for cache invalidation', migration_change_counters),
+    (7, 'Change counter for the room catalog', migration_rooms_counter),
+    (8, 'Booking series for recurring bookings', migration_booking_series),
+    (9, 'Change counters per room and per user', migration_room_user_counters),
+    (10, 'Utilisation summary tables per room and day', migration_booking_stats),
+]
+
+def get_schema_version(connection):
+    """Get the version number of the last applied migration"""
+    cursor = connection.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute("SELECT MAX(version) as version FROM schema_version")
+    return cursor.fetchone()['version'] or 0
+
+def run_migrations(connection):
+    """Apply every migration newer than the database's schema version"""
+    current_version = get_schema_version(connection)
+    latest_version = SCHEMA_MIGRATIONS[-1][0]
+    
+    # Schema already current - nothing to do
+    if current_version >= latest_version:
+        return 0
+    
+    applied = 0
+    cursor = connection.cursor()
+    for version, description, migrate in SCHEMA_MIGRATIONS:
+        if version <= current_version:
+            continue
+        
+        # Each step runs in its own transaction so a failure leaves the
+        # database at the last good version
+        print(f"Applying migration {version}: {description}")
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            migrate(cursor)
+            cursor.execute('''
+                INSERT INTO schema_version (version, description, applied_at)
+                VALUES (?, ?, ?)
+            ''', (version, description, datetime.now().isoformat(timespec='seconds')))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        applied += 1
+    
+    # Refresh query planner statistics for the new indexes
+    cursor.execute("PRAGMA optimize")
+    return applied
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create tables, apply migrations and add default data"""
+    initialize_database()
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the utilisation summary tables from all bookings"""
+    connection = get_database_connection()
+    try:
+        with write_transaction(connection) as cursor:
+            rows = rebuild_booking_stats(cursor)
+        click.echo(f"Utilisation stats rebuilt: {rows} room-days")
+    finally:
+        connection.close()
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
@@ -206,7 +907,7 @@ def get_user_by_email(email):
     """Get user by email"""
     connection = get_database_connection()
     cursor = connection.cursor()
-    cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
+    cursor.execute("SELECT * FROM users WHERE email = ? COLLATE NOCASE", (email,))
     user = cursor.fetchone()
     connection.close()
     
@@ -216,172 +917,1874 @@ def get_user_by_email(email):
 
 def get_all_rooms():
     """Get all meeting rooms"""
-    conn = get_database_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM rooms ORDER BY name")
-    rooms = cursor.fetchall()
-    conn.close()
-    return [dict(room) for room in rooms]
+    return [dict(room) for room in room_catalog.get().rooms]
 
 def get_room_by_id(room_id):
     """Get room by ID"""
-    connection = get_database_connection()
-    cursor = connection.cursor()
-    cursor.execute("SELECT * FROM rooms WHERE id = ?", (room_id,))
-    room = cursor.fetchone()
-    connection.close()
+    try:
+        room = room_catalog.get().by_id.get(int(room_id))
+    except (ValueError, TypeError):
+        return None
     if room:
         return dict(room)
     return None
 
 def get_user_bookings(user_id):
-    """Get all bookings for a user"""
+    """Get all bookings for a user, with can_cancel and status"""
+    status_columns, status_params = booking_status_columns()
     connection = get_database_connection()
     cursor = connection.cursor()
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT 
             b.id,
             b.date,
             b.time_start,
             b.time_end,
+            b.start_minute,
             b.notes,
+            b.series_id,
             r.name as room_name,
-            r.location as room_location
+            r.location as room_location,
+            {status_columns}
         FROM bookings b
         JOIN rooms r ON b.room_id = r.id
         WHERE b.user_id = ?
         ORDER BY b.date, b.time_start
-    ''', (user_id,))
+    ''', status_params + [user_id])
     bookings = cursor.fetchall()
     connection.close()
     return [dict(booking) for booking in bookings]
 
-def check_room_availability(room_id, date, time_start, time_end, exclude_booking_id=None):
-    """Check if room is available for booking"""
-    connection = get_database_connection()
-    cursor = connection.cursor()
+def parse_booking_date(value):
+    """A 'YYYY-MM-DD' string as a date, or None
     
-    query = '''
-        SELECT COUNT(*) as count
-        FROM bookings 
-        WHERE room_id = ? 
-        AND date = ? 
-        AND (
-            (time_start <= ? AND time_end > ?) OR
-            (time_start < ? AND time_end >= ?) OR
-            (time_start >= ? AND time_end <= ?)
-        )
+    date.fromisoformat also takes '20261020' and '2026-10-20T09:00', which
+    would then not compare as text with the dates stored in the database.
+    """
+    try:
+        parsed = date.fromisoformat(value or '')
+    except ValueError:
+        return None
+    return parsed if parsed.isoformat() == value else None
+
+def parse_time_to_minutes(value):
+    """Convert 'HH:MM' (or 'HH:MM:SS') to minutes after midnight"""
+    parts = value.split(':')
+    hours = int(parts[0])
+    minutes = int(parts[1])
+    if not (0 <= hours <= 23 and 0 <= minutes <= 59):
+        raise ValueError(f"Invalid time: {value}")
+    return hours * 60 + minutes
+
+def format_minutes(minutes):
+    """Convert minutes after midnight to 'HH:MM'"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def duration_in_hours(time_start, time_end):
+    """Booking length in hours (e.g. 2 or 1.5)"""
+    minutes = parse_time_to_minutes(time_end) - parse_time_to_minutes(time_start)
+    hours = minutes / 60
+    return int(hours) if hours.is_integer() else round(hours, 2)
+
+def validate_booking_times(time_start, time_end):
+    """Check booking times; returns (duration in hours, error message or None)"""
+    try:
+        start_minute = parse_time_to_minutes(time_start)
+        end_minute = parse_time_to_minutes(time_end)
+    except (ValueError, IndexError):
+        return None, 'Invalid time format. Please try again.'
+    
+    # Times must fall on the booking slot grid (e.g. every 30 minutes)
+    slot_minutes = app.config['BOOKING_SLOT_MINUTES']
+    if start_minute % slot_minutes or end_minute % slot_minutes:
+        return None, f'Start and end times must be in {slot_minutes}-minute steps.'
+    
+    # Must be 1-8 hours
+    duration = duration_in_hours(time_start, time_end)
+    if duration < 1 or duration > 8:
+        return None, f'Booking duration must be between 1 and 8 hours (you selected {duration} hours)'
+    
+    return duration, None
+
+def booking_overlap_condition(slot_start, slot_end):
+    """SQL condition that is true when booking b overlaps the given slot"""
+    # slot_start / slot_end are SQL expressions in minutes (a parameter or a column)
+    return f"(b.start_minute < {slot_end} AND b.end_minute > {slot_start})"
+
+def booking_started_condition(now=None, alias='b'):
+    """SQL condition that is true once booking b has started, plus its parameters"""
+    now = now or datetime.now()
+    today = now.strftime('%Y-%m-%d')
+    condition = f"({alias}.date < ? OR ({alias}.date = ? AND {alias}.start_minute <= ?))"
+    return condition, [today, today, now.hour * 60 + now.minute]
+
+def booking_status_columns(now=None):
+    """SQL for the can_cancel and status columns of booking b, plus their parameters
+    
+    A booking is Complete (and can no longer be cancelled) once its start
+    time has passed, otherwise it is Confirmed. Put the columns in the
+    SELECT list so every page works out the status the same way.
+    """
+    started, params = booking_started_condition(now)
+    columns = (f"CASE WHEN {started} THEN 0 ELSE 1 END AS can_cancel, "
+               f"CASE WHEN {started} THEN 'Complete' ELSE 'Confirmed' END AS status")
+    return columns, params + params
+
+def find_conflicting_booking(cursor, room_id, date, time_start, time_end, exclude_booking_id=None):
+    """Get the ID of a booking that overlaps the slot, or None"""
+    query = f'''
+        SELECT b.id
+        FROM bookings b
+        WHERE b.room_id = :room_id
+        AND b.date = :date
+        AND {booking_overlap_condition(':time_start', ':time_end')}
     '''
     
-    params = [room_id, date, time_start, time_start, time_end, time_end, time_start, time_end]
+    params = {
+        'room_id': room_id,
+        'date': date,
+        'time_start': parse_time_to_minutes(time_start),
+        'time_end': parse_time_to_minutes(time_end),
+    }
     
     if exclude_booking_id:
-        query += " AND id != ?"
-        params.append(exclude_booking_id)
+        query += " AND b.id != :exclude_booking_id"
+        params['exclude_booking_id'] = exclude_booking_id
+    
+    cursor.execute(query + " LIMIT 1", params)
+    row = cursor.fetchone()
+    return row['id'] if row else None
+
+def get_change_counter(cursor, name):
+    """Get the current value of a change counter (0 if it was never bumped)"""
+    cursor.execute("SELECT version FROM change_counters WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    return row['version'] if row else 0
+
+def check_room_availability(room_id, date, time_start, time_end, exclude_booking_id=None):
+    """Check if room is available for booking"""
+    if availability_index.enabled():
+        return availability_index.is_room_free(int(room_id), date,
+                                               parse_time_to_minutes(time_start),
+                                               parse_time_to_minutes(time_end),
+                                               exclude_booking_id)
     
-    cursor.execute(query, params)
-    result = cursor.fetchone()
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    conflict_id = find_conflicting_booking(cursor, room_id, date, time_start, time_end, exclude_booking_id)
     connection.close()
     
-    return result['count'] == 0
+    return conflict_id is None
+
+class BookingConflict:
+    """Returned by create_booking when the slot is already taken"""
+    
+    def __init__(self, room_id, date, time_start, time_end, conflicting_booking_id=None):
+        self.room_id = room_id
+        self.date = date
+        self.time_start = time_start
+        self.time_end = time_end
+        self.conflicting_booking_id = conflicting_booking_id
+    
+    def __repr__(self):
+        return (f"BookingConflict(room_id={self.room_id}, date={self.date!r}, "
+                f"time={self.time_start}-{self.time_end}, "
+                f"conflicting_booking_id={self.conflicting_booking_id})")
 
 def create_booking(user_id, room_id, date, time_start, time_end, admin_id=None, notes=None):
-    """Create a new booking"""
+    """Create a new booking
+    
+    The conflict check and the insert run in one IMMEDIATE transaction, so
+    two requests can never both book the same slot. Returns the new booking
+    ID, a BookingConflict if the slot is taken, or None on other errors.
+    """
+    # Store times as zero-padded 'HH:MM' so the minute columns are exact
+    time_start = format_minutes(parse_time_to_minutes(time_start))
+    time_end = format_minutes(parse_time_to_minutes(time_end))
+    
     connection = get_database_connection()
-    cursor = connection.cursor()
     
     try:
-        cursor.execute('''
-            INSERT INTO bookings (user_id, room_id, date, time_start, time_end, booking_admin_id, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, room_id, date, time_start, time_end, admin_id, notes))
+        with write_transaction(connection) as cursor:
+            conflict_id = find_conflicting_booking(cursor, room_id, date, time_start, time_end)
+            if conflict_id is not None:
+                return BookingConflict(room_id, date, time_start, time_end, conflict_id)
+            
+            cursor.execute('''
+                INSERT INTO bookings (user_id, room_id, date, time_start, time_end, booking_admin_id, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, room_id, date, time_start, time_end, admin_id, notes))
+            booking_id = cursor.lastrowid
+            version = get_change_counter(cursor, 'bookings')
         
-        booking_id = cursor.lastrowid
-        connection.commit()
-        connection.close()
+        availability_index.record_booking(room_id, date, time_start, time_end, booking_id, version)
         return booking_id
-        
-    except Exception as error:
-        print(f"Error creating booking: {error}")
-        connection.rollback()
+    
+    except sqlite3.IntegrityError as error:
+        # Overlap trigger fired - someone else got there first
+        app.logger.info(f"Booking conflict: {error}")
+        return BookingConflict(room_id, date, time_start, time_end)
+    
+    except Exception:
+        app.logger.exception("Error creating booking")
+        return None
+    
+    finally:
         connection.close()
+
+def reschedule_booking(booking_id, room_id, date, time_start, time_end):
+    """Move a booking to another room, date and/or time
+    
+    The conflict check (ignoring the booking itself) and the update run in
+    one IMMEDIATE transaction, so the old slot is never released before the
+    new one is taken. Returns True, a BookingConflict if the new slot is
+    taken, or None on other errors.
+    """
+    # Store times as zero-padded 'HH:MM' so the minute columns are exact
+    time_start = format_minutes(parse_time_to_minutes(time_start))
+    time_end = format_minutes(parse_time_to_minutes(time_end))
+    
+    connection = get_database_connection()
+    
+    try:
+        with write_transaction(connection) as cursor:
+            cursor.execute("SELECT room_id, date FROM bookings WHERE id = ?", (booking_id,))
+            old = cursor.fetchone()
+            if not old:
+                return None
+            
+            conflict_id = find_conflicting_booking(cursor, room_id, date, time_start, time_end,
+                                                   exclude_booking_id=booking_id)
+            if conflict_id is not None:
+                return BookingConflict(room_id, date, time_start, time_end, conflict_id)
+            
+            cursor.execute('''
+                UPDATE bookings
+                SET room_id = ?, date = ?, time_start = ?, time_end = ?
+                WHERE id = ?
+            ''', (room_id, date, time_start, time_end, booking_id))
+            version = get_change_counter(cursor, 'bookings')
+        
+        availability_index.move_booking(booking_id, old['room_id'], old['date'],
+                                        room_id, date, time_start, time_end, version)
+        return True
+    
+    except sqlite3.IntegrityError as error:
+        # Overlap trigger fired - someone else got there first
+        app.logger.info(f"Booking conflict: {error}")
+        return BookingConflict(room_id, date, time_start, time_end)
+    
+    except Exception:
+        app.logger.exception("Error rescheduling booking")
         return None
+    
+    finally:
+        connection.close()
 
 def get_rooms_by_type(room_type):
     """Get all rooms of a specific type"""
-    conn = get_database_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM rooms WHERE room_type = ? ORDER BY name", (room_type,))
-    rooms = cursor.fetchall()
-    conn.close()
-    return [dict(room) for room in rooms]
+    return [dict(room) for room in room_catalog.get().by_type.get(room_type, ())]
 
 def get_available_rooms_by_type(room_type, date, time_start, time_end):
     """Get available rooms of a specific type for given date and time"""
-    rooms = get_rooms_by_type(room_type)
-    available_rooms = []
+    return get_available_rooms_for_windows(room_type, [(date, time_start, time_end)])[0]
+
+# Windows per query - keeps us well under SQLite's bound parameter limit
+AVAILABILITY_WINDOW_BATCH = 500
+
+def get_available_rooms_for_windows(room_type, windows):
+    """Get available rooms of a type for each (date, time_start, time_end) window
+    
+    Returns one list of rooms per window, in the same order as windows.
+    Each batch of windows is answered by a single anti-join query.
+    """
+    results = [[] for _ in windows]
+    if not windows:
+        return results
+    
+    # Answer from memory when every date fits in the availability index
+    if availability_index.enabled():
+        dates = set(window[0] for window in windows)
+        if len(dates) <= app.config['AVAILABILITY_INDEX_MAX_DAYS']:
+            return availability_index.filter_free_rooms(get_rooms_by_type(room_type), windows)
     
-    for room in rooms:
-        if check_room_availability(room['id'], date, time_start, time_end):
-            available_rooms.append(room)
+    connection = get_database_connection()
+    cursor = connection.cursor()
     
-    return available_rooms
+    for offset in range(0, len(windows), AVAILABILITY_WINDOW_BATCH):
+        batch = windows[offset:offset + AVAILABILITY_WINDOW_BATCH]
+        
+        # Windows are passed in as an inline VALUES table
+        values_sql = ', '.join(['(?, ?, ?, ?)'] * len(batch))
+        params = []
+        for index, (date, time_start, time_end) in enumerate(batch, start=offset):
+            params.extend([index, date, parse_time_to_minutes(time_start), parse_time_to_minutes(time_end)])
+        params.append(room_type)
+        
+        # Rooms of the type with no overlapping booking (uses idx_bookings_room_date_minutes)
+        cursor.execute(f'''
+            WITH windows (window_index, date, time_start, time_end) AS (
+                VALUES {values_sql}
+            )
+            SELECT w.window_index, r.*
+            FROM windows w
+            JOIN rooms r ON r.room_type = ?
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM bookings b
+                WHERE b.room_id = r.id
+                AND b.date = w.date
+                AND {booking_overlap_condition('w.time_start', 'w.time_end')}
+            )
+            ORDER BY w.window_index, r.name
+        ''', params)
+        
+        for row in cursor.fetchall():
+            room = dict(row)
+            window_index = room.pop('window_index')
+            results[window_index].append(room)
+    
+    connection.close()
+    return results
 
-def get_all_room_types():
-    """Get all distinct room types in custom order"""
-    conn = get_database_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT room_type FROM rooms")
-    types = cursor.fetchall()
-    conn.close()
+def count_free_windows(rooms, windows):
+    """How many of the (date, time_start, time_end) windows each room is free for
     
-    # Define custom order: Square Table, Circle Table, Long Table
-    room_types = [row['room_type'] for row in types]
-    custom_order = ['Square Table', 'Circle Table', 'Long Table']
+    Returns {room_id: count}. Used to rank rooms for a recurring booking.
+    """
+    if not windows or not rooms:
+        return {room['id']: len(windows) for room in rooms}
     
-    # Return room types in custom order, only including types that exist in DB
-    ordered_types = []
-    for room_type in custom_order:
-        if room_type in room_types:
-            ordered_types.append(room_type)
+    if availability_index.enabled():
+        dates = set(window[0] for window in windows)
+        if len(dates) <= app.config['AVAILABILITY_INDEX_MAX_DAYS']:
+            return availability_index.count_free_windows(rooms, windows)
+    
+    # Every room x window as one slot list, checked by a few VALUES queries
+    slots = []
+    for room in rooms:
+        for date, time_start, time_end in windows:
+            slots.append((room['id'], date, parse_time_to_minutes(time_start), parse_time_to_minutes(time_end)))
     
-    # Add any additional room types not in our custom order (future-proofing)
-    for room_type in room_types:
-        if room_type not in ordered_types:
-            ordered_types.append(room_type)
+    connection = get_database_connection()
+    conflicts = find_slot_conflicts(connection.cursor(), slots)
+    connection.close()
     
-    return ordered_types
+    free_counts = {room['id']: len(windows) for room in rooms}
+    for index in conflicts:
+        free_counts[slots[index][0]] -= 1
+    return free_counts
+
+def get_all_room_types():
+    """Get all distinct room types in custom order"""
+    # Order is precomputed in the catalog snapshot (see ROOM_TYPE_ORDER)
+    return list(room_catalog.get().room_types)
 
 # ============================================================================
-# AUTHENTICATION DECORATORS
+# RECURRING BOOKINGS
 # ============================================================================
 
-def login_required(f):
-    """Decorator to ensure user is logged in"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            flash('Please login to access this page', 'error')
-            return redirect(url_for('login'))
+class RecurrenceRule:
+    """RRULE-style repeat rule, e.g. FREQ=WEEKLY;INTERVAL=2;COUNT=10"""
+    
+    FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+    
+    def __init__(self, freq, interval=1, count=1):
+        self.freq = str(freq).upper()
+        self.interval = int(interval)
+        self.count = int(count)
         
-        user = get_user_by_id(session['user_id'])
-        if not user:
-            session.clear()
-            flash('Your account is no longer valid. Please login again.', 'warning')
-            return redirect(url_for('login'))
+        if self.freq not in self.FREQUENCIES:
+            raise ValueError(f"Unsupported frequency: {freq}")
+        if self.interval < 1:
+            raise ValueError("Interval must be at least 1")
+        max_count = app.config['RECURRENCE_MAX_OCCURRENCES']
+        if not 1 <= self.count <= max_count:
+            raise ValueError(f"Number of occurrences must be between 1 and {max_count}")
+    
+    @classmethod
+    def parse(cls, text):
+        """Build a rule from 'FREQ=...;INTERVAL=...;COUNT=...' (an RRULE: prefix is allowed)"""
+        text = text.strip().upper()
+        if text.startswith('RRULE:'):
+            text = text[len('RRULE:'):]
         
-        return f(*args, **kwargs)
-    return decorated_function
+        parts = {}
+        for part in text.split(';'):
+            if part:
+                name, _, value = part.partition('=')
+                parts[name] = value
+        
+        if 'FREQ' not in parts:
+            raise ValueError("FREQ is required")
+        unknown = set(parts) - {'FREQ', 'INTERVAL', 'COUNT'}
+        if unknown:
+            raise ValueError(f"Unsupported rule parts: {', '.join(sorted(unknown))}")
+        return cls(parts['FREQ'], parts.get('INTERVAL', 1), parts.get('COUNT', 1))
+    
+    def __str__(self):
+        return f"FREQ={self.freq};INTERVAL={self.interval};COUNT={self.count}"
+    
+    def describe(self):
+        """Short label such as 'Weekly' or 'Every 3 days'"""
+        presets = {('DAILY', 1): 'Daily', ('WEEKLY', 1): 'Weekly',
+                   ('WEEKLY', 2): 'Biweekly', ('MONTHLY', 1): 'Monthly'}
+        if (self.freq, self.interval) in presets:
+            return presets[(self.freq, self.interval)]
+        unit = {'DAILY': 'days', 'WEEKLY': 'weeks', 'MONTHLY': 'months'}[self.freq]
+        return f"Every {self.interval} {unit}"
+    
+    def dates(self, start_date):
+        """Occurrence dates ('YYYY-MM-DD'), the first one being start_date"""
+        first = date.fromisoformat(start_date)
+        occurrence_dates = []
+        
+        for i in range(self.count):
+            step = i * self.interval
+            if self.freq == 'DAILY':
+                next_date = first + timedelta(days=step)
+            elif self.freq == 'WEEKLY':
+                next_date = first + timedelta(weeks=step)
+            else:
+                # Same day of the month, or the last day if the month is shorter
+                month = first.month - 1 + step
+                year = first.year + month // 12
+                month = month % 12 + 1
+                day = min(first.day, calendar.monthrange(year, month)[1])
+                next_date = first.replace(year=year, month=month, day=day)
+            occurrence_dates.append(next_date.isoformat())
+        
+        return occurrence_dates
 
-def admin_required(f):
-    """Decorator to ensure user is admin"""
-    @wraps(f)
+# Recurrence types offered on the admin booking form
+RECURRENCE_PRESETS = {
+    'weekly': ('WEEKLY', 1),
+    'biweekly': ('WEEKLY', 2),
+    'monthly': ('MONTHLY', 1),
+}
+RECURRENCE_UNITS = {'days': 'DAILY', 'weeks': 'WEEKLY', 'months': 'MONTHLY'}
+
+def recurrence_rule_from_form(form):
+    """Build a RecurrenceRule from booking form fields (raises ValueError)"""
+    # The confirmation page passes the rule on as a string
+    if form.get('recurrence_rule'):
+        return RecurrenceRule.parse(form['recurrence_rule'])
+    
+    recurrence_type = form.get('recurrence_type', 'weekly')
+    count = form.get('recurrence_count', 4)
+    
+    if recurrence_type == 'custom':
+        unit = form.get('recurrence_unit', 'weeks')
+        if unit not in RECURRENCE_UNITS:
+            raise ValueError(f"Unknown repeat unit: {unit}")
+        return RecurrenceRule(RECURRENCE_UNITS[unit], form.get('recurrence_interval', 1), count)
+    
+    if recurrence_type not in RECURRENCE_PRESETS:
+        raise ValueError(f"Unknown recurrence type: {recurrence_type}")
+    freq, interval = RECURRENCE_PRESETS[recurrence_type]
+    return RecurrenceRule(freq, interval, count)
+
+class BookingSeriesResult:
+    """Returned by create_booking_series: what happened to each occurrence"""
+    
+    def __init__(self, series_id, occurrences):
+        self.series_id = series_id
+        # One dict per occurrence: occurrence, date, booking_id, conflicting_booking_id
+        self.occurrences = occurrences
+    
+    @property
+    def created_ids(self):
+        return [item['booking_id'] for item in self.occurrences if item['booking_id']]
+    
+    @property
+    def conflicts(self):
+        return [item for item in self.occurrences if not item['booking_id']]
+    
+    @property
+    def all_created(self):
+        return not self.conflicts
+    
+    def __repr__(self):
+        return (f"BookingSeriesResult(series_id={self.series_id}, "
+                f"created={len(self.created_ids)}, conflicts={len(self.conflicts)})")
+
+def find_slot_conflicts(cursor, slots):
+    """Map slot index -> ID of a booking that overlaps it
+    
+    slots is a list of (room_id, date, start minute, end minute). They are
+    passed in as an inline VALUES table, so a whole list needs one query
+    per AVAILABILITY_WINDOW_BATCH slots.
+    """
+    conflicts = {}
+    
+    for offset in range(0, len(slots), AVAILABILITY_WINDOW_BATCH):
+        batch = slots[offset:offset + AVAILABILITY_WINDOW_BATCH]
+        
+        values_sql = ', '.join(['(?, ?, ?, ?, ?)'] * len(batch))
+        params = []
+        for index, slot in enumerate(batch, start=offset):
+            params.append(index)
+            params.extend(slot)
+        
+        # Uses idx_bookings_room_date_minutes once per slot
+        cursor.execute(f'''
+            WITH slots (slot_index, room_id, date, time_start, time_end) AS (
+                VALUES {values_sql}
+            )
+            SELECT s.slot_index, MIN(b.id) as booking_id
+            FROM slots s
+            JOIN bookings b ON b.room_id = s.room_id AND b.date = s.date
+            WHERE {booking_overlap_condition('s.time_start', 's.time_end')}
+            GROUP BY s.slot_index
+        ''', params)
+        
+        for row in cursor.fetchall():
+            conflicts[row['slot_index']] = row['booking_id']
+    
+    return conflicts
+
+def find_series_conflicts(cursor, room_id, dates, time_start, time_end):
+    """Map occurrence index -> ID of a booking that overlaps it, for a whole series"""
+    start = parse_time_to_minutes(time_start)
+    end = parse_time_to_minutes(time_end)
+    return find_slot_conflicts(cursor, [(room_id, occurrence_date, start, end) for occurrence_date in dates])
+
+def create_booking_series(user_id, room_id, rule, start_date, time_start, time_end, admin_id=None, notes=None):
+    """Create every occurrence of a recurring booking in one transaction
+    
+    Availability of all occurrences is checked with one query and the free
+    ones are inserted with a single executemany. Occurrences that clash with
+    an existing booking are skipped and reported. The first occurrence must
+    be free: if it is taken nothing is created and a BookingConflict is
+    returned. Otherwise returns a BookingSeriesResult (None on other errors).
+    """
+    # Store times as zero-padded 'HH:MM' so the minute columns are exact
+    time_start = format_minutes(parse_time_to_minutes(time_start))
+    time_end = format_minutes(parse_time_to_minutes(time_end))
+    dates = rule.dates(start_date)
+    
+    connection = get_database_connection()
+    
+    try:
+        with write_transaction(connection) as cursor:
+            conflicts = find_series_conflicts(cursor, room_id, dates, time_start, time_end)
+            if 0 in conflicts:
+                return BookingConflict(room_id, dates[0], time_start, time_end, conflicts[0])
+            
+            cursor.execute('''
+                INSERT INTO booking_series (rule, user_id, room_id, time_start, time_end, booking_admin_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (str(rule), user_id, room_id, time_start, time_end, admin_id,
+                  datetime.now().isoformat(timespec='seconds')))
+            series_id = cursor.lastrowid
+            
+            rows = []
+            for index, occurrence_date in enumerate(dates):
+                if index in conflicts:
+                    continue
+                if index == 0:
+                    occurrence_notes = notes
+                else:
+                    occurrence_notes = f"{notes or ''} (Recurring {index + 1}/{len(dates)})".strip()
+                rows.append((user_id, room_id, occurrence_date, time_start, time_end, admin_id, occurrence_notes, series_id))
+            
+            cursor.executemany('''
+                INSERT INTO bookings (user_id, room_id, date, time_start, time_end, booking_admin_id, notes, series_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            
+            # executemany does not report the new IDs, so read them back
+            cursor.execute("SELECT id, date FROM bookings WHERE series_id = ?", (series_id,))
+            booking_ids = {row['date']: row['id'] for row in cursor.fetchall()}
+            version = get_change_counter(cursor, 'bookings')
+        
+        availability_index.record_series(room_id, time_start, time_end, booking_ids, version)
+        
+        occurrences = []
+        for index, occurrence_date in enumerate(dates):
+            occurrences.append({
+                'occurrence': index + 1,
+                'date': occurrence_date,
+                'booking_id': booking_ids.get(occurrence_date),
+                'conflicting_booking_id': conflicts.get(index),
+            })
+        return BookingSeriesResult(series_id, occurrences)
+    
+    except sqlite3.IntegrityError as error:
+        # Overlap trigger fired - someone else got there first
+        app.logger.info(f"Booking conflict: {error}")
+        return BookingConflict(room_id, dates[0], time_start, time_end)
+    
+    except Exception:
+        app.logger.exception("Error creating booking series")
+        return None
+    
+    finally:
+        connection.close()
+
+def get_booking_series(series_id):
+    """Get a booking series with its occurrences (each with can_cancel / status)"""
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    cursor.execute('''
+        SELECT s.*, u.username, r.name as room_name
+        FROM booking_series s
+        JOIN users u ON s.user_id = u.id
+        JOIN rooms r ON s.room_id = r.id
+        WHERE s.id = ?
+    ''', (series_id,))
+    series = cursor.fetchone()
+    if not series:
+        connection.close()
+        return None
+    
+    series = dict(series)
+    series['rule_label'] = RecurrenceRule.parse(series['rule']).describe()
+    
+    status_columns, status_params = booking_status_columns()
+    cursor.execute(f'''
+        SELECT
+            b.id,
+            b.date,
+            b.time_start,
+            b.time_end,
+            b.notes,
+            r.name as room_name,
+            {status_columns}
+        FROM bookings b
+        JOIN rooms r ON b.room_id = r.id
+        WHERE b.series_id = ?
+        ORDER BY b.date
+    ''', status_params + [series_id])
+    series['occurrences'] = [dict(row) for row in cursor.fetchall()]
+    connection.close()
+    return series
+
+def series_occurrence_condition(series_id, from_date=None, alias='b', now=None):
+    """SQL condition for the occurrences of a series that have not started yet
+    
+    With from_date, only occurrences on or after that date match.
+    """
+    started, params = booking_started_condition(now, alias)
+    condition = f"{alias}.series_id = ? AND NOT {started}"
+    params = [series_id] + params
+    if from_date:
+        condition += f" AND {alias}.date >= ?"
+        params.append(from_date)
+    return condition, params
+
+def cancel_booking_series(series_id, from_date=None):
+    """Cancel the occurrences of a series that have not started yet
+    
+    With from_date, only occurrences on or after that date are cancelled.
+    Runs as one DELETE in one transaction. Returns the number of bookings
+    cancelled, or None on error.
+    """
+    # The same "now" for the read and the delete
+    condition, params = series_occurrence_condition(series_id, from_date, 'bookings', datetime.now())
+    connection = get_database_connection()
+    
+    try:
+        with write_transaction(connection) as cursor:
+            cursor.execute(f"SELECT id, room_id, date FROM bookings WHERE {condition}", params)
+            cancelled = [dict(row) for row in cursor.fetchall()]
+            cursor.execute(f"DELETE FROM bookings WHERE {condition}", params)
+            version = get_change_counter(cursor, 'bookings')
+        
+        availability_index.forget_bookings(cancelled, version)
+        return len(cancelled)
+    
+    except Exception:
+        app.logger.exception("Error cancelling booking series")
+        return None
+    
+    finally:
+        connection.close()
+
+def shift_booking_series(series_id, room_id, time_start, time_end, from_date=None):
+    """Move the remaining occurrences of a series to another room and/or time
+    
+    Every occurrence is checked for clashes first (one query). If any of
+    them clash nothing is changed. Otherwise all of them are moved with one
+    UPDATE. Returns (number of bookings moved, list of conflicts), or None
+    on error.
+    """
+    time_start = format_minutes(parse_time_to_minutes(time_start))
+    time_end = format_minutes(parse_time_to_minutes(time_end))
+    start = parse_time_to_minutes(time_start)
+    end = parse_time_to_minutes(time_end)
+    
+    now = datetime.now()
+    moving, moving_params = series_occurrence_condition(series_id, from_date, 'o', now)
+    condition, params = series_occurrence_condition(series_id, from_date, 'bookings', now)
+    connection = get_database_connection()
+    
+    try:
+        with write_transaction(connection) as cursor:
+            # Bookings in the target room that overlap the new time, ignoring
+            # the occurrences we are about to move
+            cursor.execute(f'''
+                SELECT o.id, o.date, MIN(b.id) as conflicting_booking_id
+                FROM bookings o
+                JOIN bookings b ON b.room_id = ? AND b.date = o.date
+                WHERE {moving}
+                AND {booking_overlap_condition(start, end)}
+                AND b.id NOT IN (SELECT bookings.id FROM bookings WHERE {condition})
+                GROUP BY o.id
+                ORDER BY o.date
+            ''', [room_id] + moving_params + params)
+            conflicts = [dict(row) for row in cursor.fetchall()]
+            if conflicts:
+                return 0, conflicts
+            
+            cursor.execute(f"SELECT id, room_id, date FROM bookings WHERE {condition}", params)
+            moved = [dict(row) for row in cursor.fetchall()]
+            
+            cursor.execute(f'''
+                UPDATE bookings
+                SET room_id = ?, time_start = ?, time_end = ?
+                WHERE {condition}
+            ''', [room_id, time_start, time_end] + params)
+            
+            # The series now describes its upcoming occurrences
+            cursor.execute('''
+                UPDATE booking_series
+                SET room_id = ?, time_start = ?, time_end = ?
+                WHERE id = ?
+            ''', (room_id, time_start, time_end, series_id))
+            version = get_change_counter(cursor, 'bookings')
+        
+        availability_index.move_bookings(moved, room_id, time_start, time_end, version)
+        return len(moved), []
+    
+    except Exception:
+        app.logger.exception("Error moving booking series")
+        return None
+    
+    finally:
+        connection.close()
+
+# ============================================================================
+# AVAILABILITY INDEX
+# ============================================================================
+
+# Each room's day is also kept as a bitmap (a Python int): bit i is set
+# when the i-th GRID_SLOT_MINUTES slot after midnight is (partly) booked.
+# Bookings on the 15 or 30 minute grid fit it exactly.
+GRID_SLOT_MINUTES = 15
+GRID_SLOTS = 24 * 60 // GRID_SLOT_MINUTES
+GRID_LANE_MASK = (1 << GRID_SLOTS) - 1
+
+# A date's packed grid holds every room's bitmap side by side, one lane per
+# room. The lane has a spare top bit so sums never spill into the next room.
+GRID_LANE_WIDTH = GRID_SLOTS + 1
+
+# Unused lanes are reclaimed once they outnumber the used ones (and this)
+GRID_MIN_LANES = 64
+
+def slot_mask(start, end):
+    """Bitmap of the grid slots touched by start..end (minutes)"""
+    first = start // GRID_SLOT_MINUTES
+    last = min(-(-end // GRID_SLOT_MINUTES), GRID_SLOTS)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+class RoomDayIntervals:
+    """Booked intervals of one room on one date, sorted by start minute"""
+    
+    __slots__ = ('intervals', 'reach', 'mask')
+    
+    def __init__(self):
+        self.intervals = []  # (start_minute, end_minute, booking_id)
+        self.reach = []      # reach[i] = latest end among intervals[0..i]
+        self.mask = 0        # slot bitmap of all intervals
+    
+    def rebuild(self):
+        """Recompute reach and the slot bitmap after the intervals changed"""
+        latest_end = 0
+        self.reach = []
+        self.mask = 0
+        for start, end, booking_id in self.intervals:
+            latest_end = max(latest_end, end)
+            self.reach.append(latest_end)
+            self.mask |= slot_mask(start, end)
+    
+    def add(self, start, end, booking_id):
+        insort(self.intervals, (start, end, booking_id))
+        self.rebuild()
+    
+    def remove(self, booking_id):
+        self.intervals = [interval for interval in self.intervals if interval[2] != booking_id]
+        self.rebuild()
+    
+    def is_free(self, start, end, exclude_booking_id=None):
+        """True if no interval overlaps start..end"""
+        if exclude_booking_id:
+            exclude_booking_id = int(exclude_booking_id)
+            return not any(s < end and e > start
+                           for s, e, booking_id in self.intervals
+                           if booking_id != exclude_booking_id)
+        
+        # Intervals before position i all start before the slot ends; the
+        # slot is free if none of them reaches past the slot start
+        i = bisect_left(self.intervals, (end,))
+        return i == 0 or self.reach[i - 1] <= start
+
+class AvailabilityIndex:
+    """In-memory availability per (room, date), shared by all requests in a process
+    
+    Dates are loaded lazily from the database and evicted least recently
+    used first. The 'bookings' change counter tells us when another
+    connection or process changed bookings, in which case we start over.
+    """
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.days = OrderedDict()  # date -> {room_id: RoomDayIntervals}
+        self.grids = {}            # date -> packed slot bitmaps of all rooms
+        self.lanes = {}            # room_id -> lane number in the packed grids
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def enabled(self):
+        return app.config['AVAILABILITY_INDEX_MAX_DAYS'] > 0
+    
+    def clear(self):
+        """Forget everything"""
+        with self.lock:
+            self.days.clear()
+            self.grids.clear()
+            self.lanes.clear()
+            self.version = None
+    
+    def sync(self, cursor):
+        """Drop cached dates if bookings changed behind our back"""
+        # Checked once per request - our own writes are applied directly
+        if has_request_context() and g.get('availability_synced'):
+            return
+        
+        version = get_change_counter(cursor, 'bookings')
+        with self.lock:
+            if version != self.version:
+                if self.version is not None:
+                    self.invalidations += 1
+                self.clear()
+                self.version = version
+        
+        if has_request_context():
+            g.availability_synced = True
+    
+    def load_dates(self, cursor, dates):
+        """Make sure the given dates are in memory (caller holds the lock)"""
+        missing = []
+        for booking_date in dates:
+            if booking_date in self.days:
+                self.days.move_to_end(booking_date)
+                self.hits += 1
+            else:
+                missing.append(booking_date)
+        
+        if not missing:
+            return
+        
+        # One query for all missing dates (uses idx_bookings_date_time)
+        self.misses += len(missing)
+        placeholders = ', '.join(['?'] * len(missing))
+        cursor.execute(f'''
+            SELECT id, room_id, date, start_minute, end_minute
+            FROM bookings
+            WHERE date IN ({placeholders})
+            ORDER BY date, room_id, start_minute
+        ''', missing)
+        
+        loaded = {booking_date: {} for booking_date in missing}
+        for row in cursor.fetchall():
+            rooms = loaded[row['date']]
+            if row['room_id'] not in rooms:
+                rooms[row['room_id']] = RoomDayIntervals()
+            rooms[row['room_id']].intervals.append((row['start_minute'], row['end_minute'], row['id']))
+        
+        for booking_date, rooms in loaded.items():
+            for room_day in rooms.values():
+                room_day.intervals.sort()
+                room_day.rebuild()
+            self.days[booking_date] = rooms
+            self.grids[booking_date] = self.pack(rooms)
+        
+        # Evict the coldest dates
+        while len(self.days) > app.config['AVAILABILITY_INDEX_MAX_DAYS']:
+            evicted_date, rooms = self.days.popitem(last=False)
+            del self.grids[evicted_date]
+            self.evictions += 1
+        
+        self.prune_lanes()
+    
+    def prune_lanes(self):
+        """Renumber the lanes once most of them belong to rooms with no cached bookings
+        
+        Lanes are handed out on first use and would otherwise only grow
+        (deleted rooms, evicted dates), making every packed grid wider.
+        Repacking costs one pass over the cached dates, so we only do it
+        when the dead lanes outnumber the live ones. Caller holds the lock.
+        """
+        live = {room_id for rooms in self.days.values()
+                for room_id, room_day in rooms.items() if room_day.mask}
+        if len(self.lanes) - len(live) <= max(len(live), GRID_MIN_LANES):
+            return
+        
+        self.lanes = {room_id: lane for lane, room_id in enumerate(sorted(live))}
+        for booking_date, rooms in self.days.items():
+            self.grids[booking_date] = self.pack(rooms)
+    
+    def lane(self, room_id):
+        """Lane of a room in the packed grids (assigned on first use)"""
+        if room_id not in self.lanes:
+            self.lanes[room_id] = len(self.lanes)
+        return self.lanes[room_id]
+    
+    def pack(self, rooms):
+        """Packed grid of one date from its {room_id: RoomDayIntervals}"""
+        grid = 0
+        for room_id, room_day in rooms.items():
+            if room_day.mask:
+                grid |= room_day.mask << (self.lane(room_id) * GRID_LANE_WIDTH)
+        return grid
+    
+    def add_interval(self, booking_date, room_id, start, end, booking_id):
+        """File a booking under its date, if that date is loaded (caller holds the lock)"""
+        day = self.days.get(booking_date)
+        if day is None:
+            return
+        if room_id not in day:
+            day[room_id] = RoomDayIntervals()
+        old_mask = day[room_id].mask
+        day[room_id].add(start, end, booking_id)
+        self.grids[booking_date] ^= (old_mask ^ day[room_id].mask) << (self.lane(room_id) * GRID_LANE_WIDTH)
+    
+    def remove_interval(self, booking_date, room_id, booking_id):
+        """Take a booking out of its date, if that date is loaded (caller holds the lock)"""
+        day = self.days.get(booking_date)
+        if day is None or room_id not in day:
+            return
+        old_mask = day[room_id].mask
+        day[room_id].remove(booking_id)
+        self.grids[booking_date] ^= (old_mask ^ day[room_id].mask) << (self.lane(room_id) * GRID_LANE_WIDTH)
+    
+    def lane_bits(self, rooms):
+        """The lowest bit of each room's lane, OR-ed together
+        
+        Rooms without a lane have no cached bookings, so they are free and
+        left out rather than given a lane of zeros.
+        """
+        bits = 0
+        for room in rooms:
+            if room['id'] in self.lanes:
+                bits |= 1 << (self.lanes[room['id']] * GRID_LANE_WIDTH)
+        return bits
+    
+    def busy_lanes(self, booking_date, start, end, rooms, bits):
+        """Lowest lane bit of every room (of rooms / bits) that is booked during start..end
+        
+        All rooms are checked at once: the window's slot bitmap is repeated
+        in every lane (multiplying by bits) and AND-ed with the date's grid.
+        Adding all-ones to each lane then carries into its spare bit exactly
+        when the lane is not zero. Caller holds the lock and loaded the date.
+        """
+        if start % GRID_SLOT_MINUTES or end % GRID_SLOT_MINUTES:
+            # Off the slot grid - check the intervals room by room
+            day = self.days[booking_date]
+            busy = 0
+            for room in rooms:
+                if room['id'] in day and not day[room['id']].is_free(start, end):
+                    busy |= 1 << (self.lane(room['id']) * GRID_LANE_WIDTH)
+            return busy
+        
+        overlap = self.grids[booking_date] & (slot_mask(start, end) * bits)
+        return ((overlap + bits * GRID_LANE_MASK) >> GRID_SLOTS) & bits
+    
+    def is_room_free(self, room_id, booking_date, start, end, exclude_booking_id=None):
+        """Check one room for one slot (times in minutes)"""
+        connection = get_database_connection()
+        cursor = connection.cursor()
+        self.sync(cursor)
+        
+        with self.lock:
+            self.load_dates(cursor, [booking_date])
+            room_day = self.days[booking_date].get(room_id)
+            free = room_day is None or room_day.is_free(start, end, exclude_booking_id)
+        
+        connection.close()
+        return free
+    
+    def filter_free_rooms(self, rooms, windows):
+        """For each (date, time_start, time_end) window, the rooms that are free"""
+        connection = get_database_connection()
+        cursor = connection.cursor()
+        self.sync(cursor)
+        
+        results = []
+        with self.lock:
+            self.load_dates(cursor, sorted(set(window[0] for window in windows)))
+            bits = self.lane_bits(rooms)
+            for booking_date, time_start, time_end in windows:
+                busy = self.busy_lanes(booking_date, parse_time_to_minutes(time_start),
+                                       parse_time_to_minutes(time_end), rooms, bits)
+                if not busy:
+                    results.append(list(rooms))
+                else:
+                    results.append([room for room in rooms
+                                    if room['id'] not in self.lanes
+                                    or not (busy >> (self.lanes[room['id']] * GRID_LANE_WIDTH)) & 1])
+        
+        connection.close()
+        return results
+    
+    def count_free_windows(self, rooms, windows):
+        """How many of the (date, time_start, time_end) windows each room is free for
+        
+        The busy lane bits of every window are simply added up: each lane
+        counts its own room's clashes, so the per-room loop runs only once
+        at the end however many windows there are.
+        """
+        connection = get_database_connection()
+        cursor = connection.cursor()
+        self.sync(cursor)
+        
+        with self.lock:
+            self.load_dates(cursor, sorted(set(window[0] for window in windows)))
+            bits = self.lane_bits(rooms)
+            busy_counts = 0
+            for booking_date, time_start, time_end in windows:
+                busy_counts += self.busy_lanes(booking_date, parse_time_to_minutes(time_start),
+                                               parse_time_to_minutes(time_end), rooms, bits)
+            
+            free_counts = {}
+            for room in rooms:
+                clashes = 0
+                if room['id'] in self.lanes:
+                    clashes = (busy_counts >> (self.lanes[room['id']] * GRID_LANE_WIDTH)) & GRID_LANE_MASK
+                free_counts[room['id']] = len(windows) - clashes
+        
+        connection.close()
+        return free_counts
+    
+    def apply_change(self, version, change, changes=1):
+        """Apply our own committed change, or start over if we missed one"""
+        # changes = how many rows the change touched (each bumps the counter)
+        with self.lock:
+            if self.version is not None and version == self.version + changes:
+                change()
+                self.version = version
+            else:
+                # Someone else changed bookings in between - reload lazily
+                if self.version is not None:
+                    self.invalidations += 1
+                self.clear()
+    
+    def record_booking(self, room_id, booking_date, time_start, time_end, booking_id, version):
+        """Add a booking we just created"""
+        room_id = int(room_id)
+        
+        def change():
+            self.add_interval(booking_date, room_id, parse_time_to_minutes(time_start),
+                              parse_time_to_minutes(time_end), booking_id)
+        
+        self.apply_change(version, change)
+    
+    def record_series(self, room_id, time_start, time_end, booking_ids, version):
+        """Add the occurrences of a series we just created (booking_ids: date -> ID)"""
+        room_id = int(room_id)
+        start = parse_time_to_minutes(time_start)
+        end = parse_time_to_minutes(time_end)
+        
+        def change():
+            for booking_date, booking_id in booking_ids.items():
+                self.add_interval(booking_date, room_id, start, end, booking_id)
+        
+        self.apply_change(version, change, len(booking_ids))
+    
+    def forget_bookings(self, bookings, version):
+        """Remove bookings we just deleted (dicts with id, room_id and date)"""
+        def change():
+            for booking in bookings:
+                self.remove_interval(booking['date'], booking['room_id'], booking['id'])
+        
+        self.apply_change(version, change, len(bookings))
+    
+    def move_bookings(self, bookings, room_id, time_start, time_end, version):
+        """Re-file bookings we just moved to another room and/or time"""
+        room_id = int(room_id)
+        start = parse_time_to_minutes(time_start)
+        end = parse_time_to_minutes(time_end)
+        
+        def change():
+            for booking in bookings:
+                self.remove_interval(booking['date'], booking['room_id'], booking['id'])
+                self.add_interval(booking['date'], room_id, start, end, booking['id'])
+        
+        self.apply_change(version, change, len(bookings))
+    
+    def move_booking(self, booking_id, old_room_id, old_date, room_id, booking_date, time_start, time_end, version):
+        """Re-file a booking we just moved (room, date and time may all change)"""
+        old_room_id = int(old_room_id)
+        room_id = int(room_id)
+        
+        def change():
+            self.remove_interval(old_date, old_room_id, booking_id)
+            self.add_interval(booking_date, room_id, parse_time_to_minutes(time_start),
+                              parse_time_to_minutes(time_end), booking_id)
+        
+        self.apply_change(version, change)
+    
+    def forget_booking(self, room_id, booking_date, booking_id, version):
+        """Remove a booking we just deleted"""
+        room_id = int(room_id)
+        
+        def change():
+            self.remove_interval(booking_date, room_id, booking_id)
+        
+        self.apply_change(version, change)
+    
+    def stats(self):
+        """Index counters"""
+        with self.lock:
+            return {
+                'dates': len(self.days),
+                'grid_lanes': len(self.lanes),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+availability_index = AvailabilityIndex()
+
+# ============================================================================
+# ROOM CATALOG CACHE
+# ============================================================================
+
+# Room types shown first, in this order; any other types follow alphabetically
+ROOM_TYPE_ORDER = ['Square Table', 'Circle Table', 'Long Table']
+
+class RoomCatalogSnapshot:
+    """Read-only copy of the rooms table, indexed by id and by type"""
+    
+    def __init__(self, rows, version):
+        self.version = version
+        self.rooms = tuple(rows)  # sorted by name
+        self.by_id = {room['id']: room for room in self.rooms}
+        
+        by_type = {}
+        for room in self.rooms:
+            by_type.setdefault(room['room_type'], []).append(room)
+        self.by_type = {room_type: tuple(rooms) for room_type, rooms in by_type.items()}
+        
+        # Precompute the custom room type order; other types follow in the
+        # order they first appear in the table, as SELECT DISTINCT gave them
+        types = [room_type for room_type in ROOM_TYPE_ORDER if room_type in self.by_type]
+        for room in sorted(self.rooms, key=lambda room: room['id']):
+            if room['room_type'] not in types:
+                types.append(room['room_type'])
+        self.room_types = tuple(types)
+
+class RoomCatalog:
+    """Process-wide cache of the room catalog
+    
+    Rooms only change through the admin pages, so the whole table is kept
+    in memory. The 'rooms' change counter (bumped by triggers) is checked
+    once per request and a new snapshot is loaded when it has moved.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self):
+        """Current snapshot, reloaded if the catalog version changed"""
+        snapshot = self.snapshot
+        if snapshot is not None and has_request_context() and g.get('room_catalog_checked'):
+            with self.lock:
+                self.hits += 1
+            return snapshot
+        
+        connection = get_database_connection()
+        cursor = connection.cursor()
+        version = get_change_counter(cursor, 'rooms')
+        
+        if snapshot is None or snapshot.version != version:
+            with self.lock:
+                self.misses += 1
+                cursor.execute("SELECT * FROM rooms ORDER BY name")
+                snapshot = RoomCatalogSnapshot([dict(row) for row in cursor.fetchall()], version)
+                self.snapshot = snapshot
+        else:
+            with self.lock:
+                self.hits += 1
+        
+        connection.close()
+        if has_request_context():
+            g.room_catalog_checked = True
+        return snapshot
+    
+    def clear(self):
+        """Forget the snapshot"""
+        self.snapshot = None
+    
+    def stats(self):
+        """Cache counters"""
+        snapshot = self.snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'rooms': len(snapshot.rooms) if snapshot else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+room_catalog = RoomCatalog()
+
+# ============================================================================
+# USER CACHE
+# ============================================================================
+
+class UserCache:
+    """Short-lived cache of user rows shared by requests in this process
+    
+    Entries expire after USER_CACHE_TTL seconds, so a user that is removed
+    or demoted (even from another worker process) is rejected within that
+    window. Updates made through this process invalidate the entry at once.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # user_id -> (expires_at, user)
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, user_id):
+        """Get a user row (a copy), from cache or database"""
+        try:
+            user_id = int(user_id)
+        except (ValueError, TypeError):
+            return None
+        
+        now = datetime.now().timestamp()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+        
+        user = get_user_by_id(user_id)
+        if user:
+            with self.lock:
+                self.entries[user_id] = (now + app.config['USER_CACHE_TTL'], user)
+                self.entries.move_to_end(user_id)
+                while len(self.entries) > app.config['USER_CACHE_SIZE']:
+                    self.entries.popitem(last=False)
+            return dict(user)
+        return None
+    
+    def invalidate(self, user_id):
+        """Forget a user after it was changed"""
+        with self.lock:
+            self.entries.pop(int(user_id), None)
+    
+    def stats(self):
+        """Cache counters"""
+        with self.lock:
+            return {'users': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+user_cache = UserCache()
+
+def get_cached_user(user_id):
+    """Get user by ID, allowing a copy up to USER_CACHE_TTL seconds old"""
+    return user_cache.get(user_id)
+
+def get_current_user():
+    """Get the logged-in user, loaded once per request"""
+    if 'user_id' not in session:
+        return None
+    if 'current_user' not in g:
+        g.current_user = get_cached_user(session['user_id'])
+    return g.current_user
+
+def invalidate_cached_user(user_id):
+    """Drop a user from the cache (and from this request) after an update"""
+    user_cache.invalidate(user_id)
+    current_user = g.get('current_user')
+    if current_user and current_user['id'] == int(user_id):
+        g.pop('current_user')
+
+# ============================================================================
+# REQUEST METRICS
+# ============================================================================
+
+# Upper bounds of the histogram buckets: request latency in seconds, and
+# SQL statements run per request (a jump there usually means an N+1 query)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+class Histogram:
+    """Observed values counted into buckets, Prometheus style"""
+    
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.count = 0
+    
+    def observe(self, value):
+        # First bucket whose upper bound is >= value (larger values only
+        # show up in the +Inf bucket, which is the count)
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.total += value
+        self.count += 1
+    
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf"""
+        running = 0
+        pairs = []
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            pairs.append((bound, running))
+        pairs.append(('+Inf', self.count))
+        return pairs
+
+class RequestMetrics:
+    """Request counters and histograms per endpoint, shared by all threads"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}      # (endpoint, method, status) -> count
+        self.latency = {}       # (endpoint, method) -> Histogram
+        self.statements = {}    # endpoint -> Histogram
+        self.sql_seconds = {}   # endpoint -> seconds
+    
+    def observe(self, endpoint, method, status, seconds, statements, sql_seconds):
+        """Record one finished request"""
+        with self.lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            
+            histogram = self.latency.get((endpoint, method))
+            if histogram is None:
+                histogram = self.latency[(endpoint, method)] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            
+            histogram = self.statements.get(endpoint)
+            if histogram is None:
+                histogram = self.statements[endpoint] = Histogram(STATEMENT_BUCKETS)
+            histogram.observe(statements)
+            
+            self.sql_seconds[endpoint] = self.sql_seconds.get(endpoint, 0.0) + sql_seconds
+    
+    def render(self):
+        """Lines of the Prometheus text format for the request metrics"""
+        with self.lock:
+            lines = [
+                '# HELP meetmate_requests_total Finished requests.',
+                '# TYPE meetmate_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                labels = metric_labels(endpoint=endpoint, method=method, status=status)
+                lines.append(f'meetmate_requests_total{labels} {count}')
+            
+            lines.append('# HELP meetmate_request_duration_seconds Time to build the response.')
+            lines.append('# TYPE meetmate_request_duration_seconds histogram')
+            for (endpoint, method), histogram in sorted(self.latency.items()):
+                lines.extend(histogram_lines('meetmate_request_duration_seconds', histogram,
+                                             endpoint=endpoint, method=method))
+            
+            lines.append('# HELP meetmate_sql_statements SQL statements run per request (trigger steps included).')
+            lines.append('# TYPE meetmate_sql_statements histogram')
+            for endpoint, histogram in sorted(self.statements.items()):
+                lines.extend(histogram_lines('meetmate_sql_statements', histogram, endpoint=endpoint))
+            
+            lines.append('# HELP meetmate_sql_seconds_total Time spent in SQL execute and commit calls.')
+            lines.append('# TYPE meetmate_sql_seconds_total counter')
+            for endpoint, seconds in sorted(self.sql_seconds.items()):
+                lines.append(f'meetmate_sql_seconds_total{metric_labels(endpoint=endpoint)} {seconds:.6f}')
+            return lines
+
+request_metrics = RequestMetrics()
+
+def metric_labels(**labels):
+    """{name="value",...} with the value escaped for the text format"""
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+def histogram_lines(name, histogram, **labels):
+    """_bucket, _sum and _count lines of one histogram"""
+    lines = []
+    for bound, count in histogram.cumulative():
+        lines.append(f'{name}_bucket{metric_labels(**labels, le=bound)} {count}')
+    lines.append(f'{name}_sum{metric_labels(**labels)} {histogram.total:.6f}')
+    lines.append(f'{name}_count{metric_labels(**labels)} {histogram.count}')
+    return lines
+
+def render_metrics():
+    """Whole /metrics page: request metrics plus the cache and pool counters"""
+    lines = request_metrics.render()
+    for prefix, stats in [
+        ('meetmate_connection_pool', connection_pool.stats()),
+        ('meetmate_availability_index', availability_index.stats()),
+        ('meetmate_room_catalog', room_catalog.stats()),
+        ('meetmate_user_cache', user_cache.stats()),
+    ]:
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                lines.append(f'# TYPE {prefix}_{key} gauge')
+                lines.append(f'{prefix}_{key} {value}')
+    return '\n'.join(lines) + '\n'
+
+@app.before_request
+def start_request_timer():
+    """Note when the request started"""
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Add the request to the metrics (and show its numbers in debug mode)"""
+    # A streamed response is still being sent, so only the work done
+    # before its first chunk is counted
+    seconds = time.perf_counter() - g.get('request_started', time.perf_counter())
+    connection = g.get('db')
+    statements = connection.statements if connection is not None else 0
+    sql_seconds = connection.sql_seconds if connection is not None else 0.0
+    
+    request_metrics.observe(request.endpoint or 'unmatched', request.method, response.status_code,
+                            seconds, statements, sql_seconds)
+    
+    show_headers = app.config['METRICS_RESPONSE_HEADERS']
+    if show_headers or (show_headers is None and app.debug):
+        response.headers['X-SQL-Statements'] = str(statements)
+        response.headers['X-SQL-Time'] = f'{sql_seconds * 1000:.2f}ms'
+        response.headers['X-Response-Time'] = f'{seconds * 1000:.2f}ms'
+    return response
+
+# ============================================================================
+# SLOW QUERY LOG
+# ============================================================================
+
+# Runs of placeholders / literals that are folded together so the same query
+# built with a different number of values is grouped as one
+SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+SQL_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+SQL_VALUES_LIST = re.compile(r"\(\?(?:, \.\.\.)?\)(?:\s*,\s*\(\?(?:, \.\.\.)?\))+")
+# "FROM bookings b" / "JOIN rooms AS r" - for mapping plan aliases back to tables
+SQL_TABLE_ALIAS = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+SQL_KEYWORDS = {'where', 'join', 'left', 'inner', 'cross', 'on', 'group', 'order', 'limit',
+                'set', 'values', 'select', 'union', 'using', 'natural', 'default', 'as'}
+
+def fold_placeholder_lists(sql):
+    """One-line SQL with IN (?, ?, ...) lists and VALUES (?, ?), (?, ?) rows folded
+    
+    Statements that differ only in how many values they bind get the same text.
+    """
+    sql = SQL_PLACEHOLDER_LIST.sub('?, ...', ' '.join(sql.split()))
+    return SQL_VALUES_LIST.sub(lambda match: match.group(0).split('),')[0] + '), ...', sql)
+
+def normalise_sql(sql):
+    """One-line SQL with literals replaced by ? and value lists folded"""
+    sql = SQL_STRING_LITERAL.sub('?', sql)
+    sql = SQL_NUMBER_LITERAL.sub('?', sql)
+    return fold_placeholder_lists(sql)
+
+def parameter_shape(parameters):
+    """Types of the bound values, e.g. '(str, int)' - never the values themselves"""
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{name}: {type(value).__name__}' for name, value in parameters.items()) + '}'
+    types = [type(value).__name__ for value in parameters]
+    if len(types) <= 8:
+        return '(' + ', '.join(types) + ')'
+    # Long lists (IN (...), VALUES batches) as counts per type
+    return '(' + ', '.join(f'{count} x {name}' for name, count in Counter(types).items()) + ')'
+
+def query_plan_scans(sql, plan):
+    """Tables read by a full scan in an EXPLAIN QUERY PLAN result"""
+    aliases = {}
+    for table, alias in SQL_TABLE_ALIAS.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+    
+    scans = []
+    for line in plan:
+        # "SCAN b" is a full scan; "SCAN b USING INDEX ..." walks an index
+        words = line.split()
+        if len(words) == 2 and words[0] == 'SCAN':
+            scans.append(aliases.get(words[1].lower(), words[1].lower()))
+    return scans
+
+def calling_function():
+    """Name of the app function that ran the statement being logged"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename == __file__ and code.co_name not in ('execute', 'executemany', 'check',
+                                                                 'calling_function', 'write_entry'):
+            return code.co_name
+        frame = frame.f_back
+    return None
+
+class SlowQueryLog:
+    """Writes slow statements and watched full scans to the slow query log"""
+    
+    # Distinct SQL shapes whose plan is remembered
+    MAX_PLANS = 1000
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.plans = {}
+        self.logger = None
+        self.path = None
+    
+    def check(self, connection, sql, parameters, seconds, rows=None):
+        """Log the statement if it was slow or fully scanned a watched table"""
+        threshold = app.config['SLOW_QUERY_MS']
+        if threshold is None:
+            return
+        
+        slow = seconds * 1000 >= threshold
+        if not slow:
+            # Cheap test first: most statements never mention a watched table
+            watched = app.config['SLOW_QUERY_WATCH_TABLES']
+            if not watched or not any(table in sql for table in watched):
+                return
+        
+        plan, scans = self.explain(connection, sql, parameters)
+        watched_scans = [table for table in scans if table in app.config['SLOW_QUERY_WATCH_TABLES']]
+        if not slow and not watched_scans:
+            return
+        
+        self.write_entry({
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'ms': round(seconds * 1000, 3),
+            'sql': normalise_sql(sql),
+            'params': parameter_shape(parameters),
+            'rows': rows,
+            'endpoint': (request.endpoint or 'unmatched') if has_request_context() else None,
+            'caller': calling_function(),
+            'plan': plan,
+            'full_scans': watched_scans,
+        })
+    
+    def explain(self, connection, sql, parameters):
+        """(plan lines, fully scanned tables), remembered per SQL shape
+        
+        IN lists and VALUES batches of any length share one entry, so they
+        are explained once rather than once per number of values.
+        """
+        key = fold_placeholder_lists(sql)
+        with self.lock:
+            known = self.plans.get(key)
+        if known is not None:
+            return known
+        
+        # A plain cursor, so this statement is not timed or checked itself
+        cursor = sqlite3.Cursor(connection)
+        try:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, parameters)
+            rows = cursor.fetchall()
+        except (sqlite3.Error, ValueError):
+            # Not explainable (e.g. several statements); do not try again
+            rows = []
+        finally:
+            cursor.close()
+        
+        # Rows are (id, parent, notused, detail); indent children under parents
+        depth = {0: -1}
+        plan = []
+        for row in rows:
+            depth[row[0]] = depth.get(row[1], -1) + 1
+            plan.append('  ' * depth[row[0]] + row[3])
+        known = (plan, query_plan_scans(sql, [line.strip() for line in plan]))
+        
+        with self.lock:
+            if len(self.plans) >= self.MAX_PLANS:
+                self.plans.clear()
+            self.plans[key] = known
+        return known
+    
+    def get_logger(self):
+        """Logger writing to the configured file (set up on first use)"""
+        path = get_slow_query_log_path()
+        with self.lock:
+            if self.path != path:
+                logger = logging.getLogger('meetmate.slow_queries')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                for handler in list(logger.handlers):
+                    logger.removeHandler(handler)
+                    handler.close()
+                handler = RotatingFileHandler(path, maxBytes=app.config['SLOW_QUERY_LOG_BYTES'],
+                                              backupCount=app.config['SLOW_QUERY_LOG_BACKUPS'],
+                                              encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+                self.logger = logger
+                self.path = path
+            return self.logger
+    
+    def write_entry(self, entry):
+        """Append one JSON line to the log file"""
+        self.get_logger().info(json.dumps(entry))
+
+slow_query_log = SlowQueryLog()
+
+def get_slow_query_log_path():
+    """Slow query log file (instance/slow_queries.log unless configured)"""
+    if app.config.get('SLOW_QUERY_LOG'):
+        return app.config['SLOW_QUERY_LOG']
+    instance_directory = os.path.join(app.root_path, 'instance')
+    os.makedirs(instance_directory, exist_ok=True)
+    return os.path.join(instance_directory, 'slow_queries.log')
+
+def read_slow_query_entries():
+    """Every entry in the log file and its rotated backups, oldest first"""
+    path = get_slow_query_log_path()
+    paths = [f'{path}.{number}' for number in range(app.config['SLOW_QUERY_LOG_BACKUPS'], 0, -1)]
+    paths.append(path)
+    
+    for file_path in paths:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding='utf-8') as log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and 'sql' in entry and 'ms' in entry:
+                    yield entry
+
+def summarise_slow_queries(limit=20, sort='total'):
+    """Logged statements grouped by normalised SQL, worst first
+    
+    sort is 'total' (time summed over all runs), 'max' or 'count'.
+    """
+    groups = {}
+    for entry in read_slow_query_entries():
+        group = groups.get(entry['sql'])
+        if group is None:
+            group = groups[entry['sql']] = {
+                'sql': entry['sql'],
+                'count': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'sources': set(),
+                'params': set(),
+                'full_scans': set(),
+                'plan': [],
+                'last_seen': None,
+            }
+        group['count'] += 1
+        group['total_ms'] += entry['ms']
+        group['max_ms'] = max(group['max_ms'], entry['ms'])
+        # "view" or "view > helper function" (no view outside a request)
+        endpoint = entry.get('endpoint') or 'cli'
+        caller = entry.get('caller')
+        group['sources'].add(endpoint if caller in (None, endpoint) else f'{endpoint} > {caller}')
+        if entry.get('params'):
+            group['params'].add(entry['params'])
+        group['full_scans'].update(entry.get('full_scans') or [])
+        # Newest plan wins (it may have changed after adding an index)
+        group['plan'] = entry.get('plan') or group['plan']
+        group['last_seen'] = entry.get('time')
+    
+    sort_keys = {'total': 'total_ms', 'max': 'max_ms', 'count': 'count'}
+    summary = sorted(groups.values(), key=lambda group: group[sort_keys[sort]], reverse=True)[:limit]
+    for group in summary:
+        group['total_ms'] = round(group['total_ms'], 1)
+        group['average_ms'] = round(group['total_ms'] / group['count'], 1)
+        for key in ['sources', 'params', 'full_scans']:
+            group[key] = sorted(group[key])
+    return summary
+
+@app.cli.command('slow-queries')
+@click.option('--top', default=20, show_default=True, help='Number of queries to show')
+@click.option('--sort', type=click.Choice(['total', 'max', 'count']), default='total', show_default=True)
+def slow_queries_command(top, sort):
+    """Summarise the slow query log, worst queries first"""
+    summary = summarise_slow_queries(top, sort)
+    if not summary:
+        click.echo(f"No entries in {get_slow_query_log_path()}")
+        return
+    
+    for number, group in enumerate(summary, start=1):
+        scans = f"  FULL SCAN: {', '.join(group['full_scans'])}" if group['full_scans'] else ''
+        click.echo(f"{number}. {group['count']} runs, {group['total_ms']} ms total, "
+                   f"{group['average_ms']} ms average, {group['max_ms']} ms max{scans}")
+        click.echo(f"   {group['sql']}")
+        click.echo(f"   from: {', '.join(group['sources'])}")
+        for line in group['plan']:
+            click.echo(f"     {line}")
+        click.echo('')
+
+# ============================================================================
+# REQUEST PROFILER
+# ============================================================================
+
+# Profile files are named <time>_<endpoint>_<milliseconds>ms.prof
+PROFILE_NAME_PATTERN = re.compile(r'^(\d{8}-\d{6}-\d{6})_(\w+)_(\d+)ms\.prof$')
+
+def get_profile_directory():
+    """Directory the request profiles are saved in"""
+    directory = app.config.get('PROFILE_DIRECTORY') or os.path.join(app.root_path, 'instance', 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def profile_requested():
+    """Should this request be profiled?"""
+    rate = app.config['PROFILE_SAMPLE_RATE']
+    if rate and random.random() < rate:
+        return True
+    
+    # On demand, for admins only (anyone else could slow the server down)
+    if request.args.get('_profile') == '1' or request.headers.get('X-Profile') == '1':
+        user = get_current_user()
+        return bool(user and user['role'] == 'admin')
+    return False
+
+@app.before_request
+def start_profiler():
+    """Run the request under cProfile when it was picked or asked for"""
+    if profile_requested():
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running in this thread
+            return
+        g.profiler = profiler
+
+@app.after_request
+def save_profile(response):
+    """Write the request's profile to the profile directory"""
+    # Like the metrics, a streamed response is only profiled up to its first chunk
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    
+    milliseconds = round((time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000)
+    name = f"{datetime.now():%Y%m%d-%H%M%S-%f}_{request.endpoint or 'unmatched'}_{milliseconds}ms.prof"
+    directory = get_profile_directory()
+    try:
+        profiler.dump_stats(os.path.join(directory, name))
+        prune_profiles(directory)
+    except OSError:
+        app.logger.exception("Could not save request profile")
+    return response
+
+def prune_profiles(directory):
+    """Delete the oldest profiles beyond PROFILE_KEEP"""
+    names = sorted(name for name in os.listdir(directory) if PROFILE_NAME_PATTERN.match(name))
+    for name in names[:max(0, len(names) - app.config['PROFILE_KEEP'])]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+def list_profiles():
+    """Saved profiles, newest first"""
+    directory = get_profile_directory()
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        match = PROFILE_NAME_PATTERN.match(name)
+        if not match:
+            continue
+        profiles.append({
+            'name': name,
+            'time': datetime.strptime(match.group(1), '%Y%m%d-%H%M%S-%f').strftime('%Y-%m-%d %H:%M:%S'),
+            'endpoint': match.group(2),
+            'milliseconds': int(match.group(3)),
+            'size_kb': round(os.path.getsize(os.path.join(directory, name)) / 1024, 1),
+        })
+    return profiles
+
+def profile_function_label(file_name, line_number, function_name):
+    """Short "file:line(function)" label for a profile row"""
+    if file_name == '~':
+        # Built-in functions, e.g. <method 'execute' of 'sqlite3.Cursor' objects>
+        return re.sub(r' at 0x[0-9a-f]+', '', function_name)
+    if file_name.startswith(app.root_path):
+        file_name = os.path.relpath(file_name, app.root_path)
+    elif 'site-packages' in file_name:
+        file_name = file_name.split('site-packages' + os.sep, 1)[1]
+    return f"{file_name}:{line_number}({function_name})"
+
+def read_profile(name, sort='cumulative', limit=40):
+    """Top functions of a saved profile, or None if there is no such profile"""
+    if not PROFILE_NAME_PATTERN.match(name):
+        return None
+    path = os.path.join(get_profile_directory(), name)
+    if not os.path.exists(path):
+        return None
+    
+    stats = pstats.Stats(path, stream=io.StringIO())
+    # Each entry: (file, line, function) -> (primitive calls, calls, own time, cumulative time, callers)
+    rows = []
+    for (file_name, line_number, function_name), (primitive_calls, calls, own_time, total_time, callers) in stats.stats.items():
+        rows.append({
+            'function': profile_function_label(file_name, line_number, function_name),
+            'calls': str(calls) if calls == primitive_calls else f"{calls}/{primitive_calls}",
+            'own_ms': round(own_time * 1000, 2),
+            'cumulative_ms': round(total_time * 1000, 2),
+            'per_call_ms': round(total_time * 1000 / calls, 3) if calls else 0,
+        })
+    sort_key = 'own_ms' if sort == 'own' else 'cumulative_ms'
+    rows.sort(key=lambda row: row[sort_key], reverse=True)
+    return {
+        'name': name,
+        'total_calls': stats.total_calls,
+        'total_ms': round(stats.total_tt * 1000, 1),
+        'functions': rows[:limit],
+    }
+
+# ============================================================================
+# AUTHENTICATION DECORATORS
+# ============================================================================
+
+def login_required(f):
+    """Decorator to ensure user is logged in"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            flash('Please login to access this page', 'error')
+            return redirect(url_for('login'))
+        
+        user = get_current_user()
+        if not user:
+            session.clear()
+            flash('Your account is no longer valid. Please login again.', 'warning')
+            return redirect(url_for('login'))
+        
+        return f(*args, **kwargs)
+    return decorated_function
+
+def admin_required(f):
+    """Decorator to ensure user is admin"""
+    @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session or session.get('role') != 'admin':
             flash('Admin access required for this page', 'error')
             return redirect(url_for('dashboard'))
         
-        user=get_user_by_id(session['user_id'])
+        user = get_current_user()
         if not user or user['role'] != 'admin':
             session.clear()
             flash('Admin session expired. Please login again.', 'warning')
@@ -390,6 +2793,27 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def api_admin_required(f):
+    """Like admin_required, but answers API clients with a JSON 401 / 403"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user = get_current_user()
+        if not user:
+            return jsonify(error='Login required'), 401
+        if user['role'] != 'admin':
+            return jsonify(error='Admin access required'), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+def api_login_required(f):
+    """Like login_required, but answers API clients with a JSON 401"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session or not get_current_user():
+            return jsonify(error='Login required'), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
 # ============================================================================
 # ROUTES - MAIN APPLICATION
 # ============================================================================
@@ -441,18 +2865,13 @@ def register():
         flash('Email already registered. Please use a different email.', 'error')
         return redirect(url_for('register'))
     
-    # Create username from email
-    username = email.split('@')[0]
-    base_username = username
-    counter = 1
-    while get_user_by_username(username):
-        username = f"{base_username}{counter}"
-        counter += 1
-    
     # Create user account
     connection = get_database_connection()
     cursor = connection.cursor()
     
+    # Create username from email (then username1, username2, ... if taken)
+    username = allocate_usernames(cursor, [email.split('@')[0]])[0]
+    
     try:
         password_hash = generate_password_hash(password)
         cursor.execute('''
@@ -530,15 +2949,13 @@ def dashboard():
     user_id = session['user_id']
     
     # Get current user information
-    user = get_user_by_id(user_id)
+    user = get_current_user()
     if not user:
         flash('User not found', 'error')
         return redirect(url_for('logout'))
     
-    # Get current date and time for comparison
-    now = datetime.now()
-    current_date = now.date()
-    current_time = now.time()
+    # can_cancel / status columns, all worked out against the same "now"
+    status_columns, status_params = booking_status_columns()
     
     # Initialize variables for today's and upcoming bookings
     today_bookings = []
@@ -562,23 +2979,25 @@ def dashboard():
         next_week_str = next_week.strftime('%Y-%m-%d')
         
         # Get today's bookings with user and room information
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT 
                 b.id,
                 b.date,
                 b.time_start,
                 b.time_end,
+                b.start_minute,
                 b.notes,
                 u.username,
                 r.name as room_name,
-                admin.username as admin_name
+                admin.username as admin_name,
+                {status_columns}
             FROM bookings b
             JOIN users u ON b.user_id = u.id
             JOIN rooms r ON b.room_id = r.id
             LEFT JOIN users admin ON b.booking_admin_id = admin.id
             WHERE b.date = ?
             ORDER BY b.time_start
-        ''', (today_str,))
+        ''', status_params + [today_str])
         
         for row in cursor.fetchall():
             booking = dict(row)
@@ -588,30 +3007,21 @@ def dashboard():
             else:
                 booking['booked_by'] = "Self"
             
-            # Add time-based logic for today's bookings
-            booking_date = date.fromisoformat(booking['date'])
-            booking_start_time = time.fromisoformat(booking['time_start'] + ':00' if len(booking['time_start']) == 5 else booking['time_start'])
-            
-            if booking_date == current_date:
-                booking['can_cancel'] = current_time < booking_start_time
-                booking['status'] = 'Complete' if current_time >= booking_start_time else None
-            else:
-                booking['can_cancel'] = True
-                booking['status'] = None
-                
             today_bookings.append(booking)
         
         # Get upcoming bookings (next 7 days)
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT 
                 b.id,
                 b.date,
                 b.time_start,
                 b.time_end,
+                b.start_minute,
                 b.notes,
                 u.username,
                 r.name as room_name,
-                admin.username as admin_name
+                admin.username as admin_name,
+                {status_columns}
             FROM bookings b
             JOIN users u ON b.user_id = u.id
             JOIN rooms r ON b.room_id = r.id
@@ -619,7 +3029,7 @@ def dashboard():
             WHERE b.date >= ? AND b.date <= ?
             ORDER BY b.date, b.time_start
             LIMIT 10
-        ''', (tomorrow_str, next_week_str))
+        ''', status_params + [tomorrow_str, next_week_str])
         
         for row in cursor.fetchall():
             booking = dict(row)
@@ -632,10 +3042,6 @@ def dashboard():
             booking_date = date.fromisoformat(booking['date'])
             booking['formatted_date'] = booking_date.strftime('%a, %b %d')
             
-            # Add time-based logic for upcoming bookings (all future bookings can be cancelled)
-            booking['can_cancel'] = True
-            booking['status'] = None
-            
             upcoming_bookings.append(booking)
     else:
         # For regular users, get their today's and upcoming bookings
@@ -651,53 +3057,46 @@ def dashboard():
         next_week_str = next_week.strftime('%Y-%m-%d')
         
         # Get user's today's bookings
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT 
                 b.id,
                 b.date,
                 b.time_start,
                 b.time_end,
+                b.start_minute,
                 b.notes,
                 r.name as room_name,
-                r.location as room_location
+                r.location as room_location,
+                {status_columns}
             FROM bookings b
             JOIN rooms r ON b.room_id = r.id
             WHERE b.user_id = ? AND b.date = ?
             ORDER BY b.time_start
-        ''', (user_id, today_str))
+        ''', status_params + [user_id, today_str])
         
         for row in cursor.fetchall():
             booking = dict(row)
             
-            # Add time-based logic for today's bookings
-            booking_date = date.fromisoformat(booking['date'])
-            booking_start_time = time.fromisoformat(booking['time_start'] + ':00' if len(booking['time_start']) == 5 else booking['time_start'])
-            
-            if booking_date == current_date:
-                booking['can_cancel'] = current_time < booking_start_time
-                booking['status'] = 'Complete' if current_time >= booking_start_time else None
-            else:
-                booking['can_cancel'] = True
-                booking['status'] = None
-                
             user_today_bookings.append(booking)
         
         # Get user's upcoming bookings (next 7 days)
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT 
                 b.id,
                 b.date,
                 b.time_start,
                 b.time_end,
+                b.start_minute,
                 b.notes,
                 r.name as room_name,
-                r.location as room_location
+                r.location as room_location,
+                {status_columns}
             FROM bookings b
             JOIN rooms r ON b.room_id = r.id
             WHERE b.user_id = ? AND b.date >= ? AND b.date <= ?
             ORDER BY b.date, b.time_start
             LIMIT 10
-        ''', (user_id, tomorrow_str, next_week_str))
+        ''', status_params + [user_id, tomorrow_str, next_week_str])
         
         for row in cursor.fetchall():
             booking = dict(row)
@@ -705,10 +3104,6 @@ def dashboard():
             booking_date = date.fromisoformat(booking['date'])
             booking['formatted_date'] = booking_date.strftime('%a, %b %d')
             
-            # Add time-based logic for upcoming bookings (all future bookings can be cancelled)
-            booking['can_cancel'] = True
-            booking['status'] = None
-            
             user_upcoming_bookings.append(booking)
     
     connection.close()
@@ -733,7 +3128,8 @@ def booking():
         # Show room type selection
         room_types = get_all_room_types()
         current_date = datetime.now().strftime('%Y-%m-%d')
-        return render_template('booking.html', room_types=room_types, current_date=current_date)
+        return render_template('booking.html', room_types=room_types, current_date=current_date,
+                             slot_minutes=app.config['BOOKING_SLOT_MINUTES'])
     
     # Process room type selection (POST request)
     room_type = request.form.get('room_type')
@@ -745,17 +3141,10 @@ def booking():
         flash('Please fill in all required fields.', 'error')
         return redirect(url_for('booking'))
     
-    # Validate booking duration (must be 1-8 hours)
-    try:
-        start_hour = int(time_start.split(':')[0])
-        end_hour = int(time_end.split(':')[0])
-        duration = end_hour - start_hour
-        
-        if duration < 1 or duration > 8:
-            flash(f'Booking duration must be between 1 and 8 hours (you selected {duration} hours)', 'error')
-            return redirect(url_for('booking'))
-    except (ValueError, IndexError):
-        flash('Invalid time format. Please try again.', 'error')
+    # Validate booking times (1-8 hours, on the slot grid)
+    duration, error_message = validate_booking_times(time_start, time_end)
+    if error_message:
+        flash(error_message, 'error')
         return redirect(url_for('booking'))
     
     # Store booking details in session and redirect to room selection
@@ -788,17 +3177,48 @@ def select_room():
             booking_data['time_end']
         )
         
-        if not available_rooms:
-            flash(f'No {booking_data["room_type"]} rooms are available for the selected date and time. Please choose a different time.', 'error')
-            return redirect(url_for('booking'))
+        # Nothing free - offer the nearest free slots instead of sending the user back
+        suggestions = []
+        if not available_rooms:
+            suggestions = suggest_slots(booking_data['room_type'], booking_data['date'],
+                                        booking_data['time_start'], booking_data['time_end'])
+            if not suggestions:
+                flash(f'No {booking_data["room_type"]} rooms are available for the selected date and time. Please choose a different time.', 'error')
+                return redirect(url_for('booking'))
         
         return render_template('select_room.html', 
                              rooms=available_rooms, 
+                             suggestions=suggestions,
                              booking_data=booking_data)
     
     # Process room selection (POST request)
     room_id = request.form.get('room_id')
     
+    # A suggested slot brings its own room, date and time ("room_id|date|start|end")
+    suggestion = request.form.get('suggestion', '')
+    if suggestion:
+        try:
+            room_id, suggested_date, time_start, time_end = suggestion.split('|')
+        except ValueError:
+            room_id, suggested_date = None, ''
+        
+        # The suggestion comes back from the browser - it must name a room
+        # of the type being booked and a plain YYYY-MM-DD date
+        room = get_room_by_id(room_id)
+        parsed_date = parse_booking_date(suggested_date)
+        if not room or room['room_type'] != booking_data['room_type'] or not parsed_date:
+            flash('Invalid suggestion. Please try again.', 'error')
+            return redirect(url_for('booking'))
+        suggested_date = parsed_date.isoformat()
+        
+        duration, error_message = validate_booking_times(time_start, time_end)
+        if error_message:
+            flash(error_message, 'error')
+            return redirect(url_for('booking'))
+        
+        booking_data.update(date=suggested_date, time_start=time_start, time_end=time_end, duration=duration)
+        session['booking_data'] = booking_data
+    
     if not room_id:
         flash('Please select a room.', 'error')
         return redirect(url_for('select_room'))
@@ -837,9 +3257,7 @@ def confirm_booking():
         
         if all([room_id, date, time_start, time_end]):
             # Reconstruct session data from form
-            start_hour = int(time_start.split(':')[0])
-            end_hour = int(time_end.split(':')[0])
-            duration = end_hour - start_hour
+            duration = duration_in_hours(time_start, time_end)
             
             session['booking_data'] = {
                 'room_id': room_id,
@@ -877,9 +3295,7 @@ def confirm_booking():
     room = get_room_by_id(booking_data['room_id'])
     
     # Calculate duration for payment page
-    start_hour = int(booking_data['time_start'].split(':')[0])
-    end_hour = int(booking_data['time_end'].split(':')[0])
-    duration = end_hour - start_hour
+    duration = duration_in_hours(booking_data['time_start'], booking_data['time_end'])
     
     # Show payment page
     return render_template(
@@ -909,13 +3325,7 @@ def process_payment():
     # Get booking data from session
     booking_data = session.pop('booking_data')  # Remove from session since we're processing it
     
-    # Double-check that room is still available
-    if not check_room_availability(booking_data['room_id'], booking_data['date'], 
-                                  booking_data['time_start'], booking_data['time_end']):
-        flash('Sorry, this room was just booked by someone else. Please select another time.', 'error')
-        return redirect(url_for('booking'))
-    
-    # Create the booking in the database
+    # Create the booking in the database (checks availability atomically)
     booking_id = create_booking(
         user_id=session['user_id'],
         room_id=booking_data['room_id'],
@@ -926,6 +3336,10 @@ def process_payment():
         notes=None
     )
     
+    if isinstance(booking_id, BookingConflict):
+        flash('Sorry, this room was just booked by someone else. Please select another time.', 'error')
+        return redirect(url_for('booking'))
+    
     if not booking_id:
         flash('Failed to create booking. Please try again.', 'error')
         return redirect(url_for('booking'))
@@ -970,22 +3384,209 @@ def cancel_booking(booking_id):
     
     # Delete the booking
     try:
-        cursor.execute("DELETE FROM bookings WHERE id = ?", (booking_id,))
-        connection.commit()
+        with write_transaction(connection) as write_cursor:
+            write_cursor.execute("DELETE FROM bookings WHERE id = ?", (booking_id,))
+            version = get_change_counter(write_cursor, 'bookings')
+        availability_index.forget_booking(booking['room_id'], booking['date'], booking_id, version)
         flash('Booking cancelled successfully', 'success')
     except Exception as error:
-        connection.rollback()
         flash(f'Failed to cancel booking: {error}', 'error')
     finally:
         connection.close()
     
     return redirect(url_for('dashboard'))
 
+@app.route('/reschedule/<int:booking_id>', methods=['GET', 'POST'])
+@login_required
+def reschedule(booking_id):
+    """Move a booking to a new room, date or time in one step"""
+    # Where to go when we are done
+    if session.get('role') == 'admin':
+        back_url = url_for('admin', tab='bookings')
+    else:
+        back_url = url_for('history')
+    
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    status_columns, status_params = booking_status_columns()
+    cursor.execute(f'''
+        SELECT b.*, r.name as room_name, {status_columns}
+        FROM bookings b
+        JOIN rooms r ON b.room_id = r.id
+        WHERE b.id = ?
+    ''', status_params + [booking_id])
+    booking = cursor.fetchone()
+    connection.close()
+    
+    if not booking:
+        flash('Booking not found', 'error')
+        return redirect(back_url)
+    booking = dict(booking)
+    
+    # Check permissions - users can only move their own bookings
+    if booking['user_id'] != session['user_id'] and session.get('role') != 'admin':
+        flash('You do not have permission to change this booking', 'error')
+        return redirect(url_for('dashboard'))
+    
+    # Bookings that have started can no longer be moved
+    if not booking['can_cancel']:
+        flash('This booking has already started and cannot be rescheduled.', 'error')
+        return redirect(back_url)
+    
+    if request.method == 'GET':
+        return render_template('reschedule.html',
+                             booking=booking,
+                             rooms=get_all_rooms(),
+                             current_date=datetime.now().strftime('%Y-%m-%d'),
+                             slot_minutes=app.config['BOOKING_SLOT_MINUTES'])
+    
+    # Process the new room, date and time (POST request)
+    room = get_room_by_id(request.form.get('room_id'))
+    new_date = request.form.get('date', '')
+    time_start = request.form.get('time_start', '')
+    time_end = request.form.get('time_end', '')
+    
+    if not room or not all([new_date, time_start, time_end]):
+        flash('Please fill in all required fields.', 'error')
+        return redirect(url_for('reschedule', booking_id=booking_id))
+    
+    # Same rules as a new booking (1-8 hours, on the slot grid)
+    duration, error_message = validate_booking_times(time_start, time_end)
+    if error_message:
+        flash(error_message, 'error')
+        return redirect(url_for('reschedule', booking_id=booking_id))
+    
+    # Only a plain YYYY-MM-DD date (no time, no compact 20261020 form)
+    try:
+        parsed_date = date.fromisoformat(new_date)
+    except ValueError:
+        parsed_date = None
+    if not parsed_date or parsed_date.isoformat() != new_date:
+        flash('Invalid date (expected YYYY-MM-DD).', 'error')
+        return redirect(url_for('reschedule', booking_id=booking_id))
+    new_date = parsed_date.isoformat()
+    
+    # The new slot must still be ahead of us
+    new_start = datetime.combine(parsed_date, datetime.min.time()) + timedelta(minutes=parse_time_to_minutes(time_start))
+    if new_start <= datetime.now():
+        flash('Please choose a time in the future.', 'error')
+        return redirect(url_for('reschedule', booking_id=booking_id))
+    
+    # Quick check first (ignoring this booking), then move it atomically
+    if not check_room_availability(room['id'], new_date, time_start, time_end, exclude_booking_id=booking_id):
+        result = BookingConflict(room['id'], new_date, time_start, time_end)
+    else:
+        result = reschedule_booking(booking_id, room['id'], new_date, time_start, time_end)
+    
+    if isinstance(result, BookingConflict):
+        flash(f'{room["name"]} is already booked at that time. Please choose another slot.', 'error')
+        return redirect(url_for('reschedule', booking_id=booking_id))
+    
+    if not result:
+        flash('Failed to reschedule booking. Please try again.', 'error')
+        return redirect(url_for('reschedule', booking_id=booking_id))
+    
+    flash(f'Booking moved to {room["name"]} on {new_date}, {time_start} - {time_end}', 'success')
+    return redirect(back_url)
+
+def get_series_for_current_user(series_id):
+    """Get a booking series the logged-in user may change, or None (with a message)"""
+    series = get_booking_series(series_id)
+    if not series:
+        flash('Booking series not found', 'error')
+        return None
+    
+    # Users can only change their own series
+    if series['user_id'] != session['user_id'] and session.get('role') != 'admin':
+        flash('You do not have permission to change this booking series', 'error')
+        return None
+    
+    return series
+
+@app.route('/series/<int:series_id>')
+@login_required
+def booking_series(series_id):
+    """Recurring booking page - cancel or reschedule the whole series"""
+    series = get_series_for_current_user(series_id)
+    if not series:
+        return redirect(url_for('dashboard'))
+    
+    return render_template('series.html',
+                         series=series,
+                         rooms=get_all_rooms(),
+                         current_date=datetime.now().strftime('%Y-%m-%d'),
+                         slot_minutes=app.config['BOOKING_SLOT_MINUTES'])
+
+@app.route('/series/<int:series_id>/cancel', methods=['POST'])
+@login_required
+def cancel_series(series_id):
+    """Cancel all remaining occurrences, or those from a given date onward"""
+    if not get_series_for_current_user(series_id):
+        return redirect(url_for('dashboard'))
+    
+    from_date = None
+    if request.form.get('scope') == 'from':
+        parsed_date = parse_booking_date(request.form.get('from_date', ''))
+        if not parsed_date:
+            flash('Please choose the date to cancel from.', 'error')
+            return redirect(url_for('booking_series', series_id=series_id))
+        from_date = parsed_date.isoformat()
+    
+    cancelled = cancel_booking_series(series_id, from_date)
+    if cancelled is None:
+        flash('Failed to cancel the booking series. Please try again.', 'error')
+    else:
+        flash(f'{cancelled} booking(s) cancelled', 'success')
+    
+    return redirect(url_for('booking_series', series_id=series_id))
+
+@app.route('/series/<int:series_id>/shift', methods=['POST'])
+@login_required
+def shift_series(series_id):
+    """Move the remaining occurrences to another room and/or time"""
+    if not get_series_for_current_user(series_id):
+        return redirect(url_for('dashboard'))
+    
+    time_start = request.form.get('time_start', '')
+    time_end = request.form.get('time_end', '')
+    from_date = request.form.get('from_date') or None
+    room = get_room_by_id(request.form.get('room_id'))
+    
+    if not room:
+        flash('Please select a room.', 'error')
+        return redirect(url_for('booking_series', series_id=series_id))
+    
+    # Same rules as a new booking (1-8 hours, on the slot grid)
+    duration, error_message = validate_booking_times(time_start, time_end)
+    if error_message:
+        flash(error_message, 'error')
+        return redirect(url_for('booking_series', series_id=series_id))
+    
+    if from_date:
+        parsed_date = parse_booking_date(from_date)
+        if not parsed_date:
+            flash('Invalid date (expected YYYY-MM-DD).', 'error')
+            return redirect(url_for('booking_series', series_id=series_id))
+        from_date = parsed_date.isoformat()
+    
+    result = shift_booking_series(series_id, room['id'], time_start, time_end, from_date)
+    if result is None:
+        flash('Failed to reschedule the booking series. Please try again.', 'error')
+    else:
+        moved, conflicts = result
+        if conflicts:
+            dates = ', '.join(conflict['date'] for conflict in conflicts)
+            flash(f'Nothing was changed: {room["name"]} is already booked at that time on {dates}.', 'error')
+        else:
+            flash(f'{moved} booking(s) moved to {room["name"]}, {time_start} - {time_end}', 'success')
+    
+    return redirect(url_for('booking_series', series_id=series_id))
+
 @app.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
     """User profile page"""    # Get current user information
-    user = get_user_by_id(session['user_id'])
+    user = get_current_user()
     
     if not user:
         flash('User not found', 'error')
@@ -1032,53 +3633,1190 @@ def profile():
                 WHERE id = ?
             ''', (new_email, firstname, lastname, dob, address, user['id']))
         
-        connection.commit()
+        connection.commit()
+        invalidate_cached_user(user['id'])
+        
+        # Update session with new user data if update was successful
+        updated_user = get_user_by_id(user['id'])
+        if updated_user:
+            session['username'] = updated_user['username']  # Keep username in session for compatibility
+            
+        flash('Profile updated successfully', 'success')
+        
+    except Exception as error:
+        connection.rollback()
+        flash(f'Failed to update profile: {error}', 'error')
+    finally:
+        connection.close()
+    
+    return redirect(url_for('my_account'))
+
+@app.route('/history')
+@login_required
+def history():
+    """User booking history page"""
+    user_id = session['user_id']
+    
+    # Get all bookings for this user (with cancellation eligibility and status)
+    user_bookings = get_user_bookings(user_id)
+
+    return render_template('history.html', bookings=user_bookings,
+                         calendar_url=calendar_feed_url('user', user_id))
+
+# ============================================================================
+# ADMIN CONSOLE DATA
+# ============================================================================
+
+def get_page_size():
+    """Page size from ?per_page=, kept within the configured limits"""
+    try:
+        size = int(request.args.get('per_page', app.config['ADMIN_PAGE_SIZE']))
+    except ValueError:
+        size = app.config['ADMIN_PAGE_SIZE']
+    return max(1, min(size, app.config['ADMIN_MAX_PAGE_SIZE']))
+
+def get_users_page(limit, after=None, search=None, role=None):
+    """One page of users ordered by username
+    
+    after is the last username of the previous page. Returns (users, next
+    cursor or None).
+    """
+    conditions = []
+    params = []
+    
+    if after:
+        conditions.append("username > ?")
+        params.append(after)
+    if search:
+        conditions.append("(username LIKE ? OR email LIKE ?)")
+        params.extend([f"%{search}%", f"%{search}%"])
+    if role:
+        conditions.append("role = ?")
+        params.append(role)
+    
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    cursor.execute(f'''
+        SELECT * FROM users
+        {where_sql}
+        ORDER BY username
+        LIMIT ?
+    ''', params + [limit + 1])
+    users = [dict(row) for row in cursor.fetchall()]
+    connection.close()
+    
+    # We asked for one extra row to know whether there is a next page
+    if len(users) > limit:
+        users = users[:limit]
+        return users, users[-1]['username']
+    return users, None
+
+def get_rooms_page(limit, after=None, room_type=None):
+    """One page of rooms (from the room catalog) ordered by name
+    
+    after is the ID of the last room on the previous page.
+    """
+    rooms = get_rooms_by_type(room_type) if room_type else get_all_rooms()
+    
+    start = 0
+    if after:
+        for position, room in enumerate(rooms):
+            if str(room['id']) == str(after):
+                start = position + 1
+                break
+    
+    page = rooms[start:start + limit]
+    if start + limit < len(rooms):
+        return page, page[-1]['id']
+    return page, None
+
+def encode_booking_cursor(booking):
+    """Keyset cursor for the booking list: date_time_id"""
+    return f"{booking['date']}_{booking['time_start']}_{booking['id']}"
+
+def decode_booking_cursor(token):
+    """Turn a booking cursor back into (date, time_start, id), or None"""
+    try:
+        booking_date, time_start, booking_id = token.split('_')
+        date.fromisoformat(booking_date)
+        parse_time_to_minutes(time_start)
+        return booking_date, time_start, int(booking_id)
+    except (ValueError, AttributeError):
+        return None
+
+def booking_filter_sql(after=None, date_from=None, date_to=None, room_id=None,
+                       user_id=None, status=None, room_type=None):
+    """WHERE clause and parameters for the admin booking filters
+    
+    after is a cursor from encode_booking_cursor(). status is 'upcoming' or
+    'complete'. Rows come after the cursor in (date, time_start, id) order.
+    """
+    conditions = []
+    params = []
+    
+    keyset = decode_booking_cursor(after) if after else None
+    if keyset:
+        conditions.append("(b.date, b.time_start, b.id) > (?, ?, ?)")
+        params.extend(keyset)
+    if date_from:
+        conditions.append("b.date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("b.date <= ?")
+        params.append(date_to)
+    if room_id:
+        conditions.append("b.room_id = ?")
+        params.append(room_id)
+    if user_id:
+        conditions.append("b.user_id = ?")
+        params.append(user_id)
+    if room_type:
+        conditions.append("b.room_id IN (SELECT id FROM rooms WHERE room_type = ?)")
+        params.append(room_type)
+    if status in ('upcoming', 'complete'):
+        # A booking is complete once its start time has passed
+        started, started_params = booking_started_condition()
+        conditions.append(started if status == 'complete' else f"NOT {started}")
+        params.extend(started_params)
+    
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return where_sql, params
+
+def get_bookings_page(limit, after=None, date_from=None, date_to=None,
+                      room_id=None, user_id=None, status=None, room_type=None):
+    """One page of bookings ordered by (date, time_start, id)
+    
+    Filters are the same as booking_filter_sql(). Returns (bookings, next
+    cursor or None).
+    """
+    where_sql, params = booking_filter_sql(after, date_from, date_to, room_id, user_id, status, room_type)
+    status_columns, status_params = booking_status_columns()
+    
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    cursor.execute(f'''
+        SELECT
+            b.id,
+            b.date,
+            b.time_start,
+            b.time_end,
+            b.start_minute,
+            b.notes,
+            b.series_id,
+            u.username,
+            r.name as room_name,
+            admin.username as admin_name,
+            {status_columns}
+        FROM bookings b
+        JOIN users u ON b.user_id = u.id
+        JOIN rooms r ON b.room_id = r.id
+        LEFT JOIN users admin ON b.booking_admin_id = admin.id
+        {where_sql}
+        ORDER BY b.date, b.time_start, b.id
+        LIMIT ?
+    ''', status_params + params + [limit + 1])
+    bookings = [dict(row) for row in cursor.fetchall()]
+    connection.close()
+    
+    if len(bookings) > limit:
+        bookings = bookings[:limit]
+        return bookings, encode_booking_cursor(bookings[-1])
+    return bookings, None
+
+# ============================================================================
+# BOOKING EXPORT
+# ============================================================================
+
+# Columns of a booking export, in file order
+EXPORT_COLUMNS = [
+    'id', 'date', 'time_start', 'time_end', 'room_id', 'room_name', 'room_type',
+    'user_id', 'username', 'email', 'booked_by', 'notes', 'series_id', 'status', 'cursor',
+]
+
+def iter_booking_export(filters, after=None):
+    """Yield the filtered bookings as batches (lists) of export rows, in cursor order
+    
+    Rows are read EXPORT_BATCH_SIZE at a time. Every batch is a fresh keyset
+    query that starts after the last row sent, so memory stays flat and no
+    read snapshot is held open for the whole download. Each row carries its
+    own cursor - pass the last one back as after= to resume.
+    """
+    batch_size = app.config['EXPORT_BATCH_SIZE']
+    status_columns, status_params = booking_status_columns()
+    
+    while True:
+        where_sql, params = booking_filter_sql(after, **filters)
+        
+        connection = get_database_connection()
+        cursor = connection.cursor()
+        cursor.execute(f'''
+            SELECT
+                b.id,
+                b.date,
+                b.time_start,
+                b.time_end,
+                b.room_id,
+                r.name as room_name,
+                r.room_type,
+                b.user_id,
+                u.username,
+                u.email,
+                admin.username as booked_by,
+                b.notes,
+                b.series_id,
+                {status_columns}
+            FROM bookings b
+            JOIN users u ON b.user_id = u.id
+            JOIN rooms r ON b.room_id = r.id
+            LEFT JOIN users admin ON b.booking_admin_id = admin.id
+            {where_sql}
+            ORDER BY b.date, b.time_start, b.id
+            LIMIT ?
+        ''', status_params + params + [batch_size])
+        rows = cursor.fetchall()
+        connection.close()
+        
+        batch = []
+        for row in rows:
+            booking = dict(row)
+            booking.pop('can_cancel')
+            booking['cursor'] = encode_booking_cursor(booking)
+            batch.append(booking)
+        if batch:
+            yield batch
+        
+        if len(rows) < batch_size:
+            return
+        after = encode_booking_cursor(rows[-1])
+
+def booking_export_csv(batches, header=True):
+    """Turn batches of export rows into CSV text, one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows([row[column] for column in EXPORT_COLUMNS] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    # Header only (no rows)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def booking_export_jsonl(batches):
+    """Turn batches of export rows into JSON lines, one chunk per batch"""
+    for batch in batches:
+        yield ''.join(json.dumps(row) + '\n' for row in batch)
+
+# ============================================================================
+# BULK IMPORT
+# ============================================================================
+
+# What can be imported, and the columns each kind understands
+IMPORT_KINDS = ['rooms', 'users', 'bookings']
+IMPORT_COLUMNS = {
+    'rooms': ['name', 'location', 'capacity', 'room_type'],
+    'users': ['email', 'password', 'firstname', 'lastname', 'dob', 'address', 'role', 'username'],
+    # room: ID or name, user: ID, username or email (an export file also works)
+    'bookings': ['room', 'user', 'date', 'time_start', 'time_end', 'notes'],
+}
+
+VALID_ROOM_TYPES = ['Circle Table', 'Long Table', 'Square Table']
+
+class ImportResult:
+    """Outcome of a bulk import: rows added and the rows that were skipped"""
+    
+    def __init__(self, kind):
+        self.kind = kind
+        self.total = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []  # (line number, message) - only the first IMPORT_MAX_ERRORS
+        self.seconds = 0
+    
+    def add_error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < app.config['IMPORT_MAX_ERRORS']:
+            self.errors.append((line_number, message))
+    
+    def mark(self):
+        """Position in the error list, to undo the errors of a rolled-back chunk"""
+        return self.error_count, len(self.errors)
+    
+    def discard_errors_since(self, mark):
+        self.error_count, kept = mark
+        del self.errors[kept:]
+
+def import_file_format(filename):
+    """'csv' or 'jsonl' from a file name, or None if we cannot read it"""
+    extension = os.path.splitext(filename.lower())[1]
+    if extension == '.csv':
+        return 'csv'
+    if extension in ['.json', '.jsonl', '.ndjson']:
+        return 'jsonl'
+    return None
+
+def clean_import_record(record):
+    """Lower-case keys and stripped string values"""
+    cleaned = {}
+    for key, value in record.items():
+        if key is None:
+            continue  # extra CSV cells without a header
+        if value is None:
+            value = ''
+        cleaned[str(key).strip().lower()] = str(value).strip()
+    return cleaned
+
+def iter_import_records(stream, file_format):
+    """Yield (line number, record, error) for each record of a text stream
+    
+    CSV files need a header row. JSON files hold one object per line; a
+    single JSON array is accepted too, but is read into memory as a whole.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, clean_import_record(record), None
+        return
+    
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        
+        if line_number == 1 and line.startswith('['):
+            try:
+                items = json.loads(line + stream.read())
+            except ValueError as error:
+                yield line_number, None, f'Invalid JSON: {error}'
+                return
+            for number, item in enumerate(items, start=1):
+                if isinstance(item, dict):
+                    yield number, clean_import_record(item), None
+                else:
+                    yield number, None, 'Expected a JSON object'
+            return
+        
+        try:
+            item = json.loads(line)
+        except ValueError as error:
+            yield line_number, None, f'Invalid JSON: {error}'
+            continue
+        if isinstance(item, dict):
+            yield line_number, clean_import_record(item), None
+        else:
+            yield line_number, None, 'Expected a JSON object'
+
+def iter_import_chunks(records, size):
+    """Group records into lists of at most size"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def select_in_batches(cursor, sql, values):
+    """Run a query whose IN list ({placeholders}) is too long for one statement"""
+    rows = []
+    for offset in range(0, len(values), AVAILABILITY_WINDOW_BATCH):
+        batch = values[offset:offset + AVAILABILITY_WINDOW_BATCH]
+        cursor.execute(sql.format(placeholders=', '.join(['?'] * len(batch))), batch)
+        rows.extend(cursor.fetchall())
+    return rows
+
+def allocate_usernames(cursor, bases, reserved=None):
+    """Pick a free username for each base name (the part of an email before @)
+    
+    Same rule as the sign-up pages: the base name if it is free, otherwise
+    base1, base2, ... All existing names that start with a base are read in
+    one query (an index range per base) instead of one lookup per attempt.
+    reserved holds names handed out earlier that are not inserted yet.
+    """
+    reserved = set() if reserved is None else reserved
+    unique_bases = sorted(set(bases))
+    taken = {base: set() for base in unique_bases}  # base -> numbers in use (0 = bare name)
+    
+    # Digits sort before ':', so each range holds base, base1, base25, ...
+    rows = []
+    for offset in range(0, len(unique_bases), AVAILABILITY_WINDOW_BATCH):
+        batch = unique_bases[offset:offset + AVAILABILITY_WINDOW_BATCH]
+        cursor.execute(f'''
+            WITH bases (base) AS (VALUES {', '.join(['(?)'] * len(batch))})
+            SELECT bases.base, u.username
+            FROM bases
+            JOIN users u ON u.username >= bases.base AND u.username < bases.base || ':'
+        ''', batch)
+        rows.extend(cursor.fetchall())
+    for row in rows:
+        suffix = row['username'][len(row['base']):]
+        if suffix == '':
+            taken[row['base']].add(0)
+        elif suffix.isascii() and suffix.isdigit() and not suffix.startswith('0'):
+            taken[row['base']].add(int(suffix))
+    
+    usernames = []
+    next_number = {}
+    for base in bases:
+        number = next_number.get(base, 0)
+        while number in taken[base] or (f"{base}{number}" if number else base) in reserved:
+            number += 1
+        next_number[base] = number + 1
+        username = f"{base}{number}" if number else base
+        reserved.add(username)
+        usernames.append(username)
+    return usernames
+
+def find_existing_emails(cursor, emails):
+    """Lower-cased emails from the list that already have an account"""
+    rows = select_in_batches(cursor, '''
+        SELECT lower(email) as email FROM users
+        WHERE email COLLATE NOCASE IN ({placeholders})
+    ''', emails)
+    return {row['email'] for row in rows}
+
+def import_room_chunk(connection, records, result):
+    """Validate and insert one chunk of rooms"""
+    rows = []
+    for line_number, record in records:
+        name = record.get('name', '')
+        location = record.get('location', '')
+        room_type = record.get('room_type', '')
+        
+        if not name or not location or not room_type:
+            result.add_error(line_number, 'Room name, location, and room type are required')
+            continue
+        if room_type not in VALID_ROOM_TYPES:
+            result.add_error(line_number, f'Invalid room type: {room_type}')
+            continue
+        try:
+            capacity = int(record.get('capacity', ''))
+        except ValueError:
+            result.add_error(line_number, 'Room capacity must be a valid number')
+            continue
+        if capacity <= 0:
+            result.add_error(line_number, 'Room capacity must be a positive number')
+            continue
+        
+        rows.append((name, location, capacity, room_type))
+    
+    with write_transaction(connection) as cursor:
+        cursor.executemany('''
+            INSERT INTO rooms (name, location, capacity, room_type)
+            VALUES (?, ?, ?, ?)
+        ''', rows)
+    return len(rows)
+
+def import_user_chunk(connection, records, result, seen_emails, executor):
+    """Validate, hash passwords for and insert one chunk of users
+    
+    Passwords are hashed by the worker pool before the write transaction
+    starts, so the database is only locked for the quick part.
+    """
+    candidates = []
+    explicit_usernames = []
+    for line_number, record in records:
+        email = record.get('email', '')
+        role = record.get('role') or 'user'
+        
+        if not email or not record.get('firstname') or not record.get('lastname') or not record.get('password'):
+            result.add_error(line_number, 'Email, first name, last name, and password are required')
+            continue
+        if role not in ['user', 'admin']:
+            result.add_error(line_number, f'Invalid role: {role}')
+            continue
+        if email.lower() in seen_emails:
+            result.add_error(line_number, f'Email {email} appears more than once in the file')
+            continue
+        
+        seen_emails.add(email.lower())
+        candidates.append((line_number, record, role))
+        if record.get('username'):
+            explicit_usernames.append(record['username'])
+    
+    cursor = connection.cursor()
+    existing_emails = find_existing_emails(cursor, [record['email'] for _, record, _ in candidates])
+    existing_usernames = {row['username'] for row in select_in_batches(
+        cursor, 'SELECT username FROM users WHERE username IN ({placeholders})', explicit_usernames)}
+    
+    accepted = []
+    reserved = set()
+    for line_number, record, role in candidates:
+        if record['email'].lower() in existing_emails:
+            result.add_error(line_number, f"Email {record['email']} is already registered")
+            continue
+        username = record.get('username')
+        if username and (username in existing_usernames or username in reserved):
+            result.add_error(line_number, f'Username {username} is already taken')
+            continue
+        if username:
+            reserved.add(username)
+        accepted.append((line_number, record, role))
+    
+    password_hashes = list(executor.map(generate_password_hash, [record['password'] for _, record, _ in accepted]))
+    
+    with write_transaction(connection) as cursor:
+        # Generated usernames must not take a name given explicitly in the file
+        wanted = [record['email'].split('@')[0] for _, record, _ in accepted if not record.get('username')]
+        generated = iter(allocate_usernames(cursor, wanted, reserved))
+        
+        rows = []
+        for (line_number, record, role), password_hash in zip(accepted, password_hashes):
+            username = record.get('username') or next(generated)
+            rows.append((username, record['email'], password_hash, record['firstname'], record['lastname'],
+                         record.get('dob', ''), record.get('address', ''), role))
+        
+        cursor.executemany('''
+            INSERT INTO users (username, email, password, firstname, lastname, dob, address, role)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+    return len(rows)
+
+def import_booking_chunk(connection, records, result, admin_id=None):
+    """Validate and insert one chunk of bookings
+    
+    Rooms come from the room catalog, users are looked up with one query
+    per kind of reference, and clashes with existing bookings are found
+    with find_slot_conflicts. Rows of the same chunk that overlap each
+    other are caught in memory - the first one in the file wins.
+    """
+    catalog = room_catalog.get()
+    rooms_by_name = {}
+    for room in catalog.rooms:
+        rooms_by_name.setdefault(room['name'].lower(), room)
+    
+    candidates = []
+    for line_number, record in records:
+        room_reference = record.get('room_id') or record.get('room') or record.get('room_name') or ''
+        user_reference = (record.get('user_id') or record.get('user') or record.get('username')
+                          or record.get('email') or '')
+        
+        if not room_reference or not user_reference:
+            result.add_error(line_number, 'Room and user are required')
+            continue
+        
+        if room_reference.isdigit():
+            room = catalog.by_id.get(int(room_reference))
+        else:
+            room = rooms_by_name.get(room_reference.lower())
+        if not room:
+            result.add_error(line_number, f'Room not found: {room_reference}')
+            continue
+        
+        try:
+            booking_date = date.fromisoformat(record.get('date', '')).isoformat()
+        except ValueError:
+            result.add_error(line_number, 'Invalid date (expected YYYY-MM-DD)')
+            continue
+        
+        time_start = record.get('time_start', '')
+        time_end = record.get('time_end', '')
+        duration, error = validate_booking_times(time_start, time_end)
+        if error:
+            result.add_error(line_number, error)
+            continue
+        
+        candidates.append({
+            'line': line_number,
+            'room_id': room['id'],
+            'user': user_reference,
+            'date': booking_date,
+            'start': parse_time_to_minutes(time_start),
+            'end': parse_time_to_minutes(time_end),
+            'notes': record.get('notes') or None,
+        })
+    
+    with write_transaction(connection) as cursor:
+        # Resolve user references: IDs, emails and usernames, one query each
+        ids = [c['user'] for c in candidates if c['user'].isdigit()]
+        emails = [c['user'] for c in candidates if '@' in c['user']]
+        usernames = [c['user'] for c in candidates if not c['user'].isdigit() and '@' not in c['user']]
+        user_ids = {}
+        for row in select_in_batches(cursor, 'SELECT id FROM users WHERE id IN ({placeholders})', ids):
+            user_ids[str(row['id'])] = row['id']
+        for row in select_in_batches(cursor, '''
+            SELECT id, lower(email) as email FROM users WHERE email COLLATE NOCASE IN ({placeholders})
+        ''', emails):
+            user_ids[row['email']] = row['id']
+        for row in select_in_batches(cursor, 'SELECT id, username FROM users WHERE username IN ({placeholders})', usernames):
+            user_ids[row['username']] = row['id']
+        
+        resolved = []
+        for candidate in candidates:
+            user_id = user_ids.get(candidate['user'].lower() if '@' in candidate['user'] else candidate['user'])
+            if user_id is None:
+                result.add_error(candidate['line'], f"User not found: {candidate['user']}")
+                continue
+            candidate['user_id'] = user_id
+            resolved.append(candidate)
+        
+        # Clashes with bookings already in the database
+        conflicts = find_slot_conflicts(cursor, [
+            (c['room_id'], c['date'], c['start'], c['end']) for c in resolved
+        ])
+        
+        rows = []
+        accepted = {}  # (room_id, date) -> [(start, end, line number)]
+        for index, candidate in enumerate(resolved):
+            if index in conflicts:
+                result.add_error(candidate['line'], f'Room is already booked at that time (booking #{conflicts[index]})')
+                continue
+            
+            room_day = accepted.setdefault((candidate['room_id'], candidate['date']), [])
+            clash = next((line for start, end, line in room_day
+                          if start < candidate['end'] and end > candidate['start']), None)
+            if clash is not None:
+                result.add_error(candidate['line'], f'Overlaps the booking on line {clash}')
+                continue
+            room_day.append((candidate['start'], candidate['end'], candidate['line']))
+            
+            rows.append((candidate['user_id'], candidate['room_id'], candidate['date'],
+                         format_minutes(candidate['start']), format_minutes(candidate['end']),
+                         admin_id, candidate['notes']))
+        
+        cursor.executemany('''
+            INSERT INTO bookings (user_id, room_id, date, time_start, time_end, booking_admin_id, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+    return len(rows)
+
+def import_chunk(kind, connection, records, result, seen_emails, executor, admin_id=None):
+    """Validate and insert one chunk of records of the given kind"""
+    if kind == 'rooms':
+        return import_room_chunk(connection, records, result)
+    if kind == 'users':
+        return import_user_chunk(connection, records, result, seen_emails, executor)
+    return import_booking_chunk(connection, records, result, admin_id)
+
+def run_import(kind, stream, file_format, admin_id=None):
+    """Import rooms, users or bookings from a CSV / JSON lines text stream
+    
+    The input is read IMPORT_CHUNK_SIZE records at a time. Each chunk is
+    checked with a few set-based queries and written with one executemany
+    in its own transaction, so memory stays flat and a bad row only skips
+    that row. Returns an ImportResult listing the skipped rows.
+    """
+    result = ImportResult(kind)
+    started = time.perf_counter()
+    connection = get_database_connection()
+    seen_emails = set()
+    executor = ThreadPoolExecutor(app.config['IMPORT_HASH_WORKERS']) if kind == 'users' else None
+    records = iter_import_records(stream, file_format)
+    
+    try:
+        for chunk in iter_import_chunks(records, app.config['IMPORT_CHUNK_SIZE']):
+            result.total += len(chunk)
+            valid = []
+            for line_number, record, error in chunk:
+                if error:
+                    result.add_error(line_number, error)
+                else:
+                    valid.append((line_number, record))
+            
+            mark = result.mark()
+            emails_before = set(seen_emails)
+            try:
+                result.inserted += import_chunk(kind, connection, valid, result, seen_emails, executor, admin_id)
+            except sqlite3.IntegrityError:
+                # Someone else wrote a clashing row meanwhile - this chunk was rolled back.
+                # Forget its errors and retry row by row, so each row is reported once.
+                result.discard_errors_since(mark)
+                seen_emails.clear()
+                seen_emails.update(emails_before)
+                for row in valid:
+                    try:
+                        result.inserted += import_chunk(kind, connection, [row], result, seen_emails, executor, admin_id)
+                    except sqlite3.IntegrityError as error:
+                        result.add_error(row[0], f'Not imported: {error}')
+    
+    except (UnicodeDecodeError, csv.Error) as error:
+        result.add_error(result.total, f'Could not read the file: {error}')
+    
+    finally:
+        if executor:
+            executor.shutdown()
+        connection.close()
+    
+    # Bookings were added behind the caches' back
+    if kind == 'bookings':
+        availability_index.clear()
+    elif kind == 'rooms':
+        room_catalog.clear()
+    
+    result.errors.sort(key=lambda error: error[0])
+    result.seconds = round(time.perf_counter() - started, 2)
+    return result
+
+@app.cli.command('import-data')
+@click.argument('kind', type=click.Choice(IMPORT_KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_data_command(kind, path):
+    """Bulk import rooms, users or bookings from a .csv or .jsonl file"""
+    file_format = import_file_format(path)
+    if not file_format:
+        raise click.BadParameter('expected a .csv, .json or .jsonl file', param_hint='PATH')
+    
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        result = run_import(kind, stream, file_format)
+    
+    click.echo(f"Imported {result.inserted} of {result.total} {kind} in {result.seconds}s "
+               f"({result.error_count} skipped)")
+    for line_number, message in result.errors:
+        click.echo(f"  line {line_number}: {message}")
+    if result.error_count > len(result.errors):
+        click.echo(f"  ... and {result.error_count - len(result.errors)} more")
+
+# ============================================================================
+# UTILISATION STATS
+# ============================================================================
+
+def utilisation_percent(booked_minutes, room_days):
+    """Share of the bookable hours that were booked, in percent"""
+    bookable = room_days * (parse_time_to_minutes(app.config['BOOKING_DAY_END'])
+                            - parse_time_to_minutes(app.config['BOOKING_DAY_START']))
+    return round(100 * booked_minutes / bookable, 1) if bookable else 0
+
+def get_utilisation_report(date_from, date_to, room_type=None):
+    """Booked minutes, bookings, distinct users and utilisation for a date range
+    
+    Totals are given overall, per room type, per room and per day. Only the
+    room_day_stats / room_day_users summary tables are read (kept up to date
+    by triggers on bookings), never the bookings table itself.
+    """
+    rooms = [room for room in get_all_rooms() if not room_type or room['room_type'] == room_type]
+    room_ids = {room['id'] for room in rooms}
+    days = (date_to - date_from).days + 1
+    params = (date_from.isoformat(), date_to.isoformat())
+    
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    
+    cursor.execute('''
+        SELECT room_id, date, booked_minutes, booking_count
+        FROM room_day_stats
+        WHERE date >= ? AND date <= ?
+    ''', params)
+    per_room = {room['id']: [0, 0] for room in rooms}
+    per_day = {}
+    for row in cursor:
+        if row['room_id'] not in room_ids:
+            continue
+        per_room[row['room_id']][0] += row['booked_minutes']
+        per_room[row['room_id']][1] += row['booking_count']
+        day_totals = per_day.setdefault(row['date'], [0, 0])
+        day_totals[0] += row['booked_minutes']
+        day_totals[1] += row['booking_count']
+    
+    # Distinct users: one row per (room, user) and per (date, user) of the range
+    cursor.execute('''
+        SELECT DISTINCT room_id, user_id
+        FROM room_day_users
+        WHERE date >= ? AND date <= ?
+    ''', params)
+    room_users = {room['id']: set() for room in rooms}
+    for row in cursor:
+        if row['room_id'] in room_ids:
+            room_users[row['room_id']].add(row['user_id'])
+    
+    day_users = {}
+    if room_type:
+        cursor.execute(f'''
+            SELECT date, COUNT(DISTINCT user_id) as users
+            FROM room_day_users
+            WHERE date >= ? AND date <= ?
+            AND room_id IN ({', '.join(['?'] * len(room_ids)) or 'NULL'})
+            GROUP BY date
+        ''', params + tuple(room_ids))
+    else:
+        cursor.execute('''
+            SELECT date, COUNT(DISTINCT user_id) as users
+            FROM room_day_users
+            WHERE date >= ? AND date <= ?
+            GROUP BY date
+        ''', params)
+    for row in cursor:
+        day_users[row['date']] = row['users']
+    connection.close()
+    
+    def totals(booked_minutes, booking_count, users, room_days):
+        return {
+            'booked_minutes': booked_minutes,
+            'booked_hours': round(booked_minutes / 60, 1),
+            'booking_count': booking_count,
+            'user_count': users,
+            'utilisation': utilisation_percent(booked_minutes, room_days),
+        }
+    
+    by_room = []
+    by_type = {}
+    for room in rooms:
+        booked_minutes, booking_count = per_room[room['id']]
+        by_room.append(dict(totals(booked_minutes, booking_count, len(room_users[room['id']]), days),
+                            room_id=room['id'], name=room['name'], room_type=room['room_type']))
+        
+        type_totals = by_type.setdefault(room['room_type'], {'minutes': 0, 'bookings': 0, 'users': set(), 'rooms': 0})
+        type_totals['minutes'] += booked_minutes
+        type_totals['bookings'] += booking_count
+        type_totals['users'] |= room_users[room['id']]
+        type_totals['rooms'] += 1
+    
+    all_users = set()
+    for users in room_users.values():
+        all_users |= users
+    
+    by_day = []
+    for offset in range(days):
+        day = (date_from + timedelta(days=offset)).isoformat()
+        booked_minutes, booking_count = per_day.get(day, (0, 0))
+        by_day.append(dict(totals(booked_minutes, booking_count, day_users.get(day, 0), len(rooms)), date=day))
+    
+    return {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'room_type': room_type,
+        'total': totals(sum(minutes for minutes, count in per_room.values()),
+                        sum(count for minutes, count in per_room.values()),
+                        len(all_users), len(rooms) * days),
+        'by_type': [dict(totals(t['minutes'], t['bookings'], len(t['users']), t['rooms'] * days), room_type=name)
+                    for name, t in sorted(by_type.items())],
+        'by_room': by_room,
+        'by_day': by_day,
+    }
+
+def utilisation_report_range(args):
+    """(date_from, date_to) from request args; the last 30 days by default"""
+    date_to = date.fromisoformat(args.get('date_to') or date.today().isoformat())
+    date_from = date.fromisoformat(args.get('date_from') or (date_to - timedelta(days=29)).isoformat())
+    if date_to < date_from:
+        raise ValueError('date_to is before date_from')
+    return date_from, date_to
+
+# ============================================================================
+# SAMPLE DATA GENERATOR
+# ============================================================================
+
+# Password of every generated user (hashed once - hashing is slow)
+GENERATED_USER_PASSWORD = 'password123'
+
+# Capacity range of a generated room, by room type
+GENERATED_ROOM_CAPACITY = {'Circle Table': (6, 8), 'Long Table': (12, 16), 'Square Table': (4, 6)}
+
+GENERATED_FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Jamie', 'Robin', 'Charlie', 'Drew',
+                         'Maria', 'David', 'Aisha', 'Wei', 'Olga', 'Kenji', 'Fatima', 'Lucas', 'Priya', 'Noah']
+GENERATED_LAST_NAMES = ['Smith', 'Jones', 'Brown', 'Garcia', 'Miller', 'Davis', 'Wilson', 'Moore', 'Clark', 'Lewis',
+                        'Walker', 'Hall', 'Young', 'King', 'Wright', 'Lopez', 'Hill', 'Green', 'Baker', 'Nelson']
+GENERATED_NOTES = ['Team meeting', 'Client call', 'Interview', 'Workshop', 'Planning', 'One-to-one', 'Training']
+
+# How popular each hour is as a start time (08:00 ... 22:00): busy mornings
+# and early afternoons, quiet lunch and evenings
+GENERATED_HOUR_WEIGHTS = [3, 8, 10, 9, 4, 6, 9, 9, 7, 4, 2, 1, 1, 1, 0.5]
+# Booking length in minutes -> weight (1 hour is the most common)
+GENERATED_LENGTH_WEIGHTS = {30: 2, 60: 5, 90: 1, 120: 2, 180: 1}
+# Weekends are quiet (Monday = 0)
+GENERATED_WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 0.9, 0.08, 0.04]
+
+# Most bookings per working room-day on average: a day has 30 half-hour
+# slots, and the busiest rooms get several times the average
+GENERATED_MAX_PER_ROOM_DAY = 6
+
+def cumulative_weights(weights):
+    """Running totals, for picking with bisect"""
+    totals = []
+    running = 0
+    for weight in weights:
+        running += weight
+        totals.append(running)
+    return totals
+
+def pick(generator, totals):
+    """Index picked at random in proportion to the weights behind totals"""
+    return bisect_left(totals, generator.random() * totals[-1])
+
+def next_row_id(cursor, table):
+    """Id SQLite will give the next row of an AUTOINCREMENT table"""
+    # Ids of deleted rows are never reused, so MAX(id) alone can be too low
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) as last_id FROM {table}")
+    last_id = cursor.fetchone()['last_id']
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+    sequence = cursor.fetchone()
+    return max(last_id, sequence['seq'] if sequence else 0) + 1
+
+def open_bulk_connection(path):
+    """Plain connection with PRAGMAs for fast bulk loading (not crash safe)"""
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    apply_database_pragmas(connection)
+    connection.execute("PRAGMA synchronous = OFF")
+    connection.execute("PRAGMA cache_size = -262144")   # 256 MB
+    connection.execute("PRAGMA temp_store = MEMORY")
+    return connection
+
+def generate_sample_data(connection, buildings=3, floors=4, rooms_per_floor=1, users=500, bookings=50000,
+                         days_back=365, days_ahead=90, series_share=0.1, cancel_share=0.05, seed=1,
+                         anchor_date=None):
+    """Add synthetic rooms, users and bookings to an initialised database
+    
+    Bookings run from days_back before anchor_date (a date, default today)
+    to days_ahead after it. The same arguments, seed and anchor_date always
+    give the same data, apart from the salt of the password hash (and the
+    ids, which depend on what is already in the database). Each floor of
+    each building gets rooms_per_floor rooms of every room type. Bookings
+    cluster on working days and peak hours, some users and rooms are much
+    busier than others, series_share of the bookings come from weekly
+    series and cancel_share are cancelled (cancelling deletes a booking,
+    so these only leave gaps in the ids and the calendar).
+    
+    connection must be opened with isolation_level=None (see
+    open_bulk_connection). Returns a dict of counts.
+    """
+    started = time.perf_counter()
+    generator = random.Random(seed)
+    slot_minutes = app.config['BOOKING_SLOT_MINUTES']
+    day_start = parse_time_to_minutes(app.config['BOOKING_DAY_START'])
+    day_slots = (parse_time_to_minutes(app.config['BOOKING_DAY_END']) - day_start) // slot_minutes
+    slot_times = [format_minutes(day_start + slot * slot_minutes) for slot in range(day_slots + 1)]
+    
+    # Start slot and length weights on the configured slot grid
+    start_totals = cumulative_weights(
+        [GENERATED_HOUR_WEIGHTS[min(len(GENERATED_HOUR_WEIGHTS) - 1, slot * slot_minutes // 60)]
+         for slot in range(day_slots)])
+    lengths = [max(1, minutes // slot_minutes) for minutes in GENERATED_LENGTH_WEIGHTS]
+    length_totals = cumulative_weights(GENERATED_LENGTH_WEIGHTS.values())
+    
+    anchor_date = anchor_date or date.today()
+    first_day = anchor_date - timedelta(days=days_back)
+    days = [first_day + timedelta(days=offset) for offset in range(days_back + days_ahead + 1)]
+    # Fewer bookings the further ahead a day is
+    day_weights = [GENERATED_WEEKDAY_WEIGHTS[day.weekday()]
+                   * (1.0 if offset <= days_back else max(0.1, 1 - (offset - days_back) / max(1, days_ahead)))
+                   for offset, day in enumerate(days)]
+    
+    cursor = connection.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        # Rooms: <type> - <building letter><floor>.<number>
+        room_rows = []
+        for building in range(buildings):
+            letter = chr(ord('A') + building % 26) + (str(building // 26) if building >= 26 else '')
+            for floor in range(1, floors + 1):
+                for room_type in VALID_ROOM_TYPES:
+                    low, high = GENERATED_ROOM_CAPACITY.get(room_type, (4, 12))
+                    for number in range(1, rooms_per_floor + 1):
+                        room_rows.append((f"{room_type} - {letter}{floor}.{number}",
+                                          f"Building {letter}, Floor {floor}",
+                                          generator.randint(low, high), room_type))
+        first_room_id = next_row_id(cursor, 'rooms')
+        cursor.executemany("INSERT INTO rooms (name, location, capacity, room_type) VALUES (?, ?, ?, ?)", room_rows)
+        cursor.execute("SELECT id FROM rooms WHERE id >= ? ORDER BY id", (first_room_id,))
+        room_ids = [row['id'] for row in cursor.fetchall()]
+        
+        # Users: unique names by numbering on from the existing users
+        first_user_id = next_row_id(cursor, 'users')
+        password_hash = generate_password_hash(GENERATED_USER_PASSWORD)
+        user_rows = []
+        for number in range(first_user_id, first_user_id + users):
+            firstname = generator.choice(GENERATED_FIRST_NAMES)
+            lastname = generator.choice(GENERATED_LAST_NAMES)
+            username = f"{firstname.lower()}.{lastname.lower()}{number}"
+            dob = date(generator.randint(1960, 2002), generator.randint(1, 12), generator.randint(1, 28))
+            user_rows.append((username, f"{username}@example.com", password_hash, firstname, lastname,
+                              dob.isoformat(), f"{generator.randint(1, 200)} High Street"))
+        cursor.executemany('''
+            INSERT INTO users (username, email, password, firstname, lastname, dob, address, role)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'user')
+        ''', user_rows)
+        cursor.execute("SELECT id FROM users WHERE id >= ? ORDER BY id", (first_user_id,))
+        user_ids = [row['id'] for row in cursor.fetchall()]
         
-        # Update session with new user data if update was successful
-        updated_user = get_user_by_id(user['id'])
-        if updated_user:
-            session['username'] = updated_user['username']  # Keep username in session for compatibility
-            
-        flash('Profile updated successfully', 'success')
+        cursor.execute("SELECT id FROM users WHERE role = 'admin' ORDER BY id LIMIT 1")
+        admin = cursor.fetchone()
+        admin_id = admin['id'] if admin else None
         
-    except Exception as error:
-        connection.rollback()
-        flash(f'Failed to update profile: {error}', 'error')
-    finally:
-        connection.close()
-    
-    return redirect(url_for('my_account'))
+        # Some rooms up to 4 times as popular as others; a few very busy
+        # users and a long tail of quiet ones
+        room_totals = cumulative_weights(0.5 + 1.5 * generator.random() ** 2 for room_id in room_ids)
+        user_totals = cumulative_weights(1 / (rank + 1) ** 0.8 for rank in range(len(user_ids)))
+        generator.shuffle(user_ids)
+        
+        working_room_days = len(room_ids) * sum(day_weights)
+        if not room_ids or not user_ids or bookings > working_room_days * GENERATED_MAX_PER_ROOM_DAY:
+            raise ValueError(f"{bookings} bookings do not fit in {len(room_ids)} rooms over {len(days)} days; "
+                             f"add buildings, floors or days")
+        
+        # Weekly series: (first day index, step in days, last day index, room, start, length, user, id)
+        next_series_id = next_row_id(cursor, 'booking_series')
+        series_rows = []
+        series_by_weekday = [[] for weekday in range(7)]
+        planned_series_bookings = 0
+        created_at = datetime.combine(anchor_date, datetime.min.time()).isoformat(timespec='seconds')
+        while planned_series_bookings < bookings * series_share:
+            interval = 2 if generator.random() < 0.2 else 1
+            first = generator.randrange(len(days))
+            while days[first].weekday() >= 5:
+                first = (first + 1) % len(days)
+            count = min(generator.randint(4, 26), (len(days) - 1 - first) // (7 * interval) + 1)
+            start = pick(generator, start_totals)
+            length = min(lengths[pick(generator, length_totals)], day_slots - start)
+            room_id = room_ids[pick(generator, room_totals)]
+            user_id = user_ids[pick(generator, user_totals)]
+            rule = RecurrenceRule('WEEKLY', interval, count)
+            series_rows.append((next_series_id, str(rule), user_id, room_id, slot_times[start],
+                                slot_times[start + length], admin_id, created_at))
+            series_by_weekday[days[first].weekday()].append(
+                (first, 7 * interval, first + 7 * interval * (count - 1), room_id, start, length, user_id, next_series_id))
+            planned_series_bookings += count
+            next_series_id += 1
+        cursor.executemany('''
+            INSERT INTO booking_series (id, rule, user_id, room_id, time_start, time_end, booking_admin_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', series_rows)
+        
+        # Bookings are streamed into executemany, never held in memory all at once
+        next_booking_id = next_row_id(cursor, 'bookings')
+        counts = {'bookings': 0, 'cancelled': 0}
+        
+        random_bookings = bookings * (1 - series_share)
+        per_weight = random_bookings / (room_totals[-1] * sum(day_weights))
+        room_weights = [total - (room_totals[index - 1] if index else 0) for index, total in enumerate(room_totals)]
+        
+        def booking_rows():
+            nonlocal next_booking_id
+            for day_index, day in enumerate(days):
+                day_text = day.isoformat()
+                # Series with an occurrence on this day, per room
+                taken = {}
+                for series in series_by_weekday[day.weekday()]:
+                    first, step, last, room_id, start, length, user_id, series_id = series
+                    if first <= day_index <= last and (day_index - first) % step == 0:
+                        taken.setdefault(room_id, []).append((start, length, user_id, series_id))
+                
+                for room_index, room_id in enumerate(room_ids):
+                    mask = 0
+                    placed = []
+                    
+                    # Series occurrences first; one that clashes is skipped, as
+                    # create_booking_series would
+                    for start, length, user_id, series_id in taken.get(room_id, []):
+                        bits = ((1 << length) - 1) << start
+                        if not mask & bits:
+                            mask |= bits
+                            placed.append((start, length, user_id, series_id, admin_id))
+                    
+                    # Stratified rounding keeps the total close to the requested number
+                    expected = per_weight * room_weights[room_index] * day_weights[day_index]
+                    wanted = int(expected) + (generator.random() < expected - int(expected))
+                    for _ in range(wanted):
+                        # A busy room-day may need a few tries to find a free time
+                        for attempt in range(8):
+                            start = pick(generator, start_totals)
+                            length = min(lengths[pick(generator, length_totals)], day_slots - start)
+                            bits = ((1 << length) - 1) << start
+                            if not mask & bits:
+                                mask |= bits
+                                placed.append((start, length, user_ids[pick(generator, user_totals)], None, None))
+                                break
+                    
+                    for start, length, user_id, series_id, booked_by in placed:
+                        booking_id = next_booking_id
+                        next_booking_id += 1
+                        if generator.random() < cancel_share:
+                            counts['cancelled'] += 1
+                            continue
+                        counts['bookings'] += 1
+                        notes = generator.choice(GENERATED_NOTES) if generator.random() < 0.2 else None
+                        yield (booking_id, user_id, room_id, day_text, slot_times[start],
+                               slot_times[start + length], booked_by, notes, series_id)
+        
+        # Triggers and indexes on bookings are dropped during the load (the
+        # generator never makes overlapping bookings) and rebuilt afterwards
+        cursor.execute('''
+            SELECT type, name, sql FROM sqlite_master
+            WHERE tbl_name = 'bookings' AND type IN ('trigger', 'index') AND sql IS NOT NULL
+        ''')
+        schema_objects = [tuple(row) for row in cursor.fetchall()]
+        for object_type, name, sql in schema_objects:
+            cursor.execute(f'DROP {object_type.upper()} "{name}"')
+        
+        cursor.executemany('''
+            INSERT INTO bookings (id, user_id, room_id, date, time_start, time_end, booking_admin_id, notes, series_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', booking_rows())
+        # Cancelled bookings at the very end still used up their ids
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'bookings'", (next_booking_id - 1,))
+        
+        # Indexes first, so the triggers' own lookups are fast again
+        for object_type, name, sql in sorted(schema_objects, key=lambda item: item[0] != 'index'):
+            cursor.execute(sql)
+        rebuild_booking_stats(cursor)
+        
+        # Tell every cache (in any process) that the data changed
+        cursor.execute('''
+            INSERT INTO change_counters (name, version)
+            SELECT 'room:' || id, 1 FROM rooms
+            UNION ALL SELECT 'user:' || id, 1 FROM users
+            UNION ALL SELECT 'bookings', 1
+            UNION ALL SELECT 'rooms', 1
+            WHERE true
+            ON CONFLICT (name) DO UPDATE SET version = version + 1
+        ''')
+        cursor.execute("COMMIT")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    
+    # Statistics for the query planner, then fold the WAL back into the database
+    cursor.execute("PRAGMA analysis_limit = 1000")
+    cursor.execute("ANALYZE")
+    cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    return {
+        'rooms': len(room_ids),
+        'users': len(user_ids),
+        'series': len(series_rows),
+        'bookings': counts['bookings'],
+        'cancelled': counts['cancelled'],
+        'seconds': round(time.perf_counter() - started, 1),
+    }
 
-@app.route('/history')
-@login_required
-def history():
-    """User booking history page"""
-    user_id = session['user_id']
+@app.cli.command('generate-data')
+@click.option('--buildings', default=3, show_default=True, help='Buildings')
+@click.option('--floors', default=4, show_default=True, help='Floors per building')
+@click.option('--rooms-per-floor', default=1, show_default=True, help='Rooms of each type per floor')
+@click.option('--users', default=500, show_default=True, help='Users')
+@click.option('--bookings', default=50000, show_default=True, help='Bookings (approximately)')
+@click.option('--days-back', default=365, show_default=True, help='Days of past bookings')
+@click.option('--days-ahead', default=90, show_default=True, help='Days of future bookings')
+@click.option('--series-share', default=0.1, show_default=True, help='Share of bookings from weekly series')
+@click.option('--cancel-share', default=0.05, show_default=True, help='Share of bookings cancelled')
+@click.option('--seed', default=1, show_default=True, help='Random seed (same seed, same data)')
+@click.option('--anchor-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Day the bookings are placed around (default: today)')
+def generate_data_command(**options):
+    """Fill the database with realistic synthetic rooms, users and bookings"""
+    # Make sure the tables and default data exist first
+    initialize_database()
     
-    # Get all bookings for this user
-    user_bookings = get_user_bookings(user_id)
+    if options['anchor_date']:
+        options['anchor_date'] = options['anchor_date'].date()
     
-    # Get current date and time for comparison
-    now = datetime.now()
-    current_date = now.date()
-    current_time = now.time()
+    connection = open_bulk_connection(get_database_path())
+    try:
+        counts = generate_sample_data(connection, **options)
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    finally:
+        connection.close()
     
-    # Add cancellation eligibility and completion status to each booking
-    for booking in user_bookings:
-        booking_date = date.fromisoformat(booking['date'])
-        booking_start_time = time.fromisoformat(booking['time_start'] + ':00' if len(booking['time_start']) == 5 else booking['time_start'])
-        
-        if booking_date > current_date:
-            booking['can_cancel'] = True
-            booking['status'] = 'Confirmed'
-        elif booking_date == current_date:
-            booking['can_cancel'] = current_time < booking_start_time
-            booking['status'] = 'Complete' if current_time >= booking_start_time else 'Confirmed'
-        else:
-            booking['can_cancel'] = False
-            booking['status'] = 'Complete'
-
-    return render_template('history.html', bookings=user_bookings)
+    click.echo(f"Added {counts['rooms']} rooms, {counts['users']} users, {counts['series']} series and "
+               f"{counts['bookings']} bookings ({counts['cancelled']} cancelled) in {counts['seconds']}s")
+    click.echo(f"Generated users log in with password '{GENERATED_USER_PASSWORD}'")
 
 # ============================================================================
 # ROUTES - ADMIN FUNCTIONS
@@ -1089,111 +4827,247 @@ def history():
 @admin_required
 def admin():
     """Admin dashboard"""
-    connection = get_database_connection()
-    cursor = connection.cursor()
-    
-    # Get all users
-    cursor.execute("SELECT * FROM users ORDER BY username")
-    users = [dict(row) for row in cursor.fetchall()]
+    # Only the active tab is loaded, one page at a time
+    tab = request.args.get('tab', 'users')
+    if tab not in ['users', 'rooms', 'bookings']:
+        tab = 'users'
+    
+    per_page = get_page_size()
+    after = request.args.get('after')
+    
+    # Filters from the query string (empty values are ignored)
+    filters = {
+        'search': request.args.get('search', '').strip(),
+        'role': request.args.get('role', ''),
+        'room_type': request.args.get('room_type', ''),
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', ''),
+        'room_id': request.args.get('room_id', ''),
+        'user': request.args.get('user', '').strip(),
+        'status': request.args.get('status', ''),
+    }
     
-    # Get all rooms
-    cursor.execute("SELECT * FROM rooms ORDER BY name")
-    rooms = [dict(row) for row in cursor.fetchall()]
-      # Get current date and time for comparison
-    now = datetime.now()
-    current_date = now.date()
-    current_time = now.time()
+    users = []
+    rooms = []
+    all_bookings = []
+    next_cursor = None
     
-    # Get today's date for filtering
-    from datetime import date
-    today = date.today().strftime('%Y-%m-%d')
+    if tab == 'users':
+        users, next_cursor = get_users_page(per_page, after, filters['search'], filters['role'])
     
-    # Get today's bookings with user and room information
-    cursor.execute('''
-        SELECT 
-            b.id,
-            b.date,
-            b.time_start,
-            b.time_end,
-            b.notes,
-            u.username,
-            r.name as room_name,
-            admin.username as admin_name
-        FROM bookings b
-        JOIN users u ON b.user_id = u.id
-        JOIN rooms r ON b.room_id = r.id
-        LEFT JOIN users admin ON b.booking_admin_id = admin.id
-        WHERE b.date = ?
-        ORDER BY b.time_start
-    ''', (today,))
+    elif tab == 'rooms':
+        rooms, next_cursor = get_rooms_page(per_page, after, filters['room_type'])
+        for room in rooms:
+            room['calendar_url'] = calendar_feed_url('room', room['id'])
     
-    today_bookings = []
-    for row in cursor.fetchall():
-        booking = dict(row)
-        # Determine who made the booking
-        if booking['admin_name']:
-            booking['booked_by'] = f"Admin: {booking['admin_name']}"
-        else:
-            booking['booked_by'] = "Self"
+    else:
+        # Booking filter by user accepts a username or an email address
+        user_id = None
+        user_not_found = False
+        if filters['user']:
+            booking_user = get_user_by_username(filters['user']) or get_user_by_email(filters['user'])
+            if booking_user:
+                user_id = booking_user['id']
+            else:
+                user_not_found = True
         
-        # Add time-based logic for today's bookings
-        booking_date = date.fromisoformat(booking['date'])
-        booking_start_time = time.fromisoformat(booking['time_start'] + ':00' if len(booking['time_start']) == 5 else booking['time_start'])
+        if not user_not_found:
+            all_bookings, next_cursor = get_bookings_page(
+                per_page, after,
+                date_from=filters['date_from'],
+                date_to=filters['date_to'],
+                room_id=filters['room_id'],
+                user_id=user_id,
+                status=filters['status'],
+                room_type=filters['room_type']
+            )
         
-        if booking_date == current_date:
-            booking['can_cancel'] = current_time < booking_start_time
-            booking['status'] = 'Complete' if current_time >= booking_start_time else None
-        else:
-            booking['can_cancel'] = True
-            booking['status'] = None
-            
-        today_bookings.append(booking)
+        for booking in all_bookings:
+            # Determine who made the booking
+            if booking['admin_name']:
+                booking['booked_by'] = "Admin"
+            else:
+                booking['booked_by'] = "Self"
     
-    # Get all bookings with user and room information
-    cursor.execute('''
-        SELECT 
-            b.id,
-            b.date,
-            b.time_start,
-            b.time_end,
-            b.notes,
-            u.username,
-            r.name as room_name,
-            admin.username as admin_name
-        FROM bookings b
-        JOIN users u ON b.user_id = u.id
-        JOIN rooms r ON b.room_id = r.id        LEFT JOIN users admin ON b.booking_admin_id = admin.id
-        ORDER BY b.date, b.time_start
-    ''')
+    # Export links use the same booking filters
+    export_args = {}
+    if tab == 'bookings':
+        export_args = {name: filters[name] for name in ['date_from', 'date_to', 'room_id', 'room_type', 'user', 'status']
+                       if filters[name]}
+    
+    # Page links keep the tab, page size and filters - only the cursor changes
+    page_args = {name: value for name, value in filters.items() if value}
+    first_page_url = url_for('admin', tab=tab, per_page=per_page, **page_args)
+    next_page_url = None
+    if next_cursor is not None:
+        next_page_url = url_for('admin', tab=tab, per_page=per_page, after=next_cursor, **page_args)
+    
+    return render_template('admin.html',
+                         tab=tab,
+                         users=users,
+                         rooms=rooms,
+                         bookings=all_bookings,
+                         filters=filters,
+                         per_page=per_page,
+                         is_first_page=not after,
+                         first_page_url=first_page_url,
+                         next_page_url=next_page_url,
+                         export_args=export_args,
+                         room_types=get_all_room_types(),
+                         all_rooms=get_all_rooms() if tab == 'bookings' else [])
+
+@app.route('/admin/export/bookings.<export_format>')
+@login_required
+@admin_required
+def export_bookings(export_format):
+    """Download bookings as CSV or JSON lines (streamed, same filters as the admin page)"""
+    if export_format not in ['csv', 'jsonl']:
+        abort(404)
+    
+    filters = {
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', ''),
+        'room_id': request.args.get('room_id', ''),
+        'room_type': request.args.get('room_type', ''),
+        'status': request.args.get('status', ''),
+        'user_id': None,
+    }
     
-    all_bookings = []
-    for row in cursor.fetchall():
-        booking = dict(row)
-        # Determine who made the booking
-        if booking['admin_name']:
-            booking['booked_by'] = "Admin"
-        else:
-            booking['booked_by'] = "Self"
-        
-        # Add time-based logic for all bookings
-        booking_date = date.fromisoformat(booking['date'])
-        booking_start_time = time.fromisoformat(booking['time_start'] + ':00' if len(booking['time_start']) == 5 else booking['time_start'])
-        
-        if booking_date > current_date:
-            booking['can_cancel'] = True
-            booking['status'] = None
-        elif booking_date == current_date:
-            booking['can_cancel'] = current_time < booking_start_time
-            booking['status'] = 'Complete' if current_time >= booking_start_time else None
-        else:
-            booking['can_cancel'] = False
-            booking['status'] = 'Complete'
-            
-        all_bookings.append(booking)
+    # Booking filter by user accepts a username or an email address
+    username = request.args.get('user', '').strip()
+    if username:
+        booking_user = get_user_by_username(username) or get_user_by_email(username)
+        if not booking_user:
+            flash('User not found', 'error')
+            return redirect(url_for('admin', tab='bookings'))
+        filters['user_id'] = booking_user['id']
+    
+    # ?after= resumes an interrupted download after that row's cursor
+    after = request.args.get('after') or None
+    if after and not decode_booking_cursor(after):
+        flash('Invalid export cursor', 'error')
+        return redirect(url_for('admin', tab='bookings'))
+    
+    batches = iter_booking_export(filters, after)
+    if export_format == 'csv':
+        # No header when resuming, so the parts can simply be appended
+        body = booking_export_csv(batches, header=not after)
+        mimetype = 'text/csv'
+    else:
+        body = booking_export_jsonl(batches)
+        mimetype = 'application/x-ndjson'
     
-    connection.close()
+    filename = f"bookings-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/admin/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def admin_import():
+    """Bulk import of rooms, users or bookings from an uploaded CSV / JSON lines file"""
+    kind = request.values.get('kind', 'bookings')
+    if kind not in IMPORT_KINDS:
+        kind = 'bookings'
+    
+    if request.method == 'GET':
+        return render_template('admin_import.html', kind=kind, kinds=IMPORT_KINDS,
+                               columns=IMPORT_COLUMNS, result=None)
+    
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Please choose a file to import', 'error')
+        return redirect(url_for('admin_import', kind=kind))
+    
+    file_format = import_file_format(upload.filename)
+    if not file_format:
+        flash('Only .csv, .json and .jsonl files can be imported', 'error')
+        return redirect(url_for('admin_import', kind=kind))
+    
+    # Read the upload as text, a line at a time
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    result = run_import(kind, stream, file_format, admin_id=session['user_id'])
     
-    return render_template('admin.html', users=users, rooms=rooms, bookings=all_bookings, today_bookings=today_bookings, today_date=today)
+    if result.error_count:
+        flash(f'Imported {result.inserted} of {result.total} {kind}; {result.error_count} rows were skipped', 'error')
+    else:
+        flash(f'Imported {result.inserted} {kind}', 'success')
+    return render_template('admin_import.html', kind=kind, kinds=IMPORT_KINDS,
+                           columns=IMPORT_COLUMNS, result=result)
+
+@app.route('/admin/stats')
+@login_required
+@admin_required
+def admin_stats():
+    """Room utilisation report (reads the summary tables only)"""
+    try:
+        date_from, date_to = utilisation_report_range(request.args)
+    except ValueError:
+        flash('Invalid date range', 'error')
+        return redirect(url_for('admin_stats'))
+    
+    # Every day of the range is listed - keep it to a sensible length
+    max_days = app.config['STATS_MAX_DAYS']
+    if (date_to - date_from).days >= max_days:
+        date_from = date_to - timedelta(days=max_days - 1)
+        flash(f'The report covers at most {max_days} days - showing {date_from} to {date_to}.', 'info')
+    
+    room_type = request.args.get('room_type', '').strip() or None
+    report = get_utilisation_report(date_from, date_to, room_type)
+    return render_template('admin_stats.html', report=report, room_types=get_all_room_types(),
+                           filters={'date_from': report['date_from'], 'date_to': report['date_to'],
+                                    'room_type': room_type or ''})
+
+@app.route('/admin/slow-queries')
+@login_required
+@admin_required
+def admin_slow_queries():
+    """Slowest logged queries by total time, with their query plans"""
+    sort = request.args.get('sort', 'total')
+    if sort not in ['total', 'max', 'count']:
+        sort = 'total'
+    limit = max(1, min(request.args.get('limit', 20, type=int), 200))
+    return render_template('admin_slow_queries.html', queries=summarise_slow_queries(limit, sort),
+                           sort=sort, limit=limit, threshold=app.config['SLOW_QUERY_MS'],
+                           log_path=get_slow_query_log_path())
+
+@app.route('/admin/profiles')
+@login_required
+@admin_required
+def admin_profiles():
+    """Request profiles captured by the profiler hook"""
+    return render_template('admin_profiles.html', profiles=list_profiles(),
+                           sample_rate=app.config['PROFILE_SAMPLE_RATE'])
+
+@app.route('/admin/profiles/<name>')
+@login_required
+@admin_required
+def admin_profile(name):
+    """Top functions of one profile (?sort=cumulative|own, ?download=1 for the .prof file)"""
+    if request.args.get('download') == '1':
+        if not PROFILE_NAME_PATTERN.match(name):
+            abort(404)
+        return send_from_directory(get_profile_directory(), name, as_attachment=True)
+    
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ['cumulative', 'own']:
+        sort = 'cumulative'
+    limit = max(1, min(request.args.get('limit', 40, type=int), 500))
+    profile = read_profile(name, sort, limit)
+    if profile is None:
+        abort(404)
+    return render_template('admin_profile.html', profile=profile, sort=sort, limit=limit)
+
+@app.route('/admin/profiles/clear', methods=['POST'])
+@login_required
+@admin_required
+def clear_profiles():
+    """Delete every saved profile"""
+    directory = get_profile_directory()
+    for profile in list_profiles():
+        os.remove(os.path.join(directory, profile['name']))
+    flash('Profiles deleted', 'success')
+    return redirect(url_for('admin_profiles'))
 
 @app.route('/admin/add_room', methods=['POST'])
 @login_required
@@ -1209,22 +5083,21 @@ def add_room():
     # Validate input
     if not name or not location or not room_type:
         flash('Room name, location, and room type are required', 'error')
-        return redirect(url_for('admin'))
+        return redirect(url_for('admin', tab='rooms'))
     
     # Validate room type
-    valid_room_types = ['Circle Table', 'Long Table', 'Square Table']
-    if room_type not in valid_room_types:
+    if room_type not in VALID_ROOM_TYPES:
         flash('Invalid room type selected', 'error')
-        return redirect(url_for('admin'))
+        return redirect(url_for('admin', tab='rooms'))
     
     try:
         capacity = int(capacity)
         if capacity <= 0:
             flash('Room capacity must be a positive number', 'error')
-            return redirect(url_for('admin'))
+            return redirect(url_for('admin', tab='rooms'))
     except ValueError:
         flash('Room capacity must be a valid number', 'error')
-        return redirect(url_for('admin'))
+        return redirect(url_for('admin', tab='rooms'))
     
     # Add room to database
     connection = get_database_connection()
@@ -1245,7 +5118,7 @@ def add_room():
     finally:
         connection.close()
     
-    return redirect(url_for('admin'))
+    return redirect(url_for('admin', tab='rooms'))
 
 @app.route('/admin/edit_user/<int:user_id>', methods=['POST'])
 @login_required
@@ -1281,6 +5154,7 @@ def edit_user(user_id):
         ''', (email, firstname, lastname, dob, address, role, user_id))
         
         connection.commit()
+        invalidate_cached_user(user_id)
         
         # If the updated user is the current admin, update their session
         if user_id == session['user_id']:
@@ -1320,7 +5194,9 @@ def admin_book():
         return render_template('admin_book.html', 
                              room_types=room_types, 
                              clients=clients, 
-                             current_date=current_date)
+                             current_date=current_date,
+                             slot_minutes=app.config['BOOKING_SLOT_MINUTES'],
+                             max_occurrences=app.config['RECURRENCE_MAX_OCCURRENCES'])
     
     # Process admin booking form (POST request)
     
@@ -1333,26 +5209,27 @@ def admin_book():
     booking_notes = request.form.get('booking_notes', '').strip()
     is_recurring = request.form.get('is_recurring') == '1'
     recurrence_type = request.form.get('recurrence_type', 'weekly')
-    recurrence_count = request.form.get('recurrence_count', '4')
     
     # Validate all required fields
     if not all([client_id, room_type, date, time_start, time_end]):
         flash('Please fill in all required fields.', 'error')
         return redirect(url_for('admin_book'))
     
-    # Validate booking duration
-    try:
-        start_hour = int(time_start.split(':')[0])
-        end_hour = int(time_end.split(':')[0])
-        duration = end_hour - start_hour
-        
-        if duration < 1 or duration > 8:
-            flash(f'Booking duration must be between 1 and 8 hours (you selected {duration} hours)', 'error')
-            return redirect(url_for('admin_book'))
-    except (ValueError, IndexError):
-        flash('Invalid time format. Please try again.', 'error')
+    # Validate booking times (1-8 hours, on the slot grid)
+    duration, error_message = validate_booking_times(time_start, time_end)
+    if error_message:
+        flash(error_message, 'error')
         return redirect(url_for('admin_book'))
     
+    # Validate the repeat rule (weekly, biweekly, monthly or custom)
+    recurrence_rule = None
+    if is_recurring:
+        try:
+            recurrence_rule = recurrence_rule_from_form(request.form)
+        except ValueError as error:
+            flash(f'Invalid recurrence: {error}', 'error')
+            return redirect(url_for('admin_book'))
+    
     # Store booking details in session and redirect to room selection
     session['admin_booking_data'] = {
         'client_id': client_id,
@@ -1365,7 +5242,9 @@ def admin_book():
         'is_admin_booking': True,
         'is_recurring': is_recurring,
         'recurrence_type': recurrence_type,
-        'recurrence_count': recurrence_count
+        'recurrence_rule': str(recurrence_rule) if recurrence_rule else '',
+        'recurrence_label': recurrence_rule.describe() if recurrence_rule else '',
+        'recurrence_count': recurrence_rule.count if recurrence_rule else 1
     }
     
     return redirect(url_for('admin_select_room'))
@@ -1394,8 +5273,18 @@ def admin_select_room():
             flash(f'No {booking_data["room_type"]} rooms are available for the selected date and time. Please choose a different time.', 'error')
             return redirect(url_for('admin_book'))
         
+        # Recurring booking: show how many occurrences each room is free for, best first
+        if booking_data.get('is_recurring') and booking_data.get('recurrence_rule'):
+            rule = RecurrenceRule.parse(booking_data['recurrence_rule'])
+            windows = [(occurrence_date, booking_data['time_start'], booking_data['time_end'])
+                       for occurrence_date in rule.dates(booking_data['date'])]
+            free_counts = count_free_windows(available_rooms, windows)
+            for room in available_rooms:
+                room['free_occurrences'] = free_counts[room['id']]
+            available_rooms.sort(key=lambda room: -room['free_occurrences'])
+        
         # Get client details for display
-        client = get_user_by_id(booking_data['client_id'])
+        client = get_cached_user(booking_data['client_id'])
         booking_data['client_name'] = f"{client['firstname']} {client['lastname']}"
         
         return render_template('admin_select_room.html', 
@@ -1423,7 +5312,7 @@ def admin_select_room():
     
     # Get room and client details for confirmation page
     room = get_room_by_id(room_id)
-    client = get_user_by_id(booking_data['client_id'])
+    client = get_cached_user(booking_data['client_id'])
     
     # Show admin booking confirmation page
     return render_template(
@@ -1436,8 +5325,9 @@ def admin_select_room():
         duration=booking_data['duration'],
         booking_notes=booking_data.get('booking_notes', ''),
         is_recurring=booking_data.get('is_recurring', False),
-        recurrence_type=booking_data.get('recurrence_type', 'weekly'),
-        recurrence_count=booking_data.get('recurrence_count', 4)
+        recurrence_rule=booking_data.get('recurrence_rule', ''),
+        recurrence_label=booking_data.get('recurrence_label', ''),
+        recurrence_count=booking_data.get('recurrence_count', 1)
     )
 
 @app.route('/admin/confirm_booking', methods=['POST'])
@@ -1461,8 +5351,6 @@ def admin_confirm_booking():
     client_id = request.form.get('client_id')
     booking_notes = request.form.get('booking_notes', '')
     is_recurring = request.form.get('is_recurring') == '1'
-    recurrence_type = request.form.get('recurrence_type', 'weekly')
-    recurrence_count = int(request.form.get('recurrence_count', 4))
     
     # Validate required fields
     if not all([room_id, date, time_start, time_end, client_id]):
@@ -1477,82 +5365,63 @@ def admin_confirm_booking():
         flash('Invalid booking information. Please try again.', 'error')
         return redirect(url_for('admin_book'))
     
-    # Double-check room availability
-    if not check_room_availability(room_id, date, time_start, time_end):
+    # Work out the repeat rule (a single booking if not recurring)
+    recurrence_rule = None
+    if is_recurring:
+        try:
+            recurrence_rule = recurrence_rule_from_form(request.form)
+        except ValueError as error:
+            flash(f'Invalid recurrence: {error}', 'error')
+            return redirect(url_for('admin_book'))
+    
+    if recurrence_rule and recurrence_rule.count > 1:
+        # Whole series in one transaction; clashing occurrences are skipped
+        result = create_booking_series(
+            user_id=client_id,  # Booking is for the client
+            room_id=room_id,
+            rule=recurrence_rule,
+            start_date=date,
+            time_start=time_start,
+            time_end=time_end,
+            admin_id=session['user_id'],  # Track which admin created this booking
+            notes=booking_notes
+        )
+    else:
+        # Create a single booking (checks availability atomically)
+        result = create_booking(
+            user_id=client_id,  # Booking is for the client
+            room_id=room_id,
+            date=date,
+            time_start=time_start,
+            time_end=time_end,
+            admin_id=session['user_id'],  # Track which admin created this booking
+            notes=booking_notes
+        )
+    
+    if isinstance(result, BookingConflict):
         flash('Sorry, this room was just booked by someone else. Please select another time.', 'error')
         return redirect(url_for('admin_book'))
     
-    # Create the initial booking
-    booking_id = create_booking(
-        user_id=client_id,  # Booking is for the client
-        room_id=room_id,
-        date=date,
-        time_start=time_start,
-        time_end=time_end,
-        admin_id=session['user_id'],  # Track which admin created this booking
-        notes=booking_notes
-    )
-    
-    if not booking_id:
+    if not result:
         flash('Failed to create booking. Please try again.', 'error')
         return redirect(url_for('admin_book'))
     
-    created_bookings = [booking_id]
-    all_bookings_created = True
-    
-    # Create recurring bookings if requested
-    if is_recurring and recurrence_count > 1:
-        booking_date = datetime.strptime(date, '%Y-%m-%d')
-        
-        # Calculate date intervals based on recurrence type
-        for i in range(1, recurrence_count):
-            if recurrence_type == 'weekly':
-                next_date = booking_date + timedelta(weeks=i)
-            elif recurrence_type == 'biweekly':
-                next_date = booking_date + timedelta(weeks=i*2)
-            elif recurrence_type == 'monthly':
-                # Handle monthly recurrence by adding months
-                month = booking_date.month + i
-                year = booking_date.year + (month - 1) // 12
-                month = ((month - 1) % 12) + 1
-                
-                # Handle day overflow (e.g., Jan 31 -> Feb 28)
-                try:
-                    next_date = booking_date.replace(year=year, month=month)
-                except ValueError:
-                    # Day doesn't exist in target month, use last day of month
-                    last_day = calendar.monthrange(year, month)[1]
-                    next_date = booking_date.replace(year=year, month=month, day=last_day)
-            
-            formatted_date = next_date.strftime('%Y-%m-%d')
-            
-            # Check if room is available for this recurring date
-            if check_room_availability(room_id, formatted_date, time_start, time_end):
-                # Create recurring booking
-                recurring_notes = f"{booking_notes} (Recurring {i+1}/{recurrence_count})"
-                recurring_id = create_booking(
-                    user_id=client_id,
-                    room_id=room_id,
-                    date=formatted_date,
-                    time_start=time_start,
-                    time_end=time_end,
-                    admin_id=session['user_id'],
-                    notes=recurring_notes
-                )
-                
-                if recurring_id:
-                    created_bookings.append(recurring_id)
-                else:
-                    all_bookings_created = False
-            else:
-                all_bookings_created = False
+    if isinstance(result, BookingSeriesResult):
+        created_bookings = result.created_ids
+        all_bookings_created = result.all_created
+        skipped_occurrences = result.conflicts
+    else:
+        created_bookings = [result]
+        all_bookings_created = True
+        skipped_occurrences = []
+    booking_id = created_bookings[0]
     
     # Generate confirmation code
     confirmation_code = f"MEET-{booking_id}-{datetime.now().strftime('%y%m%d')}"
     
     # Get room and client details for success page
     room = get_room_by_id(room_id)
-    client = get_user_by_id(client_id)
+    client = get_cached_user(client_id)
     
     # Show admin booking success page
     return render_template(
@@ -1565,9 +5434,10 @@ def admin_confirm_booking():
         confirmation_code=confirmation_code,
         booking_notes=booking_notes,
         is_recurring=is_recurring,
-        recurrence_type=recurrence_type,
-        recurrence_count=recurrence_count,        all_bookings_created=all_bookings_created,
-        created_bookings_count=len(created_bookings)
+        recurrence_label=recurrence_rule.describe() if recurrence_rule else '',
+        recurrence_count=recurrence_rule.count if recurrence_rule else 1,        all_bookings_created=all_bookings_created,
+        created_bookings_count=len(created_bookings),
+        skipped_occurrences=skipped_occurrences
     )
 
 @app.route('/admin/add_user', methods=['POST'])
@@ -1584,9 +5454,6 @@ def add_user():
     address = request.form.get('address', '').strip()
     role = request.form['role']
     
-    # Generate username from email (part before @)
-    username = email.split('@')[0]
-    
     # Validate input
     if not email or not firstname or not lastname or not password:
         flash('Email, first name, last name, and password are required', 'error')
@@ -1597,15 +5464,6 @@ def add_user():
         flash('Email already exists. Please use a different email.', 'error')
         return redirect(url_for('admin'))
     
-    # Check if username already exists (in case the auto-generated one conflicts)
-    if get_user_by_username(username):
-        # If username conflicts, append a number
-        counter = 1
-        original_username = username
-        while get_user_by_username(f"{original_username}{counter}"):
-            counter += 1
-        username = f"{original_username}{counter}"
-    
     # Validate role
     if role not in ['user', 'admin']:
         flash('Invalid role selected', 'error')
@@ -1615,6 +5473,9 @@ def add_user():
     connection = get_database_connection()
     cursor = connection.cursor()
     
+    # Generate username from email (part before @), numbered if it is taken
+    username = allocate_usernames(cursor, [email.split('@')[0]])[0]
+    
     try:
         password_hash = generate_password_hash(password)
         cursor.execute('''
@@ -1648,7 +5509,7 @@ def delete_room(room_id):
         
         if not room:
             flash('Room not found', 'error')
-            return redirect(url_for('admin'))
+            return redirect(url_for('admin', tab='rooms'))
         
         room_name = room['name']
         
@@ -1663,7 +5524,7 @@ def delete_room(room_id):
         
         if active_bookings > 0:
             flash(f'Cannot delete room "{room_name}". It has {active_bookings} active booking(s).', 'error')
-            return redirect(url_for('admin'))
+            return redirect(url_for('admin', tab='rooms'))
         
         # Delete the room
         cursor.execute('DELETE FROM rooms WHERE id = ?', (room_id,))
@@ -1677,7 +5538,342 @@ def delete_room(room_id):
     finally:
         connection.close()
     
-    return redirect(url_for('admin'))
+    return redirect(url_for('admin', tab='rooms'))
+
+# ============================================================================
+# ROUTES - API
+# ============================================================================
+
+def get_free_busy(rooms, date_from, date_to):
+    """Busy and free intervals (minutes) of each room on each date of the range
+    
+    Returns {room_id: {date: (busy, free)}}. One range query reads all
+    bookings of the period, sorted so that a single pass can merge them
+    into busy intervals per room and date. Free intervals are the gaps
+    left within the bookable hours.
+    """
+    day_start = parse_time_to_minutes(app.config['BOOKING_DAY_START'])
+    day_end = parse_time_to_minutes(app.config['BOOKING_DAY_END'])
+    dates = [(date_from + timedelta(days=offset)).isoformat()
+             for offset in range((date_to - date_from).days + 1)]
+    busy = {room['id']: {booking_date: [] for booking_date in dates} for room in rooms}
+    
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    cursor.execute('''
+        SELECT room_id, date, start_minute, end_minute
+        FROM bookings
+        WHERE date >= ? AND date <= ?
+        ORDER BY room_id, date, start_minute
+    ''', (dates[0], dates[-1]))
+    
+    for row in cursor:
+        room_days = busy.get(row['room_id'])
+        if room_days is None:
+            continue  # room filtered out
+        intervals = room_days[row['date']]
+        if intervals and row['start_minute'] <= intervals[-1][1]:
+            # Touches or overlaps the previous booking - extend it
+            intervals[-1][1] = max(intervals[-1][1], row['end_minute'])
+        else:
+            intervals.append([row['start_minute'], row['end_minute']])
+    connection.close()
+    
+    free_busy = {}
+    for room_id, room_days in busy.items():
+        free_busy[room_id] = {}
+        for booking_date, intervals in room_days.items():
+            free = []
+            position = day_start
+            for start, end in intervals:
+                if start > position:
+                    free.append([position, min(start, day_end)])
+                position = max(position, end)
+            if position < day_end:
+                free.append([position, day_end])
+            free_busy[room_id][booking_date] = (intervals, [interval for interval in free if interval[0] < interval[1]])
+    return free_busy
+
+def suggest_slots(room_type, booking_date, time_start, time_end, limit=None, now=None):
+    """Nearest free (room, date, start) alternatives to a requested slot
+    
+    Looks at the requested date and the SUGGESTION_DAYS - 1 days after it.
+    All free gaps come from one get_free_busy range query; every start on
+    the slot grid that fits the booking's length in a gap is a candidate.
+    Each (date, start) is offered once, in the first free room by name, and
+    they are ranked by day, then by distance from the requested start.
+    """
+    limit = limit or app.config['SUGGESTION_LIMIT']
+    now = now or datetime.now()
+    step = app.config['BOOKING_SLOT_MINUTES']
+    start = parse_time_to_minutes(time_start)
+    length = parse_time_to_minutes(time_end) - start
+    
+    rooms = get_rooms_by_type(room_type)
+    first_date = date.fromisoformat(booking_date)
+    last_date = first_date + timedelta(days=app.config['SUGGESTION_DAYS'] - 1)
+    free_busy = get_free_busy(rooms, first_date, last_date)
+    
+    today = now.strftime('%Y-%m-%d')
+    now_minute = now.hour * 60 + now.minute
+    
+    candidates = {}  # (day offset, start) -> room
+    for room in rooms:
+        for day, (busy, free) in free_busy[room['id']].items():
+            if day < today:
+                continue
+            day_offset = (date.fromisoformat(day) - first_date).days
+            for gap_start, gap_end in free:
+                if day == today:
+                    gap_start = max(gap_start, now_minute)
+                # First start on the slot grid inside the gap
+                first_start = -(-gap_start // step) * step
+                for slot_start in range(first_start, gap_end - length + 1, step):
+                    key = (day_offset, slot_start)
+                    if key not in candidates or room['name'] < candidates[key]['name']:
+                        candidates[key] = room
+    
+    suggestions = []
+    for day_offset, slot_start in heapq.nsmallest(limit, candidates, key=lambda key: (key[0], abs(key[1] - start), key[1])):
+        suggestions.append({
+            'room': candidates[(day_offset, slot_start)],
+            'date': (first_date + timedelta(days=day_offset)).isoformat(),
+            'time_start': format_minutes(slot_start),
+            'time_end': format_minutes(slot_start + length),
+        })
+    return suggestions
+
+def format_intervals(intervals):
+    """[[600, 720]] -> [{'start': '10:00', 'end': '12:00'}]"""
+    return [{'start': format_minutes(start), 'end': format_minutes(end)} for start, end in intervals]
+
+@app.route('/api/availability')
+@api_login_required
+def api_availability():
+    """Free/busy intervals of every matching room over a date range (JSON)
+    
+    Query parameters: date_from, date_to (YYYY-MM-DD, default today), and
+    optional room_type, room_id and capacity (minimum seats). Bookings are
+    reported as merged busy intervals only - no owners or notes.
+    """
+    try:
+        date_from = date.fromisoformat(request.args.get('date_from') or date.today().isoformat())
+        date_to = date.fromisoformat(request.args.get('date_to') or date_from.isoformat())
+        capacity = int(request.args.get('capacity') or 0)
+        room_id = int(request.args.get('room_id') or 0)
+    except ValueError:
+        return jsonify(error='Invalid parameter: dates are YYYY-MM-DD, capacity and room_id are numbers'), 400
+    
+    if date_to < date_from:
+        return jsonify(error='date_to is before date_from'), 400
+    if (date_to - date_from).days >= app.config['API_MAX_DAYS']:
+        return jsonify(error=f"At most {app.config['API_MAX_DAYS']} days per request"), 400
+    
+    room_type = request.args.get('room_type', '').strip()
+    
+    # Answer depends on bookings, rooms, the resolved range and the filters -
+    # unchanged counters for the same query mean 304. Hashed, because the
+    # room type is free text and may hold characters an ETag cannot.
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    etag_parts = (get_change_counter(cursor, 'bookings'), get_change_counter(cursor, 'rooms'),
+                  date_from.isoformat(), date_to.isoformat(), room_id, capacity, room_type)
+    connection.close()
+    etag = hashlib.sha256(json.dumps(etag_parts).encode()).hexdigest()[:32]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
+    rooms = [room for room in get_all_rooms()
+             if (not room_type or room['room_type'] == room_type)
+             and room['capacity'] >= capacity
+             and (not room_id or room['id'] == room_id)]
+    
+    free_busy = get_free_busy(rooms, date_from, date_to)
+    
+    room_list = []
+    for room in rooms:
+        days = []
+        for booking_date, (busy, free) in free_busy[room['id']].items():
+            days.append({'date': booking_date, 'busy': format_intervals(busy), 'free': format_intervals(free)})
+        room_list.append({
+            'id': room['id'],
+            'name': room['name'],
+            'location': room['location'],
+            'capacity': room['capacity'],
+            'room_type': room['room_type'],
+            'days': days,
+        })
+    
+    response = jsonify({
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'day_start': app.config['BOOKING_DAY_START'],
+        'day_end': app.config['BOOKING_DAY_END'],
+        'rooms': room_list,
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/api/stats')
+@api_admin_required
+def api_stats():
+    """Room utilisation report as JSON (same parameters as /admin/stats)"""
+    try:
+        date_from, date_to = utilisation_report_range(request.args)
+    except ValueError:
+        return jsonify(error='Invalid date range: dates are YYYY-MM-DD, date_from <= date_to'), 400
+    if (date_to - date_from).days >= app.config['STATS_MAX_DAYS']:
+        return jsonify(error=f"At most {app.config['STATS_MAX_DAYS']} days per request"), 400
+    
+    room_type = request.args.get('room_type', '').strip() or None
+    return jsonify(get_utilisation_report(date_from, date_to, room_type))
+
+@app.route('/metrics')
+def metrics():
+    """Request, SQL and cache metrics in the Prometheus text format"""
+    token = app.config['METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    if not (token and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())):
+        user = get_current_user()
+        if not user or user['role'] != 'admin':
+            abort(403)
+    
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+# ============================================================================
+# ROUTES - CALENDAR FEEDS
+# ============================================================================
+
+def calendar_token(kind, object_id):
+    """Secret part of a feed URL (calendar apps cannot log in)"""
+    message = f"{kind}:{object_id}".encode()
+    return hmac.new(app.config['SECRET_KEY'].encode(), message, hashlib.sha256).hexdigest()[:32]
+
+def calendar_feed_url(kind, object_id):
+    """Full URL of the .ics feed for a user or a room"""
+    return url_for('calendar_feed', kind=kind, object_id=object_id,
+                   token=calendar_token(kind, object_id), _external=True)
+
+def ical_escape(text):
+    """Escape a value for an iCalendar text property"""
+    text = str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+    return text.replace('\r\n', '\\n').replace('\n', '\\n')
+
+def ical_line(name, value):
+    """One content line, folded at 75 octets as RFC 5545 asks"""
+    line = f"{name}:{value}".encode('utf-8')
+    parts = []
+    while len(line) > 75:
+        # Do not cut a UTF-8 character in half
+        cut = 75 if not parts else 74
+        while cut > 0 and (line[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(line[:cut])
+        line = line[cut:]
+    parts.append(line)
+    return b'\r\n '.join(parts).decode('utf-8') + '\r\n'
+
+def build_calendar(name, bookings, stamp):
+    """iCalendar text for a list of bookings
+    
+    stamp is the DTSTAMP of every event. It is fixed for the day so the
+    same bookings always give exactly the same bytes (strong ETag).
+    """
+    lines = [
+        ical_line('BEGIN', 'VCALENDAR'),
+        ical_line('VERSION', '2.0'),
+        ical_line('PRODID', '-//MeetMate//Room Bookings//EN'),
+        ical_line('CALSCALE', 'GREGORIAN'),
+        ical_line('X-WR-CALNAME', ical_escape(name)),
+    ]
+    
+    for booking in bookings:
+        day = booking['date'].replace('-', '')
+        lines.append(ical_line('BEGIN', 'VEVENT'))
+        lines.append(ical_line('UID', f"booking-{booking['id']}@meetmate"))
+        lines.append(ical_line('DTSTAMP', stamp))
+        lines.append(ical_line('DTSTART', f"{day}T{booking['time_start'].replace(':', '')}00"))
+        lines.append(ical_line('DTEND', f"{day}T{booking['time_end'].replace(':', '')}00"))
+        lines.append(ical_line('SUMMARY', ical_escape(booking['summary'])))
+        lines.append(ical_line('LOCATION', ical_escape(booking['room_location'])))
+        if booking['notes']:
+            lines.append(ical_line('DESCRIPTION', ical_escape(booking['notes'])))
+        lines.append(ical_line('END', 'VEVENT'))
+    
+    lines.append(ical_line('END', 'VCALENDAR'))
+    return ''.join(lines)
+
+@app.route('/calendar/<kind>/<int:object_id>/<token>.ics')
+def calendar_feed(kind, object_id, token):
+    """iCalendar feed of a user's or a room's bookings
+    
+    The ETag comes from change counters only, so a client polling an
+    unchanged feed gets a 304 without the booking query being run.
+    """
+    if kind not in ['user', 'room'] or not hmac.compare_digest(token, calendar_token(kind, object_id)):
+        abort(404)
+    
+    today = date.today()
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    
+    # Bookings of this user/room, room names and the current day
+    etag = '-'.join([
+        kind,
+        str(object_id),
+        str(get_change_counter(cursor, f'{kind}:{object_id}')),
+        str(get_change_counter(cursor, 'rooms')),
+        today.strftime('%Y%m%d'),
+    ])
+    if request.if_none_match.contains(etag):
+        connection.close()
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
+    # Bounded window around today
+    first_date = (today - timedelta(days=app.config['ICAL_PAST_DAYS'])).isoformat()
+    last_date = (today + timedelta(days=app.config['ICAL_FUTURE_DAYS'])).isoformat()
+    
+    if kind == 'user':
+        owner = get_cached_user(object_id)
+        calendar_name = f"MeetMate - {owner['username']}" if owner else 'MeetMate'
+        summary_sql = 'r.name'
+        notes_sql = 'b.notes'
+        where_sql = 'b.user_id = ?'
+    else:
+        room = get_room_by_id(object_id)
+        calendar_name = f"MeetMate - {room['name']}" if room else 'MeetMate'
+        # Room feeds do not show who booked or their notes
+        summary_sql = "'Booked'"
+        notes_sql = 'NULL'
+        where_sql = 'b.room_id = ?'
+    
+    cursor.execute(f'''
+        SELECT
+            b.id,
+            b.date,
+            b.time_start,
+            b.time_end,
+            {notes_sql} as notes,
+            {summary_sql} as summary,
+            r.location as room_location
+        FROM bookings b
+        JOIN rooms r ON b.room_id = r.id
+        WHERE {where_sql} AND b.date >= ? AND b.date <= ?
+        ORDER BY b.date, b.time_start
+    ''', (object_id, first_date, last_date))
+    bookings = [dict(row) for row in cursor.fetchall()]
+    connection.close()
+    
+    body = build_calendar(calendar_name, bookings, today.strftime('%Y%m%dT000000Z'))
+    response = Response(body, mimetype='text/calendar')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 # ============================================================================
 # ERROR HANDLERS
@@ -1703,7 +5899,7 @@ def my_account():
     user_id = session['user_id']
     
     # Get current user information for profile tab
-    user = get_user_by_id(user_id)
+    user = get_current_user()
     if not user:
         flash('User not found', 'error')
         return redirect(url_for('logout'))
@@ -1742,6 +5938,7 @@ def my_account():
                     WHERE id = ?
                 ''', (new_email, firstname, lastname, dob, address, user_id))
             connection.commit()
+            invalidate_cached_user(user_id)
             
             # Update session with new user data
             updated_user = get_user_by_id(user_id)
@@ -1756,10 +5953,8 @@ def my_account():
     
     # GET request - prepare data for all tabs
     
-    # Get current date and time for comparison
-    now = datetime.now()
-    current_date = now.date()
-    current_time = now.time()
+    # can_cancel / status columns, all worked out against the same "now"
+    status_columns, status_params = booking_status_columns()
     
     # Dashboard data
     from datetime import date, timedelta
@@ -1774,54 +5969,47 @@ def my_account():
     next_week_str = next_week.strftime('%Y-%m-%d')
     
     # Get user's today's bookings for dashboard tab
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT 
             b.id,
             b.date,
             b.time_start,
             b.time_end,
+            b.start_minute,
             b.notes,
             r.name as room_name,
-            r.location as room_location
+            r.location as room_location,
+            {status_columns}
         FROM bookings b
         JOIN rooms r ON b.room_id = r.id
         WHERE b.user_id = ? AND b.date = ?
         ORDER BY b.time_start
-    ''', (user_id, today_str))
+    ''', status_params + [user_id, today_str])
     
     user_today_bookings = []
     for row in cursor.fetchall():
         booking = dict(row)
         
-        # Add time-based logic for today's bookings
-        booking_date = date.fromisoformat(booking['date'])
-        booking_start_time = time.fromisoformat(booking['time_start'] + ':00' if len(booking['time_start']) == 5 else booking['time_start'])
-        
-        if booking_date == current_date:
-            booking['can_cancel'] = current_time < booking_start_time
-            booking['status'] = 'Complete' if current_time >= booking_start_time else None
-        else:
-            booking['can_cancel'] = True
-            booking['status'] = None
-            
         user_today_bookings.append(booking)
     
     # Get user's upcoming bookings for dashboard tab (next 7 days)
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT 
             b.id,
             b.date,
             b.time_start,
             b.time_end,
+            b.start_minute,
             b.notes,
             r.name as room_name,
-            r.location as room_location
+            r.location as room_location,
+            {status_columns}
         FROM bookings b
         JOIN rooms r ON b.room_id = r.id
         WHERE b.user_id = ? AND b.date >= ? AND b.date <= ?
         ORDER BY b.date, b.time_start
         LIMIT 10
-    ''', (user_id, tomorrow_str, next_week_str))
+    ''', status_params + [user_id, tomorrow_str, next_week_str])
     
     user_upcoming_bookings = []
     for row in cursor.fetchall():
@@ -1831,30 +6019,11 @@ def my_account():
         booking_date = date.fromisoformat(booking['date'])
         booking['formatted_date'] = booking_date.strftime('%a, %b %d')
         
-        # Add time-based logic for upcoming bookings (all future bookings can be cancelled)
-        booking['can_cancel'] = True
-        booking['status'] = None
-        
         user_upcoming_bookings.append(booking)
     
     # History data - get all bookings for this user
     user_bookings = get_user_bookings(user_id)
     
-    # Add cancellation eligibility and completion status to each booking for history tab
-    for booking in user_bookings:
-        booking_date = date.fromisoformat(booking['date'])
-        booking_start_time = time.fromisoformat(booking['time_start'] + ':00' if len(booking['time_start']) == 5 else booking['time_start'])
-        
-        if booking_date > current_date:
-            booking['can_cancel'] = True
-            booking['status'] = 'Confirmed'
-        elif booking_date == current_date:
-            booking['can_cancel'] = current_time < booking_start_time
-            booking['status'] = 'Complete' if current_time >= booking_start_time else 'Confirmed'
-        else:
-            booking['can_cancel'] = False
-            booking['status'] = 'Complete'
-    
     connection.close()
     
     return render_template('my_account.html', 
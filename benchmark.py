@@ -0,0 +1,370 @@
+"""
+MeetMate benchmark
+
+Seeds a throw-away database, then runs the real booking flows with many
+virtual users at the same time (through the Flask test client) and reports
+throughput, p50/p95/p99 times and SQL statements per request for every step.
+
+    python benchmark.py
+    python benchmark.py --users 2000 --bookings 500000 --virtual-users 16 --iterations 20
+    python benchmark.py --compare instance/benchmarks/benchmark-20261018-101500.json
+
+Every run is saved as JSON in instance/benchmarks/ so runs can be compared.
+With --compare the script exits with status 1 when a step is slower (p95)
+or runs more SQL statements than in the baseline run.
+"""
+
+import argparse
+import html
+import json
+import os
+import random
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import app as meetmate
+
+ADMIN_EMAIL = 'admin@meetmate.com'
+ADMIN_PASSWORD = 'admin123'
+
+# Virtual users book one hour, starting on the whole hour
+BOOKING_HOURS = list(range(8, 22))
+
+ROOM_ID_PATTERN = re.compile(r'name="room_id" value="(\d+)"')
+SUGGESTION_PATTERN = re.compile(r'name="suggestion"[^>]*value="([^"]+)"')
+HIDDEN_INPUT_PATTERN = re.compile(r'<input type="hidden" name="(\w+)" value="([^"]*)"')
+
+# ============================================================================
+# TEST DATA
+# ============================================================================
+
+def seed_database(database_path, args):
+    """Create a fresh database and fill it with the sample data generator"""
+    meetmate.app.config['DATABASE'] = database_path
+    with meetmate.app.app_context():
+        meetmate.initialize_database()
+    
+    connection = meetmate.open_bulk_connection(database_path)
+    try:
+        return meetmate.generate_sample_data(
+            connection, buildings=args.buildings, floors=args.floors, rooms_per_floor=args.rooms_per_floor,
+            users=args.users, bookings=args.bookings, days_back=args.days_back, seed=args.seed)
+    finally:
+        connection.close()
+
+# ============================================================================
+# VIRTUAL USERS
+# ============================================================================
+
+class VirtualUser:
+    """One browser session that goes through the booking pages"""
+    
+    def __init__(self, number, users, seed):
+        self.number = number
+        self.client = meetmate.app.test_client()
+        self.random = random.Random(seed + number)
+        self.users = users  # (id, email) of the seeded users
+        self.samples = []   # (step, milliseconds, sql statements, ok)
+    
+    def request(self, step, method, path, expected_status, data=None):
+        """Send one request and record how long it took"""
+        started = time.perf_counter()
+        response = self.client.open(path, method=method, data=data)
+        milliseconds = (time.perf_counter() - started) * 1000
+        statements = int(response.headers.get('X-SQL-Statements', 0))
+        ok = response.status_code == expected_status
+        self.samples.append((step, milliseconds, statements, ok))
+        if not ok:
+            raise FlowFailed(f"{step}: status {response.status_code}")
+        return response.get_data(as_text=True)
+    
+    def login(self, email, password):
+        self.request('POST login', 'POST', '/login', 302, {'email': email, 'password': password})
+    
+    def booking_details(self):
+        """A random room type, day and time for a new booking"""
+        hour = self.random.choice(BOOKING_HOURS)
+        return {
+            'room_type': self.random.choice(meetmate.VALID_ROOM_TYPES),
+            'date': (date.today() + timedelta(days=self.random.randint(1, 60))).isoformat(),
+            'time_start': f"{hour:02d}:00",
+            'time_end': f"{hour + 1:02d}:00",
+        }
+    
+    def choose_room(self, page):
+        """Form data picking the first free room, or the first suggested slot"""
+        room_ids = ROOM_ID_PATTERN.findall(page)
+        if room_ids:
+            return {'room_id': room_ids[0]}
+        suggestions = SUGGESTION_PATTERN.findall(page)
+        if suggestions:
+            return {'suggestion': suggestions[0]}
+        raise FlowFailed('no room or suggestion offered')
+    
+    def confirm_form(self, page):
+        """What the confirm page's "Confirm Booking" button sends"""
+        data = {name: html.unescape(value) for name, value in HIDDEN_INPUT_PATTERN.findall(page)}
+        data['action'] = 'confirm'
+        return data
+    
+    def user_booking_flow(self):
+        """booking -> select_room -> confirm_booking -> process_payment"""
+        details = self.booking_details()
+        self.request('GET booking', 'GET', '/booking', 200)
+        self.request('POST booking', 'POST', '/booking', 302, details)
+        page = self.request('GET select_room', 'GET', '/select_room', 200)
+        page = self.request('POST select_room', 'POST', '/select_room', 200, self.choose_room(page))
+        self.request('POST confirm_booking', 'POST', '/confirm_booking', 200, self.confirm_form(page))
+        page = self.request('POST process_payment', 'POST', '/process_payment', 200, {
+            'card_holder': 'Bench User', 'card_number': '4111111111111111',
+            'expiry_date': '12/30', 'cvv': '123',
+        })
+        if 'MEET-' not in page:
+            raise FlowFailed('no confirmation code')
+    
+    def admin_booking_flow(self):
+        """admin_book -> admin_select_room -> admin_confirm_booking"""
+        details = self.booking_details()
+        details['client_id'] = str(self.random.choice(self.users)[0])
+        self.request('GET admin_book', 'GET', '/admin/book', 200)
+        self.request('POST admin_book', 'POST', '/admin/book', 302, details)
+        page = self.request('GET admin_select_room', 'GET', '/admin/select_room', 200)
+        page = self.request('POST admin_select_room', 'POST', '/admin/select_room', 200, self.choose_room(page))
+        page = self.request('POST admin_confirm_booking', 'POST', '/admin/confirm_booking', 200,
+                            self.confirm_form(page))
+        if 'MEET-' not in page:
+            raise FlowFailed('no confirmation code')
+    
+    def user_pages(self):
+        for path in ['/dashboard', '/history', '/my_account']:
+            self.request(f"GET {path.strip('/')}", 'GET', path, 200)
+    
+    def admin_pages(self):
+        for tab in ['users', 'rooms', 'bookings']:
+            self.request(f"GET admin ({tab})", 'GET', f"/admin?tab={tab}", 200)
+    
+    def run(self, is_admin, iterations):
+        """Log in, then repeat the booking flow and page loads"""
+        flows = {'completed': 0, 'failed': 0, 'errors': []}
+        try:
+            if is_admin:
+                self.login(ADMIN_EMAIL, ADMIN_PASSWORD)
+            else:
+                self.login(self.users[self.number % len(self.users)][1], meetmate.GENERATED_USER_PASSWORD)
+        except FlowFailed as error:
+            flows['failed'] += iterations
+            flows['errors'].append(str(error))
+            return flows
+        
+        for iteration in range(iterations):
+            try:
+                if is_admin:
+                    self.admin_booking_flow()
+                    self.admin_pages()
+                else:
+                    self.user_booking_flow()
+                    self.user_pages()
+                flows['completed'] += 1
+            except FlowFailed as error:
+                flows['failed'] += 1
+                flows['errors'].append(str(error))
+        return flows
+
+class FlowFailed(Exception):
+    """A page did not answer the way a real browser session expects"""
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarise_steps(samples):
+    """Per-step counts, times and SQL statements"""
+    by_step = {}
+    for step, milliseconds, statements, ok in samples:
+        by_step.setdefault(step, []).append((milliseconds, statements, ok))
+    
+    steps = {}
+    for step, values in by_step.items():
+        times = sorted(value[0] for value in values)
+        statements = [value[1] for value in values]
+        steps[step] = {
+            'count': len(values),
+            'errors': sum(1 for value in values if not value[2]),
+            'mean_ms': round(sum(times) / len(times), 2),
+            'p50_ms': round(percentile(times, 50), 2),
+            'p95_ms': round(percentile(times, 95), 2),
+            'p99_ms': round(percentile(times, 99), 2),
+            'max_ms': round(times[-1], 2),
+            'sql_mean': round(sum(statements) / len(statements), 1),
+            'sql_max': max(statements),
+        }
+    return steps
+
+def print_report(result):
+    print()
+    print(f"{result['requests']} requests in {result['seconds']}s "
+          f"({result['throughput_rps']} requests/s, {result['virtual_users']} virtual users)")
+    for flow, counts in result['flows'].items():
+        print(f"  {flow}: {counts['completed']} completed, {counts['failed']} failed")
+    print()
+    print(f"{'Step':<28}{'Count':>7}{'Errors':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Max ms':>9}{'SQL':>7}")
+    for step, stats in sorted(result['steps'].items()):
+        print(f"{step:<28}{stats['count']:>7}{stats['errors']:>7}{stats['p50_ms']:>9}"
+              f"{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['max_ms']:>9}{stats['sql_mean']:>7}")
+
+def compare_results(result, baseline, max_slowdown):
+    """Steps that got slower or run more SQL than in the baseline"""
+    regressions = []
+    for step, stats in result['steps'].items():
+        before = baseline.get('steps', {}).get(step)
+        if not before:
+            continue
+        # Ignore sub-millisecond noise on very fast steps
+        limit = before['p95_ms'] * (1 + max_slowdown / 100)
+        if stats['p95_ms'] > limit and stats['p95_ms'] - before['p95_ms'] > 1:
+            regressions.append(f"{step}: p95 {before['p95_ms']} ms -> {stats['p95_ms']} ms")
+        if stats['sql_max'] > before['sql_max']:
+            regressions.append(f"{step}: up to {before['sql_max']} -> {stats['sql_max']} SQL statements")
+    return regressions
+
+def git_commit():
+    """Current commit of the checkout, if git is available"""
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return output.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the MeetMate booking flows')
+    parser.add_argument('--buildings', type=int, default=3, help='buildings')
+    parser.add_argument('--floors', type=int, default=4, help='floors per building')
+    parser.add_argument('--rooms-per-floor', type=int, default=1, help='rooms of each type per floor')
+    parser.add_argument('--users', type=int, default=500, help='regular users')
+    parser.add_argument('--bookings', type=int, default=50000, help='bookings (approximately)')
+    parser.add_argument('--days-back', type=int, default=365, help='days of past bookings')
+    parser.add_argument('--virtual-users', type=int, default=8, help='sessions running at the same time')
+    parser.add_argument('--admin-share', type=float, default=0.25, help='share of virtual users that are admins')
+    parser.add_argument('--iterations', type=int, default=10, help='flows per virtual user')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (same seed, same data and flows)')
+    parser.add_argument('--database', help='database file to use (default: a temporary one)')
+    parser.add_argument('--output', help='where to save the JSON result (default: instance/benchmarks/)')
+    parser.add_argument('--compare', help='baseline JSON result to compare with')
+    parser.add_argument('--max-slowdown', type=float, default=20, help='allowed p95 slowdown in percent')
+    args = parser.parse_args()
+    
+    # Keep the benchmark's own queries out of the real instance/ files
+    work_directory = tempfile.mkdtemp(prefix='meetmate-bench-')
+    database_path = args.database or os.path.join(work_directory, 'benchmark.db')
+    meetmate.app.config['METRICS_RESPONSE_HEADERS'] = True
+    meetmate.app.config['SLOW_QUERY_LOG'] = os.path.join(work_directory, 'slow_queries.log')
+    
+    try:
+        if os.path.exists(database_path):
+            print(f"Using existing database {database_path}")
+            meetmate.app.config['DATABASE'] = database_path
+            with meetmate.app.app_context():
+                meetmate.initialize_database()
+            connection = sqlite3.connect(database_path)
+            scale = {
+                'rooms': connection.execute("SELECT COUNT(*) FROM rooms").fetchone()[0],
+                'users': connection.execute("SELECT COUNT(*) FROM users WHERE role = 'user'").fetchone()[0],
+                'bookings': connection.execute("SELECT COUNT(*) FROM bookings").fetchone()[0],
+            }
+            connection.close()
+        else:
+            print("Generating sample data...")
+            scale = seed_database(database_path, args)
+            print(f"Generated {scale}")
+        
+        connection = sqlite3.connect(database_path)
+        users = connection.execute(
+            "SELECT id, email FROM users WHERE email LIKE '%@example.com' ORDER BY id").fetchall()
+        connection.close()
+        if not users:
+            sys.exit('The database has no generated users (flask generate-data); use a new one')
+        
+        admin_count = round(args.virtual_users * args.admin_share)
+        virtual_users = [VirtualUser(number, users, args.seed) for number in range(args.virtual_users)]
+        
+        print(f"Running {args.virtual_users} virtual users x {args.iterations} iterations...")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.virtual_users) as executor:
+            futures = [executor.submit(user.run, user.number < admin_count, args.iterations)
+                       for user in virtual_users]
+            flow_results = [future.result() for future in futures]
+        seconds = time.perf_counter() - started
+    finally:
+        meetmate.connection_pool.close_all()
+        shutil.rmtree(work_directory, ignore_errors=True)
+    
+    samples = [sample for user in virtual_users for sample in user.samples]
+    flows = {'admin_booking': {'completed': 0, 'failed': 0}, 'user_booking': {'completed': 0, 'failed': 0}}
+    errors = []
+    for user, flow_result in zip(virtual_users, flow_results):
+        counts = flows['admin_booking' if user.number < admin_count else 'user_booking']
+        counts['completed'] += flow_result['completed']
+        counts['failed'] += flow_result['failed']
+        errors.extend(flow_result['errors'])
+    
+    result = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'scale': scale,
+        'virtual_users': args.virtual_users,
+        'iterations': args.iterations,
+        'seed': args.seed,
+        'seconds': round(seconds, 2),
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / seconds, 1) if seconds else 0,
+        'flows': flows,
+        'errors': errors[:20],
+        'steps': summarise_steps(samples),
+    }
+    print_report(result)
+    for error in errors[:5]:
+        print(f"  failed flow: {error}")
+    
+    output = args.output
+    if not output:
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'benchmarks')
+        os.makedirs(directory, exist_ok=True)
+        output = os.path.join(directory, f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as result_file:
+        json.dump(result, result_file, indent=2)
+    print(f"\nResult saved to {output}")
+    
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_results(result, baseline, args.max_slowdown)
+        if regressions:
+            print(f"\nSlower than {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions compared with {args.compare}")
+
+if __name__ == '__main__':
+    main()